@@ -0,0 +1,225 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Output:
+    """
+    One alarm output (horn, strobe, relay).
+    activate / deactivate: callables returning True on success (deactivate None = pulse output).
+    hold: seconds an output with `deactivate` stays latched before it is released (None = until release()).
+    """
+
+    def __init__(self, name, activate, deactivate=None, hold=None):
+        self.name = name
+        self.activate = activate
+        self.deactivate = deactivate
+        self.hold = hold
+        self.state = "idle"        # idle, activating, active, releasing
+        self.latched_until = None  # Monotonic deadline of the latch
+        self.attempts = 0
+        self.successes = 0
+        self.failures = 0
+        self.last_latency = None   # Seconds from the request to the successful call
+        self.last_error = None
+
+    def to_dict(self):
+        return {
+            "state": self.state,
+            "latched_for": round(self.latched_until - time.monotonic(), 3) if self.latched_until else None,
+            "attempts": self.attempts,
+            "successes": self.successes,
+            "failures": self.failures,
+            "last_latency": self.last_latency,
+            "last_error": self.last_error,
+        }
+
+
+class ActuatorExecutor:
+    """
+    Drives the alarm outputs from a worker pool so a slow or failing output never blocks the
+    frame loop or the other outputs: fire() returns at once, all outputs switch in parallel.
+
+    A failed call is retried after an exponential backoff that is scheduled, not slept; retries
+    stop after `retries` attempts or when the request is older than `deadline` seconds.
+    Latched outputs are released by the scheduler when their hold time runs out; firing a latched
+    output again only extends the latch.
+    """
+
+    def __init__(self, outputs, retries=3, backoff=0.5, max_backoff=4.0, deadline=5.0, on_error=None,
+                 on_actuated=None):
+        """
+        outputs: Output objects; the pool has one worker per output.
+        on_error: callback(message) when an output failed for good.
+        on_actuated: callback(name, context, monotonic time) when an output was switched on by fire().
+        """
+        self.outputs = {output.name: output for output in outputs}
+        self.retries = max(1, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.on_error = on_error
+        self.on_actuated = on_actuated
+        self._pool = None
+        self._jobs = []                # Heap of (due, seq, kind, output, attempt, requested, context)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.outputs)), thread_name_prefix="actuator")
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="actuator-scheduler", daemon=True)
+        self._thread.start()
+        logging.info(f"[IO] Actuator executor started ({', '.join(self.outputs)}).")
+
+    def stop(self, release=True, timeout=5.0):
+        """
+        Stops scheduling and waits for running calls; with `release` latched outputs are switched off.
+        """
+        with self._cond:
+            self._running = False
+            self._jobs.clear()
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._pool:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        for output in self.outputs.values():
+            if release and output.deactivate is not None and output.state != "idle":
+                ok, error = self._call(output, output.deactivate)
+                if not ok:
+                    logging.error(f"[IO] {output.name} release failed on shutdown: {error}")
+            output.state, output.latched_until = "idle", None
+        logging.info("[IO] Actuator executor stopped.")
+
+    def _schedule(self, due, kind, output, attempt, requested, context=None):
+        heapq.heappush(self._jobs, (due, next(self._seq), kind, output, attempt, requested, context))
+        self._cond.notify()
+
+    def fire(self, names=None, context=None):
+        """
+        Switches the outputs `names` (default: all) on. Never blocks; returns the names scheduled.
+        context: handed to on_actuated for the outputs scheduled by this call.
+        """
+        now = time.monotonic()
+        scheduled = []
+        with self._cond:
+            for name in names or self.outputs:
+                output = self.outputs[name]
+                if output.deactivate is not None and output.hold is not None:
+                    output.latched_until = now + output.hold
+                if output.state in ("activating", "active") and output.deactivate is not None:
+                    continue  # Already on; the latch was extended
+                if output.state == "activating":
+                    continue  # A pulse is still being delivered
+                output.state = "activating"
+                self._schedule(now, "activate", output, 1, now, context)
+                scheduled.append(name)
+        return scheduled
+
+    def release(self, names=None):
+        """
+        Switches latched outputs `names` (default: all) off. Never blocks.
+        """
+        now = time.monotonic()
+        with self._cond:
+            for name in names or self.outputs:
+                output = self.outputs[name]
+                if output.deactivate is None or output.state in ("idle", "releasing"):
+                    continue
+                output.state = "releasing"
+                output.latched_until = None
+                self._schedule(now, "release", output, 1, now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                while self._running and (not self._jobs or self._jobs[0][0] > now):
+                    self._cond.wait(timeout=self._jobs[0][0] - now if self._jobs else None)
+                    now = time.monotonic()
+                if not self._running:
+                    break
+                job = heapq.heappop(self._jobs)
+            if job[2] == "expire":
+                self._expire(job[3])
+            else:
+                self._pool.submit(self._execute, *job[2:])
+
+    def _expired(self, kind, output):
+        # A later fire()/release() superseded this job
+        return (kind == "activate" and output.state != "activating") or \
+            (kind == "release" and output.state != "releasing")
+
+    def _delay(self, attempt):
+        return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+
+    def _call(self, output, action):
+        output.attempts += 1
+        try:
+            ok = bool(action())
+            return ok, None if ok else "returned False"
+        except Exception as e:
+            return False, str(e)
+
+    def _execute(self, kind, output, attempt, requested, context):
+        with self._cond:
+            if self._expired(kind, output):
+                return
+        ok, error = self._call(output, output.activate if kind == "activate" else output.deactivate)
+        now = time.monotonic()
+        with self._cond:
+            if self._expired(kind, output):
+                return
+            if not ok:
+                output.failures += 1
+                output.last_error = error
+                delay = self._delay(attempt)
+                if attempt < self.retries and now + delay - requested <= self.deadline:
+                    logging.warning(f"[IO] {output.name} {kind} failed on attempt {attempt} ({error}), "
+                                    f"retrying in {delay:.2f} s.")
+                    self._schedule(now + delay, kind, output, attempt + 1, requested, context)
+                    return
+                output.state = "idle" if kind == "activate" else "active"
+            else:
+                output.successes += 1
+                output.last_latency = round(now - requested, 4)
+                if kind == "release" or output.deactivate is None:
+                    output.state = "idle"
+                else:
+                    output.state = "active"
+                    if output.latched_until is not None:
+                        self._schedule(output.latched_until, "expire", output, 1, output.latched_until)
+                if attempt > 1:
+                    logging.info(f"[IO] {output.name} {kind} succeeded on attempt {attempt}.")
+        if not ok:
+            message = f"{output.name} {kind} failed after {attempt} attempts: {error}"
+            logging.error(f"[IO] {message}")
+            if self.on_error:
+                self.on_error(message)
+        elif kind == "activate" and self.on_actuated:
+            self.on_actuated(output.name, context, now)
+
+    def _expire(self, output):
+        with self._cond:
+            if output.state == "active" and output.latched_until is not None:
+                if output.latched_until > time.monotonic():
+                    # Extended by a later fire()
+                    self._schedule(output.latched_until, "expire", output, 1, output.latched_until)
+                    return
+                output.state = "releasing"
+                output.latched_until = None
+                self._schedule(time.monotonic(), "release", output, 1, time.monotonic())
+
+    def get_status(self):
+        with self._cond:
+            return {name: output.to_dict() for name, output in self.outputs.items()}
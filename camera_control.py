@@ -1,10 +1,19 @@
 import ctypes as ct
 import numpy as np
 import os
+import re
+import tempfile
 from ctypes.util import find_library
 import cv2
+import time
 import random  # For simulated temperature
 
+from palette import PaletteLut
+
+# --- Shutter flag states (EvoIRFlagState) ---
+FLAG_OPEN, FLAG_CLOSE, FLAG_OPENING, FLAG_CLOSING, FLAG_ERROR, FLAG_INITIALIZING = range(6)
+FLAG_STATE_NAMES = ("open", "close", "opening", "closing", "error", "initializing")
+
 # --- Frame metadata structure for thermal SDK ---
 class EvoIRFrameMetadata(ct.Structure):
     _fields_ = [
@@ -19,12 +28,29 @@ class EvoIRFrameMetadata(ct.Structure):
     ]
 
 class CameraController:
-    def __init__(self, use_webcam=False):
+    def __init__(self, use_webcam=False, buffer_slots=0, serial=None, thermal_only=False, palette=None):
+        """
+        serial: serial number of the imager to open when several are attached (None = generic.xml as is).
+        buffer_slots: number of preallocated frame slots handed to the SDK in rotation.
+        0 keeps the legacy mode where every frame is returned as a new array.
+        With pooled slots, get_frame returns read-only views that stay valid until
+        `buffer_slots - 1` newer frames were captured; copy a frame to keep it longer.
+        thermal_only: fetch only the thermal matrix from the SDK; palette images are rendered
+        here with `palette` (a PaletteLut) when needed. Readers that can defer rendering use get_thermal.
+        """
         self.use_webcam = use_webcam
+        self.requested_serial = serial
+        self.buffer_slots = buffer_slots if not use_webcam else 0
+        self.thermal_only = thermal_only and not use_webcam
+        self.palette = palette or PaletteLut()
+        self._slot = 0
         self.cap = None
         self.libir = None
         self.pathXml = b''
         self.metadata = EvoIRFrameMetadata()
+        self.last_thermal = None  # Raw uint16 thermal matrix of the last frame (None for webcam)
+        self.last_info = None     # Metadata of the last frame, see _frame_info
+        self._webcam_counter = 0
 
         if self.use_webcam:
             self.cap = cv2.VideoCapture(0)
@@ -34,6 +60,8 @@ class CameraController:
         else:
             try:
                 self._init_lib()      # Set XML path and load SDK
+                if self.requested_serial:
+                    self.pathXml = self._serial_config(self.pathXml, self.requested_serial)
                 self._init_camera()   # Initialize hardware using XML path
                 print("CameraController initialized successfully.")
             except Exception as e:
@@ -58,6 +86,21 @@ class CameraController:
             except OSError as e:
                 raise RuntimeError(f"Failed to load irdirectsdk: {e}")
 
+    @staticmethod
+    def _serial_config(path_xml, serial):
+        """
+        Writes a copy of the XML config that selects the imager with the given serial number.
+        """
+        with open(path_xml.decode(), "r") as f:
+            xml = f.read()
+        xml, count = re.subn(r"<serial>\s*\d*\s*</serial>", f"<serial>{int(serial)}</serial>", xml)
+        if count == 0:
+            raise RuntimeError(f"No <serial> element in {path_xml.decode()}")
+        path = os.path.join(tempfile.gettempdir(), f"irimager_{int(serial)}.xml")
+        with open(path, "w") as f:
+            f.write(xml)
+        return path.encode()
+
     def _init_camera(self):
         self.pathFormat, self.pathLog = b'', b''
         self.palette_width, self.palette_height = ct.c_int(), ct.c_int()
@@ -85,11 +128,27 @@ class CameraController:
         print(f"Palette Image Size: {self.palette_width.value}x{self.palette_height.value}")
         print(f"Thermal Image Size: {self.thermal_width.value}x{self.thermal_height.value}")
 
-        self.np_thermal = np.zeros([self.thermal_height.value, self.thermal_width.value], dtype=np.uint16)
-        self.npThermalPointer = self.np_thermal.ctypes.data_as(ct.POINTER(ct.c_ushort))
-
-        self.np_img = np.zeros([self.palette_height.value, self.palette_width.value, 3], dtype=np.uint8)
-        self.npImagePointer = self.np_img.ctypes.data_as(ct.POINTER(ct.c_ubyte))
+        # Frame slots are allocated once; the SDK writes into them in rotation
+        slots = max(1, self.buffer_slots)
+        self.thermal_pool = [np.zeros([self.thermal_height.value, self.thermal_width.value], dtype=np.uint16)
+                             for _ in range(slots)]
+        self.thermal_pointers = [t.ctypes.data_as(ct.POINTER(ct.c_ushort)) for t in self.thermal_pool]
+        self.image_pool = [np.zeros([self.palette_height.value, self.palette_width.value, 3], dtype=np.uint8)
+                           for _ in range(slots)]
+        self.image_pointers = [img.ctypes.data_as(ct.POINTER(ct.c_ubyte)) for img in self.image_pool]
+        self.image_views = [self._read_only_view(img) for img in self.image_pool]
+        self.thermal_views = [self._read_only_view(t) for t in self.thermal_pool]
+
+        self.np_thermal = self.thermal_pool[0]
+        self.npThermalPointer = self.thermal_pointers[0]
+        self.np_img = self.image_pool[0]
+        self.npImagePointer = self.image_pointers[0]
+
+    @staticmethod
+    def _read_only_view(array):
+        view = array.view()
+        view.flags.writeable = False
+        return view
 
     def get_frame(self):
         if self.use_webcam:
@@ -97,8 +156,24 @@ class CameraController:
             if not ret:
                 raise RuntimeError("Failed to read from webcam.")
             temp = random.uniform(25.0, 60.0)  # Simulated temperature
+            self._webcam_counter += 1
+            self.last_info = {
+                "counter": self._webcam_counter,
+                "counter_hw": self._webcam_counter,
+                "hw_timestamp": None,
+                "flag_state": 0,
+                "capture_time": time.time(),
+                "capture_monotonic": time.monotonic(),
+            }
             return frame, temp
 
+        if self.thermal_only:
+            thermal, mean_temp = self.get_thermal()
+            return self.palette.render(thermal), mean_temp
+
+        if self.buffer_slots:
+            return self._get_pooled_frame()
+
         # Real thermal camera frame
         ret = self.libir.evo_irimager_get_thermal_palette_image_metadata(
             self.thermal_width, self.thermal_height, self.npThermalPointer,
@@ -107,12 +182,69 @@ class CameraController:
         )
         if ret != 0:
             raise RuntimeError(f"Camera error: {ret}")
+        self.last_info = self._frame_info()
 
         rgb_img = cv2.cvtColor(self.np_img, cv2.COLOR_BGR2RGB)
+        self.last_thermal = self.np_thermal.copy()  # The single buffer is overwritten by the next read
         thermal_mean_raw = self.np_thermal.mean()
         mean_temp = thermal_mean_raw / 10.0 - 100.0
         return rgb_img, mean_temp
 
+    def _frame_info(self):
+        """
+        Frame metadata taken right after the SDK returned the frame.
+        hw_timestamp is in 100 ns units (unreliable on Windows); capture_* are host clocks.
+        """
+        return {
+            "counter": self.metadata.counter,
+            "counter_hw": self.metadata.counterHW,
+            "hw_timestamp": self.metadata.timestamp,
+            "flag_state": self.metadata.flagState,
+            "capture_time": time.time(),
+            "capture_monotonic": time.monotonic(),
+        }
+
+    def _get_pooled_frame(self):
+        slot = self._slot
+        self._slot = (slot + 1) % self.buffer_slots
+        np_thermal = self.thermal_pool[slot]
+        np_img = self.image_pool[slot]
+
+        ret = self.libir.evo_irimager_get_thermal_palette_image_metadata(
+            self.thermal_width, self.thermal_height, self.thermal_pointers[slot],
+            self.palette_width, self.palette_height, self.image_pointers[slot],
+            ct.byref(self.metadata)
+        )
+        if ret != 0:
+            raise RuntimeError(f"Camera error: {ret}")
+        self.last_info = self._frame_info()
+
+        # Swap channels inside the slot instead of allocating a converted copy
+        cv2.cvtColor(np_img, cv2.COLOR_RGB2BGR, dst=np_img)
+        mean_temp = cv2.mean(np_thermal)[0] / 10.0 - 100.0
+        self.last_thermal = self.thermal_views[slot]
+        return self.image_views[slot], mean_temp
+
+    def get_thermal(self):
+        """
+        Fetches only the thermal matrix, skipping the SDK palette image.
+        Returns (thermal, mean_temp); thermal follows the same buffer rules as get_frame.
+        """
+        slot = self._slot
+        if self.buffer_slots:
+            self._slot = (slot + 1) % self.buffer_slots
+        width, height = ct.c_int(self.thermal_width.value), ct.c_int(self.thermal_height.value)
+        ret = self.libir.evo_irimager_get_thermal_image_metadata(
+            ct.byref(width), ct.byref(height), self.thermal_pointers[slot], ct.byref(self.metadata))
+        if ret != 0:
+            raise RuntimeError(f"Camera error: {ret}")
+        self.last_info = self._frame_info()
+
+        np_thermal = self.thermal_pool[slot]
+        mean_temp = cv2.mean(np_thermal)[0] / 10.0 - 100.0
+        self.last_thermal = self.thermal_views[slot] if self.buffer_slots else np_thermal.copy()
+        return self.last_thermal, mean_temp
+
     def shutdown(self):
         if self.use_webcam and hasattr(self, 'cap'):
             self.cap.release()
@@ -0,0 +1,352 @@
+import threading
+import time
+import logging
+
+from camera_control import FLAG_OPEN, FLAG_CLOSE, FLAG_OPENING, FLAG_CLOSING, FLAG_ERROR, FLAG_STATE_NAMES
+
+FLAG_CYCLE_STATES = (FLAG_CLOSE, FLAG_OPENING, FLAG_CLOSING)   # The flag is in front of the sensor
+
+
+class CapturedFrame:
+    """
+    One frame published by the capture thread.
+    seq: monotonically increasing sequence number (1 = first frame).
+    timestamp / monotonic: wall-clock and monotonic capture time of the frame.
+    thermal: raw uint16 thermal matrix, or None if the camera has no radiometric data.
+    info: camera frame metadata (counter, counter_hw, hw_timestamp, flag_state), or None.
+    flag_valid: False while the shutter flag cycle makes the temperatures unreliable.
+    palette: PaletteLut used to render `frame` from `thermal` on first access (thermal-only cameras).
+    """
+    __slots__ = ("seq", "_frame", "temp", "timestamp", "thermal", "monotonic", "info", "flag_valid", "palette")
+
+    def __init__(self, seq, frame, temp, timestamp, thermal=None, monotonic=None, info=None, flag_valid=True,
+                 palette=None):
+        self.seq = seq
+        self._frame = frame
+        self.temp = temp
+        self.timestamp = timestamp
+        self.thermal = thermal
+        self.monotonic = time.monotonic() if monotonic is None else monotonic
+        self.info = info
+        self.flag_valid = flag_valid
+        self.palette = palette
+
+    @property
+    def frame(self):
+        """
+        Palette image of the frame; rendered lazily and cached for thermal-only cameras.
+        """
+        if self._frame is None and self.palette is not None and self.thermal is not None:
+            self._frame = self.palette.render(self.thermal)
+        return self._frame
+
+    @property
+    def has_image(self):
+        """
+        True if the palette image exists already (accessing `frame` would not render it).
+        """
+        return self._frame is not None
+
+
+class FrameRingBuffer:
+    """
+    Fixed-size ring of the most recent frames.
+    There is a single writer (the capture thread). Readers never take a lock to
+    read the latest frame; a condition is only used to sleep until the next one.
+    """
+
+    def __init__(self, capacity=64):
+        if capacity < 2:
+            raise ValueError("Ring buffer capacity must be at least 2.")
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._seq = 0  # Sequence number of the last published frame
+        self._cond = threading.Condition()
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def publish(self, frame, temp, timestamp=None, thermal=None, monotonic=None, info=None, flag_valid=True,
+                palette=None):
+        seq = self._seq + 1
+        self._slots[seq % self.capacity] = CapturedFrame(
+            seq, frame, temp, time.time() if timestamp is None else timestamp, thermal, monotonic, info,
+            flag_valid, palette)
+        # Publishing the sequence number last makes the slot visible to readers
+        self._seq = seq
+        with self._cond:
+            self._cond.notify_all()
+        return seq
+
+    def latest(self):
+        seq = self._seq
+        if seq == 0:
+            return None
+        return self._slots[seq % self.capacity]
+
+    def get(self, seq):
+        """
+        Returns the frame with sequence number `seq`, or None if it was already overwritten.
+        """
+        item = self._slots[seq % self.capacity]
+        if item is None or item.seq != seq:
+            return None
+        return item
+
+    def wait_for_next(self, after_seq, timeout=None):
+        """
+        Returns the first frame newer than `after_seq`, waiting up to `timeout` seconds.
+        Readers that fell more than `capacity` frames behind skip to the oldest frame still held.
+        """
+        if self._seq <= after_seq:
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._seq > after_seq, timeout):
+                    return None
+        seq = max(after_seq + 1, self._seq - self.capacity + 1)
+        item = self.get(seq)
+        return item if item is not None else self.latest()
+
+    def measured_fps(self):
+        """
+        Frame rate over the frames currently held, from their capture timestamps.
+        """
+        newest = self.latest()
+        if newest is None:
+            return None
+        oldest = None
+        for seq in range(max(1, newest.seq - self.capacity + 2), newest.seq):
+            oldest = self.get(seq)
+            if oldest is not None:
+                break
+        if oldest is None or newest.monotonic <= oldest.monotonic:
+            return None
+        return (newest.seq - oldest.seq) / (newest.monotonic - oldest.monotonic)
+
+
+class CaptureEngine:
+    """
+    Owns the camera and pulls frames in a single thread at the camera frame rate.
+    Any number of consumers read from the ring buffer without touching the camera.
+    """
+
+    def __init__(self, cam, fps=32, buffer_size=64, flag_settle_frames=2, flag_timeout=10.0, on_fault=None):
+        """
+        flag_settle_frames: frames after the shutter flag reopened that are still tagged invalid.
+        flag_timeout: seconds a flag cycle may last before it is reported as a fault (None = never).
+        on_fault: callback(message) when the camera reports a flag error or a flag cycle exceeds
+                  flag_timeout; called from the capture thread, once until the flag is open again.
+        """
+        self.cam = cam
+        self.fps = fps
+        self.flag_settle_frames = flag_settle_frames
+        self.flag_timeout = flag_timeout
+        self.on_fault = on_fault
+        # Pooled cameras reuse their frame slots, so never hold more frames than the pool
+        pool_slots = getattr(cam, "buffer_slots", 0)
+        if pool_slots:
+            buffer_size = max(2, min(buffer_size, pool_slots - 1))
+        self.buffer = FrameRingBuffer(buffer_size)
+        self.frames_captured = 0
+        self.capture_errors = 0
+        self.last_error = None
+        self.dropped_frames = 0    # Frames missing according to the hardware counter
+        self.duplicate_frames = 0  # Frames the camera returned twice (same hardware counter)
+        self._last_counter = None
+        self._counter_step = None  # Hardware counter increment per delivered frame
+        self.flag_frames = 0       # Frames tagged invalid because of a shutter flag cycle
+        self.flag_cycles = 0
+        self.flag_state = FLAG_OPEN
+        self.flag_fault = None     # Message of the flag fault still going on
+        self.flag_faults = 0
+        self._settle_left = 0
+        self._flag_since = None
+        self._reader = threading.local()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
+        self._thread.start()
+        logging.info(f"[CAPTURE] Capture thread started at {self.fps} fps.")
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        logging.info("[CAPTURE] Capture thread stopped.")
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        # Self-paced sources (replay, network) block until their next frame is due
+        self_paced = getattr(self.cam, "self_paced", False) is True
+        interval = 1.0 / self.fps if self.fps and not self_paced else 0.0
+        next_time = time.monotonic()
+        # Thermal-only cameras skip the palette image; consumers render it when they need it
+        thermal_only = getattr(self.cam, "thermal_only", False) is True
+        palette = self.cam.palette if thermal_only else None
+        while not self._stop_event.is_set():
+            try:
+                if thermal_only:
+                    thermal, temp = self.cam.get_thermal()
+                    frame = None
+                else:
+                    frame, temp = self.cam.get_frame()
+                    thermal = getattr(self.cam, "last_thermal", None)
+            except Exception as e:
+                self.capture_errors += 1
+                self.last_error = str(e)
+                logging.warning(f"[CAPTURE] Camera error: {e}")
+                self._stop_event.wait(0.1)
+                continue
+
+            if (thermal if thermal_only else frame) is None:
+                self.capture_errors += 1
+                self.last_error = "Camera returned no frame."
+                self._stop_event.wait(0.1)
+                continue
+
+            info = getattr(self.cam, "last_info", None)
+            if not isinstance(info, dict):
+                info = None
+            if info is not None and not self._track_counter(info.get("counter_hw")):
+                continue
+            flag_valid = self._track_flag(info.get("flag_state", FLAG_OPEN) if info else FLAG_OPEN)
+            self.buffer.publish(
+                frame, temp,
+                timestamp=info["capture_time"] if info else None,
+                thermal=thermal,
+                monotonic=info["capture_monotonic"] if info else None,
+                info=info,
+                flag_valid=flag_valid,
+                palette=palette)
+            self.frames_captured += 1
+
+            # The SDK blocks until the next frame; this only paces faster sources (webcam, mocks)
+            next_time += interval
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                next_time = time.monotonic()
+
+    def _track_counter(self, counter_hw):
+        """
+        Counts dropped frames from gaps in the hardware counter.
+        Returns False if the frame repeats the previous counter value.
+        """
+        if counter_hw is None:
+            return True
+        last, self._last_counter = self._last_counter, counter_hw
+        if last is None:
+            return True
+        gap = (counter_hw - last) & 0xFFFFFFFF  # counterHW is an unsigned 32-bit counter
+        if gap == 0:
+            self.duplicate_frames += 1
+            return False
+        # With a scaled-down <framerate> the counter advances by more than one per frame
+        if self._counter_step is None or gap < self._counter_step:
+            self._counter_step = gap
+        missed = round(gap / self._counter_step) - 1
+        if missed > 0:
+            self.dropped_frames += missed
+            logging.debug(f"[CAPTURE] {missed} frame(s) dropped (counter {last} -> {counter_hw}).")
+        return True
+
+    def _track_flag(self, flag_state):
+        """
+        Returns False for frames captured during a shutter flag cycle or while the image settles after it.
+        Other states (error, initializing) are no flag cycle: their frames stay valid, an error is a fault.
+        """
+        previous, self.flag_state = self.flag_state, flag_state
+        name = FLAG_STATE_NAMES[flag_state] if 0 <= flag_state < len(FLAG_STATE_NAMES) else flag_state
+        if flag_state in FLAG_CYCLE_STATES:
+            now = time.monotonic()
+            if previous not in FLAG_CYCLE_STATES:
+                self.flag_cycles += 1
+                self._flag_since = now
+                self.flag_fault = None
+                logging.debug(f"[CAPTURE] Flag cycle started ({name}).")
+            elif self.flag_timeout and now - self._flag_since > self.flag_timeout:
+                self._report_fault(f"Shutter flag cycle not finished after {self.flag_timeout} s ({name}).")
+            self._settle_left = self.flag_settle_frames
+            self.flag_frames += 1
+            return False
+        self._flag_since = None
+        if flag_state == FLAG_ERROR:
+            self._report_fault("Camera reports a shutter flag error.")
+        else:
+            self.flag_fault = None
+        if self._settle_left > 0:
+            self._settle_left -= 1
+            self.flag_frames += 1
+            return False
+        return True
+
+    def _report_fault(self, message):
+        if self.flag_fault is not None:
+            return
+        self.flag_fault = message
+        self.flag_faults += 1
+        logging.warning(f"[CAPTURE] {message}")
+        if self.on_fault:
+            try:
+                self.on_fault(message)
+            except Exception as e:
+                logging.error(f"[CAPTURE] Fault callback failed: {e}")
+
+    def latest(self):
+        return self.buffer.latest()
+
+    def measured_fps(self):
+        return self.buffer.measured_fps()
+
+    def wait_for_frame(self, after_seq, timeout=None):
+        return self.buffer.wait_for_next(after_seq, timeout)
+
+    def next_frame(self, timeout=1.0):
+        """
+        Each calling thread receives consecutive CapturedFrames; the first call returns the latest one.
+        Returns None if no frame arrives within `timeout` seconds.
+        """
+        last_seq = getattr(self._reader, "seq", None)
+        if last_seq is None:
+            item = self.buffer.latest() or self.buffer.wait_for_next(0, timeout)
+        else:
+            item = self.buffer.wait_for_next(last_seq, timeout)
+        if item is not None:
+            self._reader.seq = item.seq
+        return item
+
+    def get_frame(self, timeout=1.0):
+        """
+        Drop-in replacement for CameraController.get_frame, see next_frame.
+        Returns (None, None) if no frame arrives within `timeout` seconds.
+        """
+        item = self.next_frame(timeout)
+        if item is None:
+            return None, None
+        return item.frame, item.temp
+
+    def get_status(self):
+        return {
+            "running": self.is_running(),
+            "frames_captured": self.frames_captured,
+            "capture_errors": self.capture_errors,
+            "last_error": self.last_error,
+            "sequence": self.buffer.seq,
+            "dropped_frames": self.dropped_frames,
+            "duplicate_frames": self.duplicate_frames,
+            "flag_frames": self.flag_frames,
+            "flag_cycles": self.flag_cycles,
+            "flag_active": self.flag_state in FLAG_CYCLE_STATES or self._settle_left > 0,
+            "flag_fault": self.flag_fault,
+            "flag_faults": self.flag_faults,
+            "measured_fps": self.measured_fps(),
+        }
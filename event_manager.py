@@ -0,0 +1,277 @@
+import datetime
+import json
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from mjpeg_writer import MjpegAviWriter, encode_jpeg
+
+
+class AnomalyClip:
+    """
+    One clip on disk covering one or more merged events.
+    """
+
+    def __init__(self, filename, first_trigger, end_time):
+        self.filename = filename
+        self.first_trigger = first_trigger
+        self.end_time = end_time       # Capture time of the last frame that belongs to the clip
+        self.events = []               # [{"temperature", "trigger_time", "source"}]
+        self.writer = None
+        self.ready = False              # Pre-event frames written, live frames may follow
+        self.last_timestamp = None     # Capture time of the last frame written
+        self.first_timestamp = None
+
+    def fps(self, default):
+        if self.writer is None or self.writer.frames < 2 or self.last_timestamp <= self.first_timestamp:
+            return default
+        return (self.writer.frames - 1) / (self.last_timestamp - self.first_timestamp)
+
+    def to_dict(self):
+        return {
+            "filename": str(self.filename),
+            "events": list(self.events),
+            "end_time": self.end_time,
+            "frames": self.writer.frames if self.writer else 0,
+        }
+
+
+class EventManager:
+    """
+    Records anomaly clips from the frames the main loop hands in, so several clips can be
+    written at once without competing for the camera.
+
+    A trigger registers a clip; the manager thread snapshots the pre-event buffer up to the exact
+    trigger time and opens the writer, so the caller never waits for either. The following frames
+    are appended until `post_duration` after the last trigger of the clip.
+    A trigger that falls into a running clip extends it instead of starting a second encode,
+    unless the clip would grow beyond `max_clip_duration`; then a new, overlapping clip starts.
+    For MJPG clips each frame is JPEG-encoded once in the manager thread and muxed into every clip.
+    Every clip gets a JSON sidecar listing its events with their trigger timestamps.
+    """
+
+    def __init__(self, pre_buffer, save_dir, pre_duration=10, post_duration=5, max_clip_duration=60,
+                 capacity=64, fps=32, idle_timeout=2.0, writer_factory=MjpegAviWriter, on_error=None,
+                 on_timing=None):
+        """
+        pre_buffer: PreEventBuffer the pre-event frames are taken from (None = clips start at the trigger).
+        capacity: frames queued for encoding before new frames are dropped.
+        fps: frame rate written until the clip's own rate is known.
+        idle_timeout: open clips are finished when no frame arrived for this many seconds.
+        writer_factory: callable(filename, fps) returning the clip writer (e.g. video_encoder.create_video_writer);
+        writers with `wants_jpeg` get the shared JPEG encoding of each frame.
+        on_error: callback(message) when a clip could not be written.
+        on_timing: callback(seconds) with the time spent writing each live frame into the open clips.
+        """
+        self.pre_buffer = pre_buffer
+        self.save_dir = Path(save_dir)
+        self.pre_duration = pre_duration
+        self.post_duration = post_duration
+        self.max_clip_duration = max_clip_duration
+        self.capacity = max(1, capacity)
+        self.fps = fps
+        self.idle_timeout = idle_timeout
+        self.writer_factory = writer_factory
+        self.on_error = on_error
+        self.on_timing = on_timing
+        self.triggered = 0
+        self.merged = 0
+        self.completed = 0
+        self.dropped = 0
+        self.last_clip = None
+        self._clips = []          # Clips still receiving frames
+        self._jobs = deque()      # ("open", clip) and ("frame", frame, timestamp)
+        self._queued_frames = 0
+        self._last_frame = time.monotonic()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    @property
+    def active(self):
+        return bool(self._clips)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="event-manager", daemon=True)
+        self._thread.start()
+        logging.info("[EVENT] Event manager started.")
+
+    def stop(self, timeout=5.0):
+        """
+        Writes the queued frames and finalizes every open clip.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        for clip in list(self._clips):
+            self._finish(clip)
+        logging.info("[EVENT] Event manager stopped.")
+
+    def trigger(self, temp, trigger_time=None, source=None):
+        """
+        Registers an event. Returns the filename of the clip it is recorded in; the writer may still
+        change its suffix when it opens the clip. Opening failures are reported through on_error.
+        """
+        if trigger_time is None:
+            trigger_time = time.time()
+        event = {"temperature": round(float(temp), 2), "trigger_time": trigger_time, "source": source}
+        with self._cond:
+            self.triggered += 1
+            end_time = trigger_time + self.post_duration
+            for clip in self._clips:
+                if clip.first_trigger <= trigger_time <= clip.end_time and \
+                        end_time - clip.first_trigger <= self.max_clip_duration:
+                    clip.end_time = max(clip.end_time, end_time)
+                    clip.events.append(event)
+                    self.merged += 1
+                    logging.info(f"[EVENT] Event at {temp:.2f}°C merged into {clip.filename.name}.")
+                    return clip.filename
+
+            stamp = datetime.datetime.fromtimestamp(trigger_time).strftime("%Y%m%d_%H%M%S_%f")[:-3]
+            clip = AnomalyClip(self.save_dir / f"merged_anomaly_temp{int(temp)}_{stamp}.avi", trigger_time, end_time)
+            clip.events.append(event)
+            self._clips.append(clip)
+            self._jobs.append(("open", clip))
+            self._last_frame = time.monotonic()  # Frames were not queued while no clip was open
+            self._cond.notify()
+        logging.info(f"[EVENT] Event at {temp:.2f}°C recording to {clip.filename.name}.")
+        return clip.filename
+
+    def push(self, frame, timestamp):
+        """
+        Hands a live frame to the open clips. Costs nothing while no clip is open; never blocks.
+        """
+        if not self._clips:
+            return False
+        with self._cond:
+            if self._queued_frames >= self.capacity:
+                self.dropped += 1
+                return False
+            # Pooled cameras hand out read-only views into reused buffers
+            self._jobs.append(("frame", frame if frame.flags.writeable else frame.copy(), timestamp))
+            self._queued_frames += 1
+            self._last_frame = time.monotonic()
+            self._cond.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._jobs and self._running:
+                    self._cond.wait(timeout=0.5)
+                if not self._jobs:
+                    if not self._running:
+                        break
+                    job = None
+                else:
+                    job = self._jobs.popleft()
+                    if job[0] == "frame":
+                        self._queued_frames -= 1
+            try:
+                if job is None:
+                    if time.monotonic() - self._last_frame > self.idle_timeout:
+                        self._finish_idle()  # The camera stopped delivering frames
+                elif job[0] == "open":
+                    self._open(job[1])
+                else:
+                    start = time.perf_counter()
+                    self._write_frame(job[1], job[2])
+                    if self.on_timing:
+                        self.on_timing(time.perf_counter() - start)
+            except Exception as e:
+                logging.error(f"[EVENT] Clip writing failed: {e}")
+                if self.on_error:
+                    self.on_error(f"Error writing anomaly clip: {e}")
+
+    def _open(self, clip):
+        snapshot = self.pre_buffer.snapshot(self.pre_duration, end_time=clip.first_trigger) \
+            if self.pre_buffer is not None and self.pre_duration else None
+        times = snapshot[1] if snapshot is not None else ()
+        fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else self.fps
+        # The writer picks the container suffix
+        try:
+            self.save_dir.mkdir(parents=True, exist_ok=True)
+            clip.writer = self.writer_factory(clip.filename, fps)
+        except Exception as e:
+            with self._cond:
+                self._clips.remove(clip)
+            logging.error(f"[EVENT] Could not open clip: {e}")
+            if self.on_error:
+                self.on_error(f"Error opening anomaly clip: {e}")
+            return
+        clip.filename = Path(clip.writer.filename)
+        if snapshot is not None:
+            for frame, timestamp in zip(*snapshot):
+                self._append(clip, frame, timestamp)
+        clip.ready = True
+
+    def _append(self, clip, data, timestamp):
+        clip.writer.write(data)
+        clip.last_timestamp = timestamp
+        if clip.first_timestamp is None:
+            clip.first_timestamp = timestamp
+
+    def _write_frame(self, frame, timestamp):
+        jpeg = None
+        for clip in list(self._clips):
+            if not clip.ready or (clip.last_timestamp is not None and timestamp <= clip.last_timestamp):
+                continue
+            if timestamp > clip.end_time:
+                self._finish(clip)
+                continue
+            if not getattr(clip.writer, "wants_jpeg", False):
+                self._append(clip, frame, timestamp)
+                continue
+            if jpeg is None:
+                jpeg = encode_jpeg(frame)  # Once per frame, shared by all MJPG clips
+            self._append(clip, jpeg, timestamp)
+
+    def _finish_idle(self):
+        for clip in list(self._clips):
+            if clip.ready:
+                self._finish(clip)
+
+    def _finish(self, clip):
+        with self._cond:
+            if clip not in self._clips:
+                return
+            self._clips.remove(clip)
+            events = list(clip.events)
+        if clip.writer is None:
+            return  # Never opened
+        clip.writer.close(fps=clip.fps(self.fps))
+        if not clip.writer.frames:
+            clip.filename.unlink(missing_ok=True)
+            return
+        sidecar = {
+            "events": events,
+            "frames": clip.writer.frames,
+            "fps": round(clip.fps(self.fps), 3),
+            "start_time": clip.first_timestamp,
+            "end_time": clip.last_timestamp,
+        }
+        with open(clip.filename.with_suffix(".json"), "w") as f:
+            json.dump(sidecar, f, indent=2)
+        self.completed += 1
+        self.last_clip = str(clip.filename)
+        logging.info(f"[EVENT] Anomaly clip saved as {clip.filename} ({len(events)} events, {clip.writer.frames} frames).")
+
+    def get_status(self):
+        with self._cond:
+            return {
+                "active_clips": [clip.to_dict() for clip in self._clips],
+                "queued_frames": self._queued_frames,
+                "triggered": self.triggered,
+                "merged": self.merged,
+                "completed": self.completed,
+                "dropped_frames": self.dropped,
+                "last_clip": self.last_clip,
+            }
@@ -1,62 +1,414 @@
 import sqlite3
+import threading
 import cv2
 import time
 import numpy as np
 import logging
 
+from thermal_codec import encode_thermal, decode_thermal, raw_to_celsius
+from palette import PaletteLut
+from mjpeg_writer import encode_jpeg
+
+
+class CommitError(sqlite3.OperationalError):
+    """
+    A batch commit failed and was rolled back. `lost` frames of that batch had already been
+    reported as stored by earlier insert_frame calls.
+    """
+
+    def __init__(self, message, lost):
+        super().__init__(message)
+        self.lost = lost
+
+
 class FrameDatabase:
-    def __init__(self, db_path="frame_store.db"):
+    def __init__(self, db_path="frame_store.db", thermal_compression=1, palette=None,
+                 journal_mode="WAL", synchronous="NORMAL", batch_size=1, batch_interval=0.5,
+                 max_age=None, max_size_bytes=None, prune_interval=10.0, prune_batch=500):
+        """
+        thermal_compression: zlib level used for the radiometric thermal matrix (1 = fastest).
+        palette: PaletteLut used to render frames that were stored without a palette image.
+        journal_mode / synchronous: SQLite pragmas (None keeps the SQLite default). WAL with
+        synchronous=NORMAL only syncs on checkpoints instead of on every commit.
+        batch_size: frames grouped into one commit (1 = commit every frame).
+        batch_interval: longest time in seconds a frame waits for its commit when batching.
+        max_age / max_size_bytes: retention limits; a background thread deletes the oldest frames
+        every `prune_interval` seconds in transactions of `prune_batch` rows, so inserts and reads
+        are never locked out for long. New databases use incremental auto-vacuum to give the space back.
+        """
+        self.thermal_compression = thermal_compression
+        self.palette = palette or PaletteLut()
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._first_pending = None  # Monotonic time of the oldest uncommitted frame
+        self._stats_start = time.monotonic()
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.commits = 0
+        self.commit_errors = 0
+        self.frames_lost = 0        # Frames rolled back by failed commits
+        self._commit_error = None   # CommitError raised to the next insert_frame caller
+        self.commit_time = 0.0
+        self.max_commit_time = 0.0
+        self.insert_time = 0.0
+        self.max_flush_latency = 0.0
+        self._flush_event = threading.Event()
+        self._closed = threading.Event()
+        self._flusher = None
+        self.max_age = max_age
+        self.max_size_bytes = max_size_bytes
+        self.prune_interval = prune_interval
+        self.prune_batch = max(1, prune_batch)
+        self.rows_pruned = 0
+        self.pages_vacuumed = 0
+        self.last_prune_time = None
+        self.max_prune_batch_time = 0.0
+        self._pruner = None
         try:
             self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            has_tables = self.conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+            if not has_tables:
+                # Only possible before the first table exists; older files keep reusing freed pages
+                self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            if journal_mode:
+                mode = self.conn.execute(f"PRAGMA journal_mode={journal_mode}").fetchone()[0]
+                if mode.lower() != journal_mode.lower():
+                    logging.warning(f"[DB] Journal mode {journal_mode} not available, using {mode}.")
+            if synchronous:
+                self.conn.execute(f"PRAGMA synchronous={synchronous}")
             self.conn.execute('''
                 CREATE TABLE IF NOT EXISTS frames (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     timestamp REAL,
-                    image BLOB
+                    image BLOB,
+                    thermal BLOB,
+                    thermal_width INTEGER,
+                    thermal_height INTEGER
                 )
             ''')
+            self._migrate()
             self.conn.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON frames (timestamp)')
             self.conn.commit()
             logging.info(f"[DB] Connected to {db_path}")
         except Exception as e:
             logging.error(f"[DB] Failed to initialize database: {e}")
             raise
+        if self.batch_size > 1:
+            self._flusher = threading.Thread(target=self._flush_loop, name="db-flush", daemon=True)
+            self._flusher.start()
+        if max_age is not None or max_size_bytes is not None:
+            self._pruner = threading.Thread(target=self._prune_loop, name="db-retention", daemon=True)
+            self._pruner.start()
 
-    def insert_frame(self, frame):
+    def _migrate(self):
+        # Databases created before radiometric storage only have the palette image
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(frames)")}
+        for name, col_type in (("thermal", "BLOB"), ("thermal_width", "INTEGER"), ("thermal_height", "INTEGER")):
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE frames ADD COLUMN {name} {col_type}")
+                logging.info(f"[DB] Added column {name} to frames table.")
+
+    def insert_frame(self, frame, thermal=None, timestamp=None):
+        """
+        Stores the palette image as JPEG and, if given, the raw uint16 thermal matrix losslessly.
+        frame may be None when thermal is given; the image is then rendered from thermal on read.
+        timestamp: capture time of the frame (defaults to the insert time).
+        Encoding runs outside the connection lock; with batching the row is committed
+        within `batch_interval` seconds.
+        Raises on failure (after logging it), so callers such as FrameWriter can retry and count it.
+        A failed batch commit raises CommitError in this call or, if the flush thread committed,
+        in the next one; its `lost` frames were already reported as stored.
+        """
         try:
-            timestamp = time.time()
-            success, buffer = cv2.imencode('.jpg', frame)
+            start = time.monotonic()
+            if timestamp is None:
+                timestamp = time.time()
+            if frame is None and thermal is None:
+                raise ValueError("Neither a palette image nor a thermal matrix given.")
+            success, buffer = cv2.imencode('.jpg', frame) if frame is not None else (True, None)
             if success:
-                self.conn.execute(
-                    "INSERT INTO frames (timestamp, image) VALUES (?, ?)",
-                    (timestamp, buffer.tobytes())
-                )
-                self.conn.commit()
+                image_blob = buffer.tobytes() if buffer is not None else None
+                thermal_blob, thermal_width, thermal_height = None, None, None
+                if thermal is not None:
+                    thermal_blob = encode_thermal(thermal, self.thermal_compression)
+                    thermal_height, thermal_width = thermal.shape[:2]
+                with self._lock:
+                    self._raise_commit_error()
+                    self.conn.execute(
+                        "INSERT INTO frames (timestamp, image, thermal, thermal_width, thermal_height) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (timestamp, image_blob, thermal_blob, thermal_width, thermal_height)
+                    )
+                    self.frames_written += 1
+                    self.bytes_written += len(image_blob or b"") + len(thermal_blob or b"")
+                    self._pending += 1
+                    if self._first_pending is None:
+                        self._first_pending = time.monotonic()
+                        self._flush_event.set()
+                    if self._pending >= self.batch_size or \
+                            time.monotonic() - self._first_pending >= self.batch_interval:
+                        self._commit()
+                        self._raise_commit_error(inserted=True)
+                self.insert_time += time.monotonic() - start
                 logging.debug(f"[DB] Frame inserted at {timestamp}")
             else:
-                logging.warning("[DB] Frame encoding failed.")
+                raise ValueError("JPEG encoding failed.")
         except Exception as e:
             logging.error(f"[DB] Error inserting frame: {e}")
+            raise
+
+    def _commit(self):
+        # Caller holds self._lock
+        if not self._pending:
+            return
+        start = time.monotonic()
+        try:
+            self.conn.commit()
+        except Exception as e:
+            lost = self._pending
+            self.commit_errors += 1
+            self.frames_lost += lost
+            self.frames_written -= lost
+            self._pending = 0
+            self._first_pending = None
+            try:
+                self.conn.rollback()
+            except Exception as rollback_error:
+                logging.error(f"[DB] Rollback failed: {rollback_error}")
+            lost += self._commit_error.lost if self._commit_error else 0   # Not raised yet
+            self._commit_error = CommitError(f"Commit failed, {lost} frames lost: {e}", lost)
+            logging.error(f"[DB] {self._commit_error}")
+            return
+        end = time.monotonic()
+        self.commits += 1
+        self.commit_time += end - start
+        self.max_commit_time = max(self.max_commit_time, end - start)
+        self.max_flush_latency = max(self.max_flush_latency, end - self._first_pending)
+        self._pending = 0
+        self._first_pending = None
+
+    def _raise_commit_error(self, inserted=False):
+        # Caller holds self._lock. inserted: the current frame was in the failed batch; the
+        # exception itself reports it, so it is not counted as lost to the caller.
+        error, self._commit_error = self._commit_error, None
+        if error is not None:
+            if inserted:
+                error.lost -= 1
+            raise error
+
+    def _flush_loop(self):
+        """
+        Commits a partial batch once its oldest frame waited `batch_interval` seconds.
+        """
+        while not self._closed.is_set():
+            if not self._flush_event.wait(timeout=1.0):
+                continue
+            with self._lock:
+                first = self._first_pending
+            if first is None:
+                self._flush_event.clear()
+                continue
+            remaining = first + self.batch_interval - time.monotonic()
+            if remaining > 0 and self._closed.wait(remaining):
+                break
+            with self._lock:
+                if self._first_pending is not None and \
+                        time.monotonic() - self._first_pending >= self.batch_interval:
+                    self._commit()
+                if self._first_pending is None:
+                    self._flush_event.clear()
+
+    def flush(self):
+        """
+        Commits all pending frames now.
+        """
+        with self._lock:
+            self._commit()
+
+    def _prune_loop(self):
+        while not self._closed.wait(self.prune_interval):
+            try:
+                self.prune()
+            except Exception as e:
+                logging.error(f"[DB] Retention pruning failed: {e}")
+
+    def _delete_batch(self, where, params=()):
+        """
+        Deletes up to prune_batch of the oldest frames matching `where` in one short transaction.
+        Returns the number of deleted rows.
+        """
+        start = time.monotonic()
+        with self._lock:
+            self._commit()  # Pending inserts are committed first so batch accounting stays correct
+            cursor = self.conn.execute(
+                f"DELETE FROM frames WHERE id IN (SELECT id FROM frames {where} ORDER BY timestamp ASC LIMIT ?)",
+                (*params, self.prune_batch)
+            )
+            self.conn.commit()
+        self.max_prune_batch_time = max(self.max_prune_batch_time, time.monotonic() - start)
+        return cursor.rowcount
+
+    def used_bytes(self):
+        """
+        Bytes held by live pages (file size minus free pages).
+        """
+        with self._lock:
+            page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def prune(self, now=None):
+        """
+        Applies the retention limits once: deletes frames older than max_age, then the oldest frames
+        until the live data fits max_size_bytes, and finally returns free pages to the file system.
+        Returns the number of deleted frames.
+        """
+        now = time.time() if now is None else now
+        deleted = 0
+        if self.max_age is not None:
+            while not self._closed.is_set():
+                count = self._delete_batch("WHERE timestamp < ?", (now - self.max_age,))
+                deleted += count
+                if count < self.prune_batch:
+                    break
+        if self.max_size_bytes is not None:
+            while not self._closed.is_set() and self.used_bytes() > self.max_size_bytes:
+                count = self._delete_batch("")
+                deleted += count
+                if count == 0:
+                    break
+        if deleted:
+            self.rows_pruned += deleted
+            self._incremental_vacuum()
+            logging.info(f"[DB] Retention removed {deleted} frames.")
+        self.last_prune_time = now
+        return deleted
+
+    def _incremental_vacuum(self, pages_per_step=256):
+        # Released in small steps so inserts can interleave
+        while not self._closed.is_set():
+            with self._lock:
+                free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if free_pages == 0 or self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                    return
+                self._commit()
+                self.conn.execute(f"PRAGMA incremental_vacuum({pages_per_step})").fetchall()
+                self.conn.commit()
+                self.pages_vacuumed += min(free_pages, pages_per_step)
+
+    def get_write_stats(self):
+        """
+        Write throughput and commit latency since the database was opened.
+        """
+        with self._lock:
+            elapsed = max(time.monotonic() - self._stats_start, 1e-9)
+            return {
+                "frames_written": self.frames_written,
+                "frames_per_second": round(self.frames_written / elapsed, 2),
+                "bytes_per_second": round(self.bytes_written / elapsed),
+                "commits": self.commits,
+                "commit_errors": self.commit_errors,
+                "frames_lost": self.frames_lost,
+                "frames_per_commit": round(self.frames_written / self.commits, 2) if self.commits else None,
+                "avg_commit_ms": round(self.commit_time / self.commits * 1000, 3) if self.commits else None,
+                "max_commit_ms": round(self.max_commit_time * 1000, 3),
+                "avg_insert_ms": round(self.insert_time / self.frames_written * 1000, 3)
+                if self.frames_written else None,
+                "max_flush_latency_ms": round(self.max_flush_latency * 1000, 3),
+                "pending": self._pending,
+                "rows_pruned": self.rows_pruned,
+                "pages_vacuumed": self.pages_vacuumed,
+                "max_prune_batch_ms": round(self.max_prune_batch_time * 1000, 3),
+                "last_prune_time": self.last_prune_time,
+            }
 
     def get_frames_from_last_n_seconds(self, seconds=10):
         try:
             now = time.time()
             start_time = now - seconds
-            cursor = self.conn.execute(
-                "SELECT image FROM frames WHERE timestamp >= ? ORDER BY timestamp ASC",
-                (start_time,)
-            )
-            frames = [cv2.imdecode(np.frombuffer(row[0], np.uint8), cv2.IMREAD_COLOR)
-                      for row in cursor.fetchall()]
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT image, thermal, thermal_width, thermal_height FROM frames "
+                    "WHERE timestamp >= ? ORDER BY timestamp ASC",
+                    (start_time,)
+                ).fetchall()
+            frames = [self._decode_image(*row) for row in rows]
             logging.debug(f"[DB] Retrieved {len(frames)} frames from last {seconds} seconds.")
             return frames
         except Exception as e:
             logging.error(f"[DB] Error retrieving frames: {e}")
             return []
 
+    def get_jpeg_frames_from_last_n_seconds(self, seconds=10, quality=95):
+        """
+        Returns the stored JPEG bytes of the last `seconds` without decoding them, for muxing
+        straight into an MJPG video. Thermal-only rows are rendered and encoded once.
+        """
+        try:
+            start_time = time.time() - seconds
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT image, thermal, thermal_width, thermal_height FROM frames "
+                    "WHERE timestamp >= ? ORDER BY timestamp ASC",
+                    (start_time,)
+                ).fetchall()
+            frames = [bytes(row[0]) if row[0] is not None else encode_jpeg(self._decode_image(*row), quality)
+                      for row in rows]
+            logging.debug(f"[DB] Retrieved {len(frames)} JPEG frames from last {seconds} seconds.")
+            return frames
+        except Exception as e:
+            logging.error(f"[DB] Error retrieving JPEG frames: {e}")
+            return []
+
+    def _decode_image(self, image, thermal, width, height):
+        if image is not None:
+            return cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+        return self.palette.render(decode_thermal(thermal, width, height))
+
+    def get_thermal_frames(self, start_time, end_time=None, raw=False):
+        """
+        Returns (timestamps, frames) for all frames with radiometric data in [start_time, end_time].
+        frames is a (N, height, width) array in °C (float32), or raw uint16 values if `raw` is set.
+        Frames whose resolution differs from the first one in the range are skipped.
+        """
+        try:
+            if end_time is None:
+                end_time = time.time()
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT timestamp, thermal, thermal_width, thermal_height FROM frames "
+                    "WHERE timestamp >= ? AND timestamp <= ? AND thermal IS NOT NULL ORDER BY timestamp ASC",
+                    (start_time, end_time)
+                ).fetchall()
+            if not rows:
+                return np.empty(0), np.empty((0, 0, 0), dtype=np.uint16 if raw else np.float32)
+
+            width, height = rows[0][2], rows[0][3]
+            rows = [row for row in rows if row[2] == width and row[3] == height]
+            timestamps = np.array([row[0] for row in rows])
+            frames = np.empty((len(rows), height, width), dtype=np.uint16)
+            for i, row in enumerate(rows):
+                frames[i] = decode_thermal(row[1], width, height)
+            logging.debug(f"[DB] Retrieved {len(rows)} thermal frames.")
+            return timestamps, frames if raw else raw_to_celsius(frames)
+        except Exception as e:
+            logging.error(f"[DB] Error retrieving thermal frames: {e}")
+            return np.empty(0), np.empty((0, 0, 0), dtype=np.uint16 if raw else np.float32)
+
     def close(self):
         try:
-            self.conn.close()
+            self._closed.set()
+            self._flush_event.set()
+            if self._flusher:
+                self._flusher.join(timeout=1.0)
+            if self._pruner:
+                self._pruner.join(timeout=1.0)
+            with self._lock:
+                self._commit()
+                self.conn.close()
             logging.info("[DB] Connection closed.")
         except Exception as e:
             logging.error(f"[DB] Error closing database: {e}")
@@ -0,0 +1,252 @@
+import argparse
+import csv
+import datetime
+import json
+import logging
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+
+FRAME_LOG_MAGIC = b"FRAMELOG1\n"
+MODES = ("Normal", "Test", "Fault")
+ZONE_FIELDS = ("max", "mean", "hot_pixels")
+BASE_COLUMNS = ["timestamp", "mode", "temperature", "recording", "flag_valid", "flag_state",
+                "counter", "counter_hw", "hw_timestamp"]
+
+
+def record_dtype(zone_names=()):
+    """
+    Fixed-width record of one frame; every zone adds max, mean (°C) and hot_pixels.
+    """
+    fields = [("timestamp", "<f8"), ("temperature", "<f4"), ("mode", "u1"), ("recording", "u1"),
+              ("flag_valid", "u1"), ("flag_state", "i1"), ("counter", "<u4"), ("counter_hw", "<u4"),
+              ("hw_timestamp", "<i8")]
+    for i in range(len(zone_names)):
+        fields += [(f"zone{i}_max", "<f4"), (f"zone{i}_mean", "<f4"), (f"zone{i}_hot_pixels", "<u4")]
+    return np.dtype(fields)
+
+
+def csv_columns(zone_names=()):
+    return BASE_COLUMNS + [f"zone_{name}_{field}" for name in zone_names for field in ZONE_FIELDS]
+
+
+def read_frame_log(path):
+    """
+    Returns (zone_names, records) of a binary frame log; a record cut short by a crash is ignored.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(FRAME_LOG_MAGIC)) != FRAME_LOG_MAGIC:
+            raise ValueError(f"{path} is not a binary frame log.")
+        header = json.loads(f.readline())
+        data = f.read()
+    dtype = record_dtype(header["zones"])
+    return header["zones"], np.frombuffer(data, dtype=dtype, count=len(data) // dtype.itemsize)
+
+
+def _csv_row(record, zone_names):
+    # record: a structured array record or a dict with the same fields
+    temp = float(record["temperature"])
+    row = [datetime.datetime.fromtimestamp(float(record["timestamp"])).isoformat(),
+           MODES[record["mode"]] if record["mode"] < len(MODES) else "",
+           f"{temp:.2f}" if not math.isnan(temp) else "N/A",
+           bool(record["recording"]), bool(record["flag_valid"]), int(record["flag_state"]),
+           int(record["counter"]), int(record["counter_hw"]), int(record["hw_timestamp"])]
+    for i in range(len(zone_names)):
+        row += [f"{record[f'zone{i}_max']:.2f}", f"{record[f'zone{i}_mean']:.2f}", int(record[f"zone{i}_hot_pixels"])]
+    return row
+
+
+def convert_to_csv(path, csv_path=None):
+    """
+    Writes a binary frame log as CSV (columns as in CSV mode). Returns the CSV path.
+    """
+    path = Path(path)
+    csv_path = Path(csv_path) if csv_path else path.with_suffix(".csv")
+    zone_names, records = read_frame_log(path)
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_columns(zone_names))
+        writer.writerows(_csv_row(record, zone_names) for record in records)
+    return csv_path
+
+
+class FrameLog:
+    """
+    Per-frame telemetry log (time, mode, temperature, recording state, shutter flag, camera counters
+    and per-zone statistics) with one file kept open and buffered writes.
+
+    Binary format: a header (magic + JSON line with the zone names) followed by fixed-width records
+    (see record_dtype); records are collected in a preallocated numpy array and written in one call
+    per `flush_interval`. CSV format writes the same fields as text.
+    The file is rotated when it exceeds `max_bytes`, is older than `rotate_interval`, or the zones
+    change; rotated files get a time suffix and only the newest `backup_count` are kept.
+    """
+
+    def __init__(self, path="frame_log.bin", binary=True, flush_interval=1.0, max_bytes=64 * 1024 * 1024,
+                 rotate_interval=24 * 3600, backup_count=30, buffer_records=256):
+        self.path = Path(path)
+        self.binary = binary
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.records = 0
+        self.flushes = 0
+        self.rotations = 0
+        self._zones = None
+        self._file = None
+        self._csv = None
+        self._buffer = np.zeros(max(1, buffer_records), dtype=record_dtype())
+        self._rows = []
+        self._pending = 0
+        self._opened_at = None
+        self._last_flush = time.monotonic()
+
+    def _header_matches(self, zone_names):
+        try:
+            if self.binary:
+                with open(self.path, "rb") as f:
+                    return f.read(len(FRAME_LOG_MAGIC)) == FRAME_LOG_MAGIC and \
+                        json.loads(f.readline())["zones"] == list(zone_names)
+            with open(self.path, newline="") as f:
+                return next(csv.reader(f), None) == csv_columns(zone_names)
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def _open(self, zone_names):
+        zone_names = list(zone_names)
+        if self.path.exists() and self.path.stat().st_size and not self._header_matches(zone_names):
+            self._rotate_file()
+        new = not self.path.exists() or not self.path.stat().st_size
+        if self.binary:
+            self._file = open(self.path, "ab")
+            if new:
+                self._file.write(FRAME_LOG_MAGIC + json.dumps({"zones": zone_names}).encode() + b"\n")
+            self._buffer = np.zeros(len(self._buffer), dtype=record_dtype(zone_names))
+        else:
+            self._file = open(self.path, "a", newline="")
+            self._csv = csv.writer(self._file)
+            if new:
+                self._csv.writerow(csv_columns(zone_names))
+        self._file.flush()  # Readers see the header before the first records
+        self._zones = zone_names
+        self._opened_at = time.time()
+
+    def _rotate_file(self):
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        target = self.path.with_name(f"{self.path.stem}_{stamp}{self.path.suffix}")
+        count = 0
+        while target.exists():  # Several rotations within one second
+            count += 1
+            target = self.path.with_name(f"{self.path.stem}_{stamp}_{count}{self.path.suffix}")
+        self.path.rename(target)
+        self.rotations += 1
+        logging.info(f"[LOG] Frame log rotated to {target.name}.")
+        backups = sorted(self.path.parent.glob(f"{self.path.stem}_*{self.path.suffix}"))
+        for old in backups[:-self.backup_count] if self.backup_count else []:
+            old.unlink(missing_ok=True)
+
+    def rotate(self):
+        """
+        Closes the current file and starts a new one.
+        """
+        zones = self._zones
+        self.close()
+        if self.path.exists():
+            self._rotate_file()
+        if zones is not None:
+            self._open(zones)
+
+    def log(self, timestamp, mode, temperature, recording, flag_valid=True, info=None, zones=None):
+        """
+        Adds one frame. info: camera metadata (counter, counter_hw, hw_timestamp, flag_state);
+        zones: {name: {"max", "mean", "hot_pixels", ...}} as computed by RoiEngine.
+        Frames without zone statistics (camera errors) keep the current zones with NaN / 0 values;
+        only a different set of zones starts a new file.
+        """
+        zones = zones or {}
+        zone_names = list(zones) if zones else list(self._zones or [])
+        if self._file is None or zone_names != self._zones:
+            self.close()
+            self._open(zone_names)
+        info = info or {}
+        values = {
+            "timestamp": timestamp,
+            "temperature": temperature if temperature is not None else float("nan"),
+            "mode": MODES.index(mode) if mode in MODES else 255,
+            "recording": bool(recording),
+            "flag_valid": bool(flag_valid),
+            "flag_state": info.get("flag_state") if info.get("flag_state") is not None else -1,
+            "counter": info.get("counter") or 0,
+            "counter_hw": info.get("counter_hw") or 0,
+            "hw_timestamp": info.get("hw_timestamp") or 0,
+        }
+        for i, name in enumerate(zone_names):
+            stats = zones.get(name) or {}
+            for field in ZONE_FIELDS:
+                values[f"zone{i}_{field}"] = stats.get(field, 0 if field == "hot_pixels" else float("nan"))
+        if self.binary:
+            record = self._buffer[self._pending]
+            for key, value in values.items():
+                record[key] = value
+        else:
+            self._rows.append(values)
+        self._pending += 1
+        self.records += 1
+        if self._pending >= len(self._buffer) or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _write_pending(self):
+        if not self._pending:
+            return
+        if self.binary:
+            self._file.write(self._buffer[:self._pending].tobytes())
+        else:
+            self._csv.writerows(_csv_row(values, self._zones) for values in self._rows)
+            self._rows = []
+        self._pending = 0
+        self.flushes += 1
+
+    def flush(self):
+        if self._file is None:
+            return
+        self._write_pending()
+        self._file.flush()
+        self._last_flush = time.monotonic()
+        if (self.max_bytes and self._file.tell() >= self.max_bytes) or \
+                (self.rotate_interval and time.time() - self._opened_at >= self.rotate_interval):
+            self.rotate()
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            self._write_pending()
+        finally:
+            self._file.close()
+            self._file = self._csv = None
+
+    def get_status(self):
+        return {
+            "path": str(self.path),
+            "format": "binary" if self.binary else "csv",
+            "records": self.records,
+            "pending": self._pending,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "size_bytes": self._file.tell() if self._file is not None else None,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a binary frame log to CSV.")
+    parser.add_argument("path", help="binary frame log (frame_log.bin or a rotated file)")
+    parser.add_argument("csv_path", nargs="?", help="output file (default: same name with .csv)")
+    args = parser.parse_args()
+    print(convert_to_csv(args.path, args.csv_path))
+
+
+if __name__ == "__main__":
+    main()
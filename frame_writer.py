@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from collections import deque
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "decimate")
+
+
+class FrameWriter:
+    """
+    Stores frames from a bounded queue in a background thread so capture and alarm
+    evaluation never wait for JPEG encoding, commits or retries.
+    When the queue is full the overflow policy decides what is lost:
+    drop_oldest discards the oldest queued frame, drop_newest discards the new frame,
+    decimate discards every second queued frame (the stored sequence keeps its time span
+    at half the frame rate).
+    """
+
+    def __init__(self, db, capacity=128, policy="drop_oldest", retries=3, retry_delay=0.2, on_error=None,
+                 on_timing=None):
+        """
+        db: object with insert_frame(frame, thermal=None, timestamp=None), e.g. FrameDatabase.
+        on_error: callback(message) after a frame could not be stored within `retries` attempts, or when
+                  the database reports frames lost after they were stored (an exception with `lost`).
+        on_timing: callback(seconds) with the duration of every successful insert (encoding and commit).
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}', expected one of {', '.join(OVERFLOW_POLICIES)}.")
+        self.db = db
+        self.capacity = max(1, capacity)
+        self.policy = policy
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.on_error = on_error
+        self.on_timing = on_timing
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = {name: 0 for name in OVERFLOW_POLICIES}
+        self.max_depth = 0
+        self.last_error = None
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="frame-writer", daemon=True)
+        self._thread.start()
+        logging.info(f"[WRITER] Frame writer started (queue {self.capacity}, {self.policy}).")
+
+    def stop(self, timeout=5.0, drain=True):
+        """
+        Stops the writer; with `drain` the frames still queued are written first (up to `timeout`).
+        """
+        with self._cond:
+            if not drain:
+                self._queue.clear()
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._queue:
+            logging.warning(f"[WRITER] {len(self._queue)} queued frames were not stored.")
+        logging.info("[WRITER] Frame writer stopped.")
+
+    @staticmethod
+    def _retain(array):
+        # Pooled cameras hand out read-only views into reused buffers; the queue outlives them
+        if array is None or array.flags.writeable:
+            return array
+        return array.copy()
+
+    def submit(self, frame, thermal=None, timestamp=None):
+        """
+        Queues a frame for storage without blocking. Returns False if the frame itself was dropped.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._cond:
+            self.submitted += 1
+            if len(self._queue) >= self.capacity:
+                if self.policy == "drop_newest":
+                    self.dropped["drop_newest"] += 1
+                    return False
+                if self.policy == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped["drop_oldest"] += 1
+                else:
+                    # Keep every second frame, counted back from the newest one
+                    kept = list(self._queue)[(len(self._queue) - 1) % 2::2]
+                    self.dropped["decimate"] += len(self._queue) - len(kept)
+                    self._queue = deque(kept)
+            self._queue.append((self._retain(frame), self._retain(thermal), timestamp))
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify()
+        return True
+
+    insert_frame = submit  # Drop-in replacement where a database object is expected
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and self._running:
+                    self._cond.wait()
+                if not self._queue:
+                    break
+                frame, thermal, timestamp = self._queue.popleft()
+                self._busy = True
+            self._write(frame, thermal, timestamp)
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _write(self, frame, thermal, timestamp):
+        for attempt in range(1, self.retries + 1):
+            try:
+                start = time.perf_counter()
+                self.db.insert_frame(frame, thermal=thermal, timestamp=timestamp)
+                self.written += 1
+                if self.on_timing:
+                    self.on_timing(time.perf_counter() - start)
+                return
+            except Exception as e:
+                self.last_error = str(e)
+                logging.warning(f"[WRITER] Insert failed on attempt {attempt}: {e}")
+                lost = getattr(e, "lost", 0)   # Earlier frames a failed batch commit rolled back
+                if lost:
+                    self.written -= lost
+                    self.failed += lost
+                    if self.on_error:
+                        self.on_error(f"{lost} stored frames lost in a failed database commit.")
+                if attempt < self.retries:
+                    time.sleep(self.retry_delay)
+        self.failed += 1
+        if self.on_error:
+            self.on_error("Failed to insert frame into DB after retries.")
+
+    def wait_until_idle(self, timeout=None):
+        """
+        Waits until every queued frame was handed to the database. Returns False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def get_status(self):
+        with self._cond:
+            return {
+                "running": self._running,
+                "policy": self.policy,
+                "queue_depth": len(self._queue),
+                "capacity": self.capacity,
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "written": self.written,
+                "failed": self.failed,
+                "dropped": dict(self.dropped),
+                "dropped_total": sum(self.dropped.values()),
+                "last_error": self.last_error,
+            }
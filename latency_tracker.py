@@ -0,0 +1,164 @@
+import datetime
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram:
+    """
+    Rolling window of latency samples (seconds) with percentiles over the window and the
+    all-time worst case, which the window alone would forget.
+    """
+
+    def __init__(self, window=1024):
+        self._samples = np.zeros(max(1, window), dtype=np.float64)
+        self._next = 0
+        self.count = 0
+        self.max = None
+        self.max_time = None   # Wall-clock time the worst case was recorded
+
+    def add(self, seconds):
+        self._samples[self._next] = seconds
+        self._next = (self._next + 1) % len(self._samples)
+        self.count += 1
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+            self.max_time = time.time()
+
+    def to_dict(self):
+        samples = self._samples[:min(self.count, len(self._samples))]
+        if not len(samples):
+            return {"count": 0}
+        result = {"count": self.count, "window": len(samples), "mean_ms": round(float(samples.mean()) * 1000, 3)}
+        for p, value in zip(PERCENTILES, np.percentile(samples, PERCENTILES)):
+            result[f"p{p}_ms"] = round(float(value) * 1000, 3)
+        result["window_max_ms"] = round(float(samples.max()) * 1000, 3)
+        result["max_ms"] = round(self.max * 1000, 3)
+        result["max_at"] = datetime.datetime.fromtimestamp(self.max_time).isoformat()
+        return result
+
+
+class LatencyTracker:
+    """
+    Stamps the alarm path at capture, detection, decision and actuation (monotonic clock) and keeps
+    a LatencyHistogram per stage pair:
+    - capture_to_detection: every frame, from the camera read to the evaluated alarm temperature
+    - capture_to_decision: every alarm, to the moment the alarm was decided
+    - capture_to_<output>: every alarm, to the successful switching of each output
+    - capture_to_alarm: every alarm, to the first output switched (the reaction time)
+    """
+
+    def __init__(self, window=1024, traces=32):
+        """
+        window: samples per histogram used for the percentiles.
+        traces: completed alarm traces kept for dump().
+        """
+        self.window = window
+        self.histograms = {}
+        self._open = OrderedDict()           # trace id -> stage stamps of alarms not fully actuated
+        self._traces = deque(maxlen=traces)  # Latest alarm traces, oldest first
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _add(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram(self.window)
+        histogram.add(seconds)
+
+    def frame(self, capture, detection=None):
+        """
+        Records the detection latency of one frame.
+        """
+        detection = time.monotonic() if detection is None else detection
+        with self._lock:
+            self._add("capture_to_detection", detection - capture)
+
+    def alarm(self, capture, detection, decision=None, outputs=(), source=None):
+        """
+        Opens the trace of an alarm decided now (or at `decision`). Returns its id for actuated().
+        outputs: names of the outputs the trace waits for.
+        """
+        decision = time.monotonic() if decision is None else decision
+        trace = {"id": next(self._ids), "time": time.time(), "source": source,
+                 "capture": capture, "detection": detection, "decision": decision,
+                 "actuation": {}, "pending": set(outputs), "already_active": set()}
+        with self._lock:
+            self._add("capture_to_decision", decision - capture)
+            self._traces.append(trace)
+            if trace["pending"]:
+                self._open[trace["id"]] = trace
+                while len(self._open) > self._traces.maxlen:
+                    self._open.popitem(last=False)  # Outputs that never switched
+        return trace["id"]
+
+    def scheduled(self, trace_id, outputs):
+        """
+        Narrows the outputs `trace_id` waits for to the ones actually switched for it; the others
+        (e.g. a latched output that was still on) are reported as already active, not as not actuated.
+        """
+        with self._lock:
+            trace = self._open.get(trace_id)
+            if trace is None:
+                return
+            skipped = trace["pending"] - set(outputs)
+            trace["pending"] -= skipped
+            trace["already_active"] |= skipped
+            if not trace["pending"]:
+                del self._open[trace_id]
+
+    def actuated(self, trace_id, output, actuation=None):
+        """
+        Stamps the actuation of `output` for the alarm `trace_id`.
+        """
+        actuation = time.monotonic() if actuation is None else actuation
+        with self._lock:
+            trace = self._open.get(trace_id)
+            if trace is None or output not in trace["pending"]:
+                return
+            if not trace["actuation"]:
+                self._add("capture_to_alarm", actuation - trace["capture"])
+            trace["pending"].discard(output)
+            trace["actuation"][output] = actuation
+            self._add(f"capture_to_{output.lower()}", actuation - trace["capture"])
+            if not trace["pending"]:
+                del self._open[trace_id]
+
+    def get_status(self):
+        with self._lock:
+            return {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+
+    def _trace_dict(self, trace):
+        capture = trace["capture"]
+        return {
+            "id": trace["id"],
+            "time": datetime.datetime.fromtimestamp(trace["time"]).isoformat(),
+            "source": trace["source"],
+            "detection_ms": round((trace["detection"] - capture) * 1000, 3),
+            "decision_ms": round((trace["decision"] - capture) * 1000, 3),
+            "actuation_ms": {name: round((t - capture) * 1000, 3) for name, t in trace["actuation"].items()},
+            "not_actuated": sorted(trace["pending"]),
+            "already_active": sorted(trace["already_active"]),
+        }
+
+    def dump(self, path=None):
+        """
+        Returns the histograms and the latest alarm traces (milliseconds from capture);
+        with `path` they are also written there as JSON.
+        """
+        with self._lock:
+            report = {
+                "time": datetime.datetime.now().isoformat(),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                "traces": [self._trace_dict(trace) for trace in self._traces],
+            }
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,138 @@
+import atexit
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+_listener = None
+_queue_handler = None
+_atexit_registered = False
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `burst` records per call site (file and line) through every `interval` seconds,
+    so a message logged for every frame cannot flood the log. The first record of a new window
+    tells how many records of that call site were suppressed in the last one.
+    Records at `exempt_level` and above always pass: errors share call sites (log_error_to_user),
+    so one noisy error must not hide another.
+    """
+
+    def __init__(self, interval=10.0, burst=5, exempt_level=logging.ERROR):
+        super().__init__()
+        self.exempt_level = exempt_level
+        self.interval = interval
+        self.burst = burst
+        self.suppressed = 0
+        self._sites = {}   # (pathname, lineno) -> [window start, records passed, records suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.interval or self.burst is None or record.levelno >= self.exempt_level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.interval:
+                suppressed = site[2] if site is not None else 0
+                self._sites[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} [{suppressed} similar messages suppressed]"
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler for a bounded queue: when the listener falls behind (e.g. a slow console),
+    records are dropped and counted instead of blocking the thread that logs.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _parse_level(level):
+    if isinstance(level, str):
+        return logging.getLevelName(level.upper())
+    return level
+
+
+def setup_logging(log_file="system.log", level=logging.INFO, max_bytes=10 * 1024 * 1024, backup_count=5,
+                  console_level=logging.INFO, rate_limit_interval=10.0, rate_limit_burst=5, queue_size=10000):
+    """
+    Routes the root logger through a queue: callers only enqueue the record, a listener thread
+    formats it and writes the size-rotated `log_file` and the console.
+    console_level: level name or number for the console (None = no console output).
+    rate_limit_interval / rate_limit_burst: see RateLimitFilter (interval 0 = no rate limit).
+    Calling it again replaces the previous pipeline; handlers added by others (e.g. pytest) are kept.
+    """
+    global _listener, _queue_handler, _atexit_registered
+    stop_logging()
+
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes or 0, backupCount=backup_count,
+                                       encoding="utf-8")
+    handlers = [file_handler]
+    if console_level is not None:
+        console = logging.StreamHandler(sys.stderr)
+        console.setLevel(_parse_level(console_level))
+        handlers.append(console)
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+    _queue_handler.addFilter(RateLimitFilter(rate_limit_interval, rate_limit_burst))
+    root = logging.getLogger()
+    root.setLevel(_parse_level(level))
+    root.addHandler(_queue_handler)
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    if not _atexit_registered:
+        atexit.register(stop_logging)
+        _atexit_registered = True
+    return _listener
+
+
+def stop_logging():
+    """
+    Writes the queued records and closes the handlers of the pipeline.
+    """
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def get_logging_status():
+    if _queue_handler is None:
+        return {"active": False}
+    rate_limit = _queue_handler.filters[0]
+    return {
+        "active": True,
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "suppressed": rate_limit.suppressed,
+    }
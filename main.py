@@ -6,11 +6,10 @@ import time
 import threading
 import json
 import logging
-import csv
-from queue import Queue
 
 
 USE_MOCK_CAMERA = True
+USE_SYNTHETIC_CAMERA = False  # Generated thermal scenes (mocks/synthetic_camera.py), takes precedence over the mock
 USE_MOCK_IO = False
 USE_MOCK_DB = False
 
@@ -24,34 +23,92 @@ if USE_MOCK_DB:
 else:
     from frame_database import FrameDatabase
 
+from capture_engine import CaptureEngine, CapturedFrame
+from roi_engine import RoiEngine, select_alarm_temperature
+from multi_camera import MultiCameraSupervisor
+from network_camera import NetworkCameraController
+from palette import PaletteLut, PALETTE_NAMES
+from mocks.replay_camera import ReplayCameraController
+from mocks.synthetic_camera import SyntheticCameraController
+from frame_writer import FrameWriter, OVERFLOW_POLICIES
+from pre_event_buffer import PreEventBuffer
+from video_encoder import create_video_writer, VIDEO_CODECS
+from event_manager import EventManager
+from segment_recorder import SegmentRecorder, extract_segments
+from frame_log import FrameLog
+from log_pipeline import setup_logging, get_logging_status
+from actuator import ActuatorExecutor, Output
+from latency_tracker import LatencyTracker
+from metrics import MetricsRegistry, MetricsServer
+
 
 MANUAL_RECORD_LIMIT = 600  # Default maximum duration for manual recording
 
 MIN_RECORD_DURATION = 10  # Minimum record time (seconds)
 PRE_EVENT_DURATION = 10   # Pre-event frames for anomaly video
+# The pre-event ring holds PRE_EVENT_DURATION * CAPTURE_FPS * 1.25 frames: at 10 s and 32 fps about 23 MB
+# at 160x120 but 368 MB at 640x480 (246 MB of uint16 matrices in thermal-only mode), copied once per clip
+PRE_EVENT_MEMORY_MB = 128  # A larger pre-event ring is logged as a warning
 
 START_THRESHOLD = 50.0  # Default start threshold (°C)
 STOP_THRESHOLD = 45.0   # Default stop thre shold (°C)
 
 TEMP_THRESHOLD = 50.0
 POST_EVENT_DURATION = 5
+CAPTURE_FPS = 32          # Native frame rate of the imager
+CAPTURE_BUFFER_SIZE = 64  # Frames kept in the capture ring buffer
+CAMERA_BUFFER_SLOTS = 16  # Preallocated SDK frame slots (0 = allocate a new frame per read)
+STORE_THERMAL = True      # Store the raw radiometric matrix next to the palette JPEG
+ROI_CONFIG = {}           # {"zones": [{"name", "rect"/"polygon", "hot_threshold"}], "percentile", "hot_threshold"}
+ALARM_ZONE = None         # Zone name, "*" for the hottest zone, or None for the whole-frame mean
+ALARM_STAT = "max"        # Zone statistic compared against START/STOP_THRESHOLD
+ALARM_STATS = ("min", "max", "mean", "percentile")
+CAMERAS = []              # [{"serial": ..., per-camera overrides}]; the first one runs in this process
+                          # "network": {"port", "sender_ip"} receives the camera over UDP instead of USB
+FLAG_FRAME_POLICY = "skip"  # Frames from a shutter flag cycle: "skip" = not stored/recorded, "store" = keep
+FLAG_SETTLE_FRAMES = 2      # Frames after the flag reopened that are still treated as invalid
+FLAG_TIMEOUT = 10           # Seconds a flag cycle may last before the camera is put in FAULT mode
+THERMAL_ONLY = False      # Fetch only the thermal matrix and render palette images here when needed
+PALETTE = "iron"          # Palette for locally rendered images (see palette.PALETTE_NAMES)
+PALETTE_SPAN = None       # [min, max] °C mapped onto the palette, or None to stretch each frame
+REPLAY = None             # {"path": .db/.npz/.avi, "speed", "loop", ...} replays a recording instead of a camera
+HEADLESS = False          # No preview window and no keyboard input (servers, build machines)
+SYNTHETIC_CONFIG = {}     # Scene parameters of the synthetic camera (width, height, fps, hotspots, ramps, ...)
+DB_BATCH_SIZE = 16        # Frames per database commit
+DB_BATCH_INTERVAL = 0.25  # Longest time (s) a stored frame waits for its commit
+DB_SYNCHRONOUS = "NORMAL" # SQLite synchronous level in WAL mode (OFF, NORMAL, FULL)
+STORAGE_QUEUE_SIZE = 128  # Frames waiting for the background writer
+DB_MAX_AGE = 3600         # Seconds of frames kept in frame_store.db (None = no age limit)
+DB_MAX_SIZE_MB = 4096     # Live data size limit of frame_store.db (None = no size limit)
+STORAGE_OVERFLOW_POLICY = "drop_oldest"  # Full storage queue: drop_oldest, drop_newest or decimate
+EVENT_MAX_CLIP_DURATION = 60  # Events merge into a running clip until it would exceed this length (seconds)
+SEGMENT_DURATION = 60     # Length of the continuous recording segments (recording type CONTINUOUS)
+SEGMENT_QUOTA_MB = 20480  # Disk quota of the continuous recording; the oldest segments are deleted
+VIDEO_CODEC = "libx264"   # Clip codec: ffmpeg codec (libx264, libx265, ...) or "mjpg"; MJPG if ffmpeg is missing
+VIDEO_CRF = 23            # ffmpeg quality (lower = better, larger files)
+VIDEO_PRESET = "veryfast" # ffmpeg speed/size trade-off
+VIDEO_THREADS = 1         # ffmpeg encoder threads per clip
+FRAME_LOG_FORMAT = "binary"  # Per-frame telemetry log: "binary" (convert with frame_log.py) or "csv"
+FRAME_LOG_MAX_MB = 64     # The frame log is rotated at this size ...
+FRAME_LOG_ROTATE_HOURS = 24  # ... or age
+FRAME_LOG_BACKUPS = 30    # Rotated frame logs kept
+LOG_MAX_MB = 10           # system.log is rotated at this size
+LOG_BACKUPS = 5           # Rotated system logs kept
+LOG_CONSOLE_LEVEL = "INFO"  # Console log level ("WARNING" for slow serial terminals, None = no console)
+LOG_RATE_INTERVAL = 10    # Messages per call site are limited to LOG_RATE_BURST every LOG_RATE_INTERVAL seconds
+LOG_RATE_BURST = 5
+IO_RETRIES = 3            # Attempts per alarm output
+IO_RETRY_BACKOFF = 0.5    # First retry delay (s), doubled per attempt
+IO_DEADLINE = 5.0         # An alarm output is given up when not switched within this many seconds
+RELAIS_HOLD = None        # Seconds the relais stays latched after an alarm (None = until reset)
+METRICS_HOST = "127.0.0.1"  # Prometheus endpoint http://METRICS_HOST:METRICS_PORT/metrics
+METRICS_PORT = 9108       # None = no metrics endpoint
 CONFIG_FILE = "config.json"
 LOG_FILE = "system.log"
-FRAME_LOG_FILE = "frame_log.csv"
+FRAME_LOG_FILE = "frame_log"  # Suffix .bin or .csv from FRAME_LOG_FORMAT
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
+setup_logging(LOG_FILE)  # Reconfigured from config.json by configure_logging()
 
-if not Path(FRAME_LOG_FILE).exists():
-    with open(FRAME_LOG_FILE, mode='w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(["timestamp", "mode", "temperature", "recording"])
 
 
 if USE_MOCK_CAMERA:
@@ -68,17 +125,35 @@ class SystemMode:
 
 # Global Variables 
 cam = None
+capture = None  # CaptureEngine owning `cam`
+roi_engine = None
+roi_failed_shape = None  # Frame shape the configured zones could not be built for
+zone_stats = None  # Latest per-zone statistics
+camera_supervisor = None  # Worker processes for the additional cameras in CAMERAS
+palette = PaletteLut()    # Shared by the camera (thermal-only mode) and the frame database
+frame_writer = None       # Background FrameWriter storing frames into `db`
+pre_event_buffer = None   # Last PRE_EVENT_DURATION seconds of frames for anomaly clips
+event_manager = None      # Records anomaly clips from the frames of the main loop
+segment_recorder = None   # Continuous recording while recording_type is CONTINUOUS
+segment_closer = None     # Thread closing the previous segment_recorder off the frame loop
+frame_log = None          # Per-frame telemetry log
+actuators = None          # ActuatorExecutor switching HUPE, BLITZ and RELAIS
+latency_tracker = LatencyTracker()  # Capture-to-alarm latency of the frame loop and the outputs
+metrics = MetricsRegistry()  # Pipeline metrics, served by metrics_server
+stage_seconds = metrics.histogram("thermal_stage_duration_seconds", "Duration of the frame pipeline stages.",
+                                  ["stage"])
+loop_frames = metrics.counter("thermal_loop_frames_total", "Frames read by the main loop.", ["result"])
+metrics_server = None
 db = None
 mode = SystemMode.NORMAL
 frame = None
+frame_item = None   # CapturedFrame of the current loop iteration; `frame` is only rendered when needed
 temp = None
 recording = False
-anomaly_thread = None
 manual_record_thread = None
 save_dir = Path("Output_data")
 save_dir.mkdir(exist_ok=True)
 camera_lock = threading.Lock()
-db_lock = threading.Lock()
 last_trigger_time = 0
 last_test_time = time.time()
 exit_flag = False
@@ -87,8 +162,6 @@ anomaly_active = False  # To prevent duplicate anomaly videos
 manual_stop_flag = False  # Flag to stop manual recording
 event_recording_enabled = True  # Controls if event-triggered recording is active
 MANUAL_RECORD_LIMIT = 600  # Default manual recording limit (in seconds)
-anomaly_queue = Queue()
-anomaly_worker_thread = None
 anomaly_active = False  # tracks ongoing anomaly
 
 
@@ -112,8 +185,17 @@ def log_error_to_user(message):
 # Config Load/Save 
 def load_config():
     global START_THRESHOLD, STOP_THRESHOLD, save_dir, POST_EVENT_DURATION
-    global MIN_RECORD_DURATION, PRE_EVENT_DURATION, MANUAL_RECORD_LIMIT
+    global MIN_RECORD_DURATION, PRE_EVENT_DURATION, PRE_EVENT_MEMORY_MB, MANUAL_RECORD_LIMIT
     global event_recording_enabled, mode, recording_type
+    global CAPTURE_FPS, CAPTURE_BUFFER_SIZE, CAMERA_BUFFER_SLOTS, STORE_THERMAL
+    global ROI_CONFIG, ALARM_ZONE, ALARM_STAT, roi_engine, roi_failed_shape, CAMERAS
+    global FLAG_FRAME_POLICY, FLAG_SETTLE_FRAMES, FLAG_TIMEOUT, THERMAL_ONLY, PALETTE, PALETTE_SPAN, REPLAY, HEADLESS
+    global SYNTHETIC_CONFIG, DB_BATCH_SIZE, DB_BATCH_INTERVAL, DB_SYNCHRONOUS
+    global STORAGE_QUEUE_SIZE, STORAGE_OVERFLOW_POLICY, DB_MAX_AGE, DB_MAX_SIZE_MB, EVENT_MAX_CLIP_DURATION
+    global SEGMENT_DURATION, SEGMENT_QUOTA_MB, VIDEO_CODEC, VIDEO_CRF, VIDEO_PRESET, VIDEO_THREADS
+    global FRAME_LOG_FORMAT, FRAME_LOG_MAX_MB, FRAME_LOG_ROTATE_HOURS, FRAME_LOG_BACKUPS
+    global LOG_MAX_MB, LOG_BACKUPS, LOG_CONSOLE_LEVEL, LOG_RATE_INTERVAL, LOG_RATE_BURST
+    global IO_RETRIES, IO_RETRY_BACKOFF, IO_DEADLINE, RELAIS_HOLD, METRICS_HOST, METRICS_PORT
 
     config = {}
     if Path(CONFIG_FILE).exists():
@@ -124,8 +206,66 @@ def load_config():
     STOP_THRESHOLD = config.get("stop_threshold", STOP_THRESHOLD)
     MIN_RECORD_DURATION = config.get("min_record_duration", MIN_RECORD_DURATION)
     PRE_EVENT_DURATION = config.get("pre_event_duration", PRE_EVENT_DURATION)
+    PRE_EVENT_MEMORY_MB = config.get("pre_event_memory_mb", PRE_EVENT_MEMORY_MB)
     POST_EVENT_DURATION = config.get("duration", POST_EVENT_DURATION)
     MANUAL_RECORD_LIMIT = config.get("manual_record_limit", MANUAL_RECORD_LIMIT)
+    CAPTURE_FPS = config.get("capture_fps", CAPTURE_FPS)
+    CAPTURE_BUFFER_SIZE = config.get("capture_buffer_size", CAPTURE_BUFFER_SIZE)
+    CAMERA_BUFFER_SLOTS = config.get("camera_buffer_slots", CAMERA_BUFFER_SLOTS)
+    STORE_THERMAL = config.get("store_thermal", STORE_THERMAL)
+    ROI_CONFIG = config.get("roi", ROI_CONFIG)
+    ALARM_ZONE = config.get("alarm_zone", ALARM_ZONE)
+    ALARM_STAT = config.get("alarm_stat", ALARM_STAT)
+    CAMERAS = config.get("cameras", CAMERAS)
+    FLAG_FRAME_POLICY = config.get("flag_frame_policy", FLAG_FRAME_POLICY)
+    FLAG_SETTLE_FRAMES = config.get("flag_settle_frames", FLAG_SETTLE_FRAMES)
+    FLAG_TIMEOUT = config.get("flag_timeout", FLAG_TIMEOUT)
+    THERMAL_ONLY = config.get("thermal_only", THERMAL_ONLY)
+    PALETTE = config.get("palette", PALETTE)
+    PALETTE_SPAN = config.get("palette_span", PALETTE_SPAN)
+    REPLAY = config.get("replay", REPLAY)
+    HEADLESS = config.get("headless", HEADLESS)
+    SYNTHETIC_CONFIG = config.get("synthetic", SYNTHETIC_CONFIG)
+    DB_BATCH_SIZE = config.get("db_batch_size", DB_BATCH_SIZE)
+    DB_BATCH_INTERVAL = config.get("db_batch_interval", DB_BATCH_INTERVAL)
+    DB_SYNCHRONOUS = config.get("db_synchronous", DB_SYNCHRONOUS)
+    STORAGE_QUEUE_SIZE = config.get("storage_queue_size", STORAGE_QUEUE_SIZE)
+    STORAGE_OVERFLOW_POLICY = config.get("storage_overflow_policy", STORAGE_OVERFLOW_POLICY)
+    DB_MAX_AGE = config.get("db_max_age", DB_MAX_AGE)
+    DB_MAX_SIZE_MB = config.get("db_max_size_mb", DB_MAX_SIZE_MB)
+    EVENT_MAX_CLIP_DURATION = config.get("event_max_clip_duration", EVENT_MAX_CLIP_DURATION)
+    SEGMENT_DURATION = config.get("segment_duration", SEGMENT_DURATION)
+    SEGMENT_QUOTA_MB = config.get("segment_quota_mb", SEGMENT_QUOTA_MB)
+    VIDEO_CODEC = config.get("video_codec", VIDEO_CODEC)
+    VIDEO_CRF = config.get("video_crf", VIDEO_CRF)
+    VIDEO_PRESET = config.get("video_preset", VIDEO_PRESET)
+    VIDEO_THREADS = config.get("video_threads", VIDEO_THREADS)
+    FRAME_LOG_FORMAT = config.get("frame_log_format", FRAME_LOG_FORMAT)
+    FRAME_LOG_MAX_MB = config.get("frame_log_max_mb", FRAME_LOG_MAX_MB)
+    FRAME_LOG_ROTATE_HOURS = config.get("frame_log_rotate_hours", FRAME_LOG_ROTATE_HOURS)
+    FRAME_LOG_BACKUPS = config.get("frame_log_backups", FRAME_LOG_BACKUPS)
+    LOG_MAX_MB = config.get("log_max_mb", LOG_MAX_MB)
+    LOG_BACKUPS = config.get("log_backups", LOG_BACKUPS)
+    LOG_CONSOLE_LEVEL = config.get("log_console_level", LOG_CONSOLE_LEVEL)
+    LOG_RATE_INTERVAL = config.get("log_rate_interval", LOG_RATE_INTERVAL)
+    LOG_RATE_BURST = config.get("log_rate_burst", LOG_RATE_BURST)
+    IO_RETRIES = config.get("io_retries", IO_RETRIES)
+    IO_RETRY_BACKOFF = config.get("io_retry_backoff", IO_RETRY_BACKOFF)
+    IO_DEADLINE = config.get("io_deadline", IO_DEADLINE)
+    RELAIS_HOLD = config.get("relais_hold", RELAIS_HOLD)
+    METRICS_HOST = config.get("metrics_host", METRICS_HOST)
+    METRICS_PORT = config.get("metrics_port", METRICS_PORT)
+    if STORAGE_OVERFLOW_POLICY not in OVERFLOW_POLICIES:
+        logging.warning(f"Invalid storage overflow policy {STORAGE_OVERFLOW_POLICY}, using drop_oldest.")
+        STORAGE_OVERFLOW_POLICY = "drop_oldest"
+    if VIDEO_CODEC not in VIDEO_CODECS:
+        logging.warning(f"Invalid video codec {VIDEO_CODEC}, using mjpg.")
+        VIDEO_CODEC = "mjpg"
+    try:
+        palette.set_palette(PALETTE, PALETTE_SPAN)
+    except ValueError as e:
+        logging.warning(f"Invalid palette config, keeping {palette.palette}: {e}")
+    roi_engine, roi_failed_shape = None, None
     save_dir = Path(config.get("save_dir", str(save_dir)))
     save_dir.mkdir(parents=True, exist_ok=True)
 
@@ -144,11 +284,58 @@ def save_config():
         "stop_threshold": STOP_THRESHOLD,
         "min_record_duration": MIN_RECORD_DURATION,
         "pre_event_duration": PRE_EVENT_DURATION,
+        "pre_event_memory_mb": PRE_EVENT_MEMORY_MB,
         "save_dir": str(save_dir),
         "duration": POST_EVENT_DURATION,
         "recording_type": recording_type,
         "manual_record_limit": MANUAL_RECORD_LIMIT,
         "event_recording_enabled": event_recording_enabled,
+        "capture_fps": CAPTURE_FPS,
+        "capture_buffer_size": CAPTURE_BUFFER_SIZE,
+        "camera_buffer_slots": CAMERA_BUFFER_SLOTS,
+        "store_thermal": STORE_THERMAL,
+        "roi": ROI_CONFIG,
+        "alarm_zone": ALARM_ZONE,
+        "alarm_stat": ALARM_STAT,
+        "cameras": CAMERAS,
+        "flag_frame_policy": FLAG_FRAME_POLICY,
+        "flag_settle_frames": FLAG_SETTLE_FRAMES,
+        "flag_timeout": FLAG_TIMEOUT,
+        "thermal_only": THERMAL_ONLY,
+        "palette": PALETTE,
+        "palette_span": PALETTE_SPAN,
+        "replay": REPLAY,
+        "headless": HEADLESS,
+        "synthetic": SYNTHETIC_CONFIG,
+        "db_batch_size": DB_BATCH_SIZE,
+        "db_batch_interval": DB_BATCH_INTERVAL,
+        "db_synchronous": DB_SYNCHRONOUS,
+        "storage_queue_size": STORAGE_QUEUE_SIZE,
+        "storage_overflow_policy": STORAGE_OVERFLOW_POLICY,
+        "db_max_age": DB_MAX_AGE,
+        "db_max_size_mb": DB_MAX_SIZE_MB,
+        "event_max_clip_duration": EVENT_MAX_CLIP_DURATION,
+        "segment_duration": SEGMENT_DURATION,
+        "segment_quota_mb": SEGMENT_QUOTA_MB,
+        "video_codec": VIDEO_CODEC,
+        "video_crf": VIDEO_CRF,
+        "video_preset": VIDEO_PRESET,
+        "video_threads": VIDEO_THREADS,
+        "frame_log_format": FRAME_LOG_FORMAT,
+        "frame_log_max_mb": FRAME_LOG_MAX_MB,
+        "frame_log_rotate_hours": FRAME_LOG_ROTATE_HOURS,
+        "frame_log_backups": FRAME_LOG_BACKUPS,
+        "log_max_mb": LOG_MAX_MB,
+        "log_backups": LOG_BACKUPS,
+        "log_console_level": LOG_CONSOLE_LEVEL,
+        "log_rate_interval": LOG_RATE_INTERVAL,
+        "log_rate_burst": LOG_RATE_BURST,
+        "io_retries": IO_RETRIES,
+        "io_retry_backoff": IO_RETRY_BACKOFF,
+        "io_deadline": IO_DEADLINE,
+        "relais_hold": RELAIS_HOLD,
+        "metrics_host": METRICS_HOST,
+        "metrics_port": METRICS_PORT,
         "mode": mode  # Save current mode
     }
     with open(CONFIG_FILE, "w") as f:
@@ -190,6 +377,8 @@ def set_duration(seconds, user="server"):
     global POST_EVENT_DURATION
     old = POST_EVENT_DURATION
     POST_EVENT_DURATION = min(max(0, seconds), 180)
+    if event_manager:
+        event_manager.post_duration = POST_EVENT_DURATION
     log_config_change("POST_EVENT_DURATION", old, POST_EVENT_DURATION, user)
     save_config()
 
@@ -207,9 +396,55 @@ def set_save_dir(path_str, user="server"):
     old = str(save_dir)
     save_dir = Path(path_str)
     save_dir.mkdir(exist_ok=True)
+    if event_manager:
+        event_manager.save_dir = save_dir
     log_config_change("SAVE_DIR", old, str(save_dir), user)
     save_config()
 
+def set_roi_zones(zones, user="server"):
+    global ROI_CONFIG, roi_engine, roi_failed_shape
+    old = ROI_CONFIG.get("zones", [])
+    ROI_CONFIG = dict(ROI_CONFIG, zones=list(zones))
+    roi_engine, roi_failed_shape = None, None
+    log_config_change("ROI_ZONES", [z.get("name") for z in old], [z.get("name") for z in zones], user)
+    save_config()
+
+
+def set_alarm_zone(zone, stat="max", user="server"):
+    """
+    Selects which zone statistic the START/STOP thresholds run against.
+    zone: zone name, "*" for the hottest zone, or None for the whole-frame mean.
+    """
+    global ALARM_ZONE, ALARM_STAT
+    if stat not in ALARM_STATS:
+        logging.warning(f"Invalid alarm statistic requested: {stat}")
+        return False
+    old = (ALARM_ZONE, ALARM_STAT)
+    ALARM_ZONE, ALARM_STAT = zone, stat
+    log_config_change("ALARM_ZONE", old, (ALARM_ZONE, ALARM_STAT), user)
+    save_config()
+    return True
+
+def set_palette(name, span=None, user="server"):
+    """
+    Changes the palette and temperature span of locally rendered images.
+    span: [min, max] in °C, or None to stretch every frame to its own range.
+    """
+    global PALETTE, PALETTE_SPAN
+    if name not in PALETTE_NAMES:
+        logging.warning(f"Invalid palette requested: {name}")
+        return False
+    old = (PALETTE, PALETTE_SPAN)
+    try:
+        palette.set_palette(name, span)
+    except ValueError as e:
+        logging.warning(f"Invalid palette span requested: {e}")
+        return False
+    PALETTE, PALETTE_SPAN = name, list(span) if span else None
+    log_config_change("PALETTE", old, (PALETTE, PALETTE_SPAN), user)
+    save_config()
+    return True
+
 def enable_event_recording(user="server"):
     global event_recording_enabled
     old = event_recording_enabled
@@ -247,22 +482,222 @@ def screenshot(frame_copy):#backend callable
     cv2.imwrite(str(filename), frame_copy)
     logging.info(f"Screenshot saved as {filename}")
 
-def save_frames_as_video(frames, filename, fps=32):
-    if not frames:
+def read_captured(source):
+    """
+    Reads the next CapturedFrame from the capture engine, or directly from a camera under camera_lock.
+    Returns None if no frame is available.
+    """
+    if isinstance(source, CaptureEngine):
+        return source.next_frame()
+    with camera_lock:
+        frame, temp = source.get_frame()
+        thermal = getattr(source, "last_thermal", None)
+    if frame is None:
+        return None
+    return CapturedFrame(0, frame, temp, time.time(), thermal)
+
+def read_frame(source):
+    item = read_captured(source)
+    if item is None:
+        return None, None
+    return item.frame, item.temp
+
+def frame_source():
+    return capture if capture is not None else cam
+
+def loop_frame(item, frame):
+    """
+    Image of the current loop iteration: `frame` if it is set (e.g. the error image), else the
+    captured image, which thermal-only cameras render on this first access.
+    """
+    return frame if frame is not None or item is None else item.frame
+
+def current_frame():
+    return loop_frame(frame_item, frame)
+
+def keep_flag_frame(item):
+    """
+    True if a frame should be stored or recorded under the configured flag frame policy.
+    """
+    return item.flag_valid or FLAG_FRAME_POLICY == "store"
+
+def handle_flag_fault(message):
+    """
+    Called by the capture thread for a shutter flag error or a flag cycle that does not end:
+    the temperatures cannot be trusted, so the operator is told instead of alarms silently stopping.
+    """
+    log_error_to_user(f"{message} Switching to FAULT mode.")
+    set_mode(SystemMode.FAULT)
+
+def create_capture_engine(camera):
+    return CaptureEngine(camera, fps=CAPTURE_FPS, buffer_size=CAPTURE_BUFFER_SIZE,
+                         flag_settle_frames=FLAG_SETTLE_FRAMES, flag_timeout=FLAG_TIMEOUT,
+                         on_fault=handle_flag_fault)
+
+def create_camera():
+    if REPLAY:
+        return ReplayCameraController(thermal_only=THERMAL_ONLY, palette=palette, **REPLAY)
+    if USE_SYNTHETIC_CAMERA:
+        return SyntheticCameraController(buffer_slots=CAMERA_BUFFER_SLOTS, thermal_only=THERMAL_ONLY,
+                                         palette=palette, **SYNTHETIC_CONFIG)
+    if USE_MOCK_CAMERA:
+        return CameraController()
+    serial = CAMERAS[0].get("serial") if CAMERAS else None
+    if CAMERAS and CAMERAS[0].get("network"):
+        return NetworkCameraController(buffer_slots=CAMERA_BUFFER_SLOTS, serial=serial, thermal_only=THERMAL_ONLY,
+                                       palette=palette, **CAMERAS[0]["network"])
+    return CameraController(buffer_slots=CAMERA_BUFFER_SLOTS, serial=serial, thermal_only=THERMAL_ONLY,
+                            palette=palette)
+
+def handle_camera_alarm(event):
+    """
+    Called when a secondary camera pipeline reports a new anomaly.
+    """
+    global last_trigger_time
+    logging.info(f"Anomaly on camera {event['serial']}: Temp = {event['temp']:.2f} °C")
+    last_trigger_time = event["timestamp"]
+    if mode == SystemMode.NORMAL:
+        # CLOCK_MONOTONIC is shared by the worker processes
+        capture_time = event.get("monotonic", time.monotonic() - (time.time() - event["timestamp"]))
+        trigger_alarm_outputs(start_alarm_trace(capture_time, event.get("detection", time.monotonic()),
+                                                source=event["serial"]))
+
+def create_actuators():
+    # Lambdas, so the outputs go through the current trigger functions (relais freeze)
+    return ActuatorExecutor([
+        Output("HUPE", lambda: trigger_hupe()),
+        Output("BLITZ", lambda: trigger_blitz()),
+        Output("RELAIS", lambda: set_relais_state(True), lambda: set_relais_state(False), hold=RELAIS_HOLD),
+    ], retries=IO_RETRIES, backoff=IO_RETRY_BACKOFF, deadline=IO_DEADLINE, on_error=log_error_to_user,
+       on_actuated=record_actuation)
+
+def start_alarm_trace(capture, detection, source=None):
+    """
+    Opens the latency trace of an alarm decided now; returns its id for trigger_alarm_outputs().
+    """
+    outputs = list(actuators.outputs) if actuators is not None else ()
+    return latency_tracker.alarm(capture, detection, outputs=outputs, source=source)
+
+def record_actuation(name, trace_id, when):
+    if trace_id is not None:
+        latency_tracker.actuated(trace_id, name, when)
+
+def trigger_alarm_outputs(trace_id=None):
+    """
+    Switches HUPE, BLITZ and RELAIS on in parallel; returns at once while the executor runs.
+    trace_id: latency trace (start_alarm_trace) the actuation times are recorded in.
+    """
+    if actuators is not None:
+        scheduled = actuators.fire(context=trace_id)
+        if trace_id is not None:
+            latency_tracker.scheduled(trace_id, scheduled)   # Latched outputs still on are not switched
         return
-    height, width, _ = frames[0].shape
-    out = cv2.VideoWriter(str(filename), cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
-    for frame in frames:
-        out.write(frame)
-    out.release()
+    def switch_outputs():
+        retry_io_action(trigger_hupe, "HUPE Trigger")
+        retry_io_action(trigger_blitz, "BLITZ Trigger")
+        retry_io_action(lambda: set_relais_state(True), "Set RELAIS ON")
+    threading.Thread(target=switch_outputs, daemon=True).start()
+
+def switch_relais(state):
+    """
+    Manual relais change; goes through the executor so its RELAIS state stays in sync with the output.
+    """
+    if actuators is None:
+        return set_relais_state(state)
+    if relais_frozen:
+        logging.info("Attempted to change relais, but relais are frozen.")
+        return False
+    if state:
+        actuators.fire(["RELAIS"])
+    else:
+        actuators.release(["RELAIS"])
+    return True
+
+def start_camera_supervisor():
+    """
+    Starts one worker process per additional camera serial in CAMERAS.
+    """
+    global camera_supervisor
+    if len(CAMERAS) < 2 or (USE_MOCK_CAMERA and not USE_SYNTHETIC_CAMERA):
+        return None
+    defaults = {
+        "start_threshold": START_THRESHOLD,
+        "stop_threshold": STOP_THRESHOLD,
+        "store_thermal": STORE_THERMAL,
+        "buffer_slots": CAMERA_BUFFER_SLOTS,
+        "fps": CAPTURE_FPS,
+        "buffer_size": CAPTURE_BUFFER_SIZE,
+        "flag_frame_policy": FLAG_FRAME_POLICY,
+        "flag_settle_frames": FLAG_SETTLE_FRAMES,
+        "flag_timeout": FLAG_TIMEOUT,
+        "thermal_only": THERMAL_ONLY,
+        "palette": PALETTE,
+        "palette_span": PALETTE_SPAN,
+        "db_batch_size": DB_BATCH_SIZE,
+        "db_batch_interval": DB_BATCH_INTERVAL,
+        "db_synchronous": DB_SYNCHRONOUS,
+        "storage_queue_size": STORAGE_QUEUE_SIZE,
+        "storage_overflow_policy": STORAGE_OVERFLOW_POLICY,
+        "db_max_age": DB_MAX_AGE,
+        "db_max_size_mb": DB_MAX_SIZE_MB,
+    }
+    if USE_SYNTHETIC_CAMERA:
+        defaults["synthetic"] = SYNTHETIC_CONFIG  # Scaling tests: every worker generates its own scene
+    camera_supervisor = MultiCameraSupervisor(CAMERAS[1:], defaults, on_alarm=handle_camera_alarm)
+    camera_supervisor.start()
+    return camera_supervisor
+
+def get_roi_engine(shape):
+    """
+    Returns the RoiEngine for the configured zones, rebuilt when the thermal resolution changes.
+    """
+    global roi_engine, roi_failed_shape
+    if not ROI_CONFIG.get("zones"):
+        return None
+    shape = tuple(shape[:2])
+    if roi_engine is not None and roi_engine.shape == shape:
+        return roi_engine
+    if roi_failed_shape == shape:
+        return None
+    try:
+        roi_engine = RoiEngine(ROI_CONFIG["zones"], shape,
+                               percentile=ROI_CONFIG.get("percentile", 95),
+                               hot_threshold=ROI_CONFIG.get("hot_threshold"))
+    except Exception as e:
+        log_error_to_user(f"Failed to build ROI zones: {e}")
+        roi_engine, roi_failed_shape = None, shape
+    return roi_engine
+
+def alarm_temperature(temp, stats):
+    """
+    Returns the temperature the START/STOP thresholds are checked against.
+    """
+    return select_alarm_temperature(stats, ALARM_ZONE, ALARM_STAT, temp)
+
+def open_video_writer(filename, fps):
+    """
+    Video writer for the configured codec; the suffix of `filename` is adapted to the container.
+    """
+    return create_video_writer(filename, fps, VIDEO_CODEC, VIDEO_CRF, VIDEO_PRESET, VIDEO_THREADS)
+
+def save_frames_as_video(frames, filename, fps=32):
+    """
+    frames: BGR images and/or stored JPEG bytes (muxed without re-encoding when writing MJPG).
+    Returns the path of the written file.
+    """
+    if not len(frames):
+        return None
+    with open_video_writer(filename, fps) as writer:
+        for frame in frames:
+            writer.write(frame)
+    return Path(writer.filename)
 
 def record_video(cam, mode, duration=POST_EVENT_DURATION):
     global manual_stop_flag
     manual_stop_flag = False
     duration = min(duration, MANUAL_RECORD_LIMIT)  # Enforce limit
     try:
-        with camera_lock:
-            frame, temp = cam.get_frame()
+        frame, temp = read_frame(cam)
     except Exception as e:
         log_error_to_user(f"Failed to start recording: {e}")
 
@@ -273,20 +708,21 @@ def record_video(cam, mode, duration=POST_EVENT_DURATION):
         return
 
     filename = save_dir / f"thermal_video_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.avi"
-    height, width = frame.shape[:2]
-    writer = cv2.VideoWriter(str(filename), cv2.VideoWriter_fourcc(*'MJPG'), 32, (width, height))
-    if not writer.isOpened():
-        log_error_to_user("Failed to open video writer.")
+    fps = (cam.measured_fps() if isinstance(cam, CaptureEngine) else None) or CAPTURE_FPS
+    try:
+        writer = open_video_writer(filename, fps)
+    except Exception as e:
+        log_error_to_user(f"Failed to open video writer: {e}")
         return
 
     start_time = time.time()
     logging.info("Recording started.")
 
     while not manual_stop_flag:
-        with camera_lock:
-            frame, temp = cam.get_frame()
-        if frame is not None:
-            writer.write(frame)
+        item = read_captured(cam)
+        if item is not None and keep_flag_frame(item):
+            with stage_seconds.labels("record_write").time():
+                writer.write(item.frame)
 
         elapsed = time.time() - start_time
         if elapsed >= duration:  # Use passed duration
@@ -294,10 +730,15 @@ def record_video(cam, mode, duration=POST_EVENT_DURATION):
             break
         if exit_flag:
             break
-        time.sleep(0.01)
+        if not isinstance(cam, CaptureEngine):  # The capture engine already paces reads
+            time.sleep(0.01)
 
 
-    writer.release()
+    try:
+        writer.close()
+    except Exception as e:
+        log_error_to_user(f"Failed to finish recording: {e}")
+        return
     logging.info("Recording finished and saved.")
 
 
@@ -313,33 +754,6 @@ def stop_manual_recording_from_server():
     logging.info("No manual recording active to stop")
     return False
 
-def save_anomaly_video(cam, db_path, temp, timestamp, save_dir, duration=5, fps=32):
-    global exit_flag
-    try:
-        with db_lock:
-            db = FrameDatabase(db_path)
-            retrospective_frames = db.get_frames_from_last_n_seconds(seconds=10)
-            db.close()
-
-        post_frames = []
-        start_time = time.time()
-        while time.time() - start_time < duration:
-            if exit_flag:
-                break
-            with camera_lock:
-                frame, _ = cam.get_frame()
-            if frame is not None:
-                post_frames.append(frame)
-            time.sleep(1 / fps)
-
-        all_frames = retrospective_frames + post_frames
-        filename = save_dir / f"merged_anomaly_temp{int(temp)}_{timestamp}.avi"
-        save_frames_as_video(all_frames, filename, fps=fps)
-        logging.info(f"Combined anomaly video saved as {filename}")
-    except Exception as e:
-        log_error_to_user(f"Error in anomaly video thread: {e}")
-
-
 def display(frame, temp, mode, recording):
     annotated = np.ascontiguousarray(frame.copy())
     cv2.putText(annotated, f"Mode: {mode}", (10, 40),
@@ -390,25 +804,38 @@ def get_system_status():
     return {
         "mode": mode,
         "threshold": TEMP_THRESHOLD,
-        "recording": recording,
+        "recording": is_recording(),
         "last_trigger_time": last_trigger_time,
         "event_recording_enabled": event_recording_enabled,
         "start_threshold": START_THRESHOLD,
         "stop_threshold": STOP_THRESHOLD,
         "duration": POST_EVENT_DURATION,
         "save_dir": str(save_dir),
+        "capture": capture.get_status() if capture else None,
+        "alarm_zone": ALARM_ZONE,
+        "alarm_stat": ALARM_STAT,
+        "zones": zone_stats,
+        "cameras": camera_supervisor.get_status() if camera_supervisor else None,
+        "network_camera": cam.get_status() if isinstance(cam, NetworkCameraController) else None,
+        "palette": palette.get_status(),
+        "database": db.get_write_stats() if hasattr(db, "get_write_stats") else None,
+        "storage": frame_writer.get_status() if frame_writer else None,
+        "pre_event_buffer": pre_event_buffer.get_status() if pre_event_buffer else None,
+        "events": event_manager.get_status() if event_manager else None,
+        "segments": segment_recorder.get_status() if segment_recorder else None,
+        "frame_log": frame_log.get_status() if frame_log else None,
+        "logging": get_logging_status(),
+        "actuators": actuators.get_status() if actuators else None,
+        "latency": latency_tracker.get_status(),
+        "metrics_port": metrics_server.port if metrics_server else None,
         "last_error": last_error
     }
 
-def anomaly_worker():
-    global recording
-    while not anomaly_queue.empty():
-        temp, timestamp = anomaly_queue.get()
-        ts_str = timestamp.strftime("%Y%m%d_%H%M%S")
-        logging.info(f"Processing anomaly event at {temp:.2f}°C ({ts_str})")
-        recording = True
-        save_anomaly_video(cam, "frame_store.db", temp, ts_str, save_dir, POST_EVENT_DURATION)
-        recording = False
+def is_recording():
+    """
+    True while a manual recording or an anomaly clip is being written.
+    """
+    return recording or bool(event_manager and event_manager.active)
 
 
 def trigger_mock_anomaly_from_server():
@@ -416,7 +843,7 @@ def trigger_mock_anomaly_from_server():
     Allows the server to simulate an anomaly in mock mode.
     Equivalent to pressing key 'a'.
     """
-    if USE_MOCK_CAMERA:
+    if USE_MOCK_CAMERA or USE_SYNTHETIC_CAMERA:
         cam.trigger_anomaly()
         logging.info("Anomaly triggered in mock camera (via server)")
         return True
@@ -438,7 +865,7 @@ def start_manual_recording_from_server():
     if not recording:
         duration = min(POST_EVENT_DURATION, MANUAL_RECORD_LIMIT)
         manual_record_thread = threading.Thread(
-            target=record_video, args=(cam, mode, duration)
+            target=record_video, args=(frame_source(), mode, duration)
         )
         manual_record_thread.start()
         recording = True
@@ -449,7 +876,7 @@ def start_manual_recording_from_server():
 
 
 def trigger_mock_anomaly():
-    if USE_MOCK_CAMERA:
+    if USE_MOCK_CAMERA or USE_SYNTHETIC_CAMERA:
         cam.trigger_anomaly()
         logging.info("Anomaly triggered in mock camera (by server)")
         return True
@@ -519,7 +946,7 @@ def trigger_blitz_from_server():#backend callable
 
 def set_relais_state_from_server(state: bool):#backend callable
     if mode == SystemMode.TEST:
-        set_relais_state(state)
+        switch_relais(state)
         return True
     return False
 
@@ -529,10 +956,23 @@ def freeze_relais_from_server():#backend callable
         return True
     return False
 
+def dump_latency(path=None):
+    """
+    Writes the latency histograms and the latest alarm traces as JSON (default: into save_dir).
+    """
+    if path is None:
+        path = save_dir / f"latency_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    latency_tracker.dump(path)
+    logging.info(f"Latency report saved as {path}")
+    return str(path)
+
+def dump_latency_from_server():#backend callable
+    return dump_latency()
+
 def take_screenshot_from_server():#backend callable
-    global frame
-    if frame is not None:
-        threading.Thread(target=screenshot, args=(frame.copy(),)).start()
+    image = current_frame()
+    if image is not None:
+        threading.Thread(target=screenshot, args=(image.copy(),)).start()
         return True
     return False
 def retry_io_action(action, action_name="IO Action", retries=3, delay=0.5):
@@ -553,11 +993,11 @@ def retry_io_action(action, action_name="IO Action", retries=3, delay=0.5):
     log_error_to_user(f"{action_name} failed after {retries} attempts.")
     return False
 
-def safe_insert_frame(frame, retries=3, delay=0.2):
+def safe_insert_frame(frame, retries=3, delay=0.2, thermal=None, timestamp=None):
     for attempt in range(1, retries + 1):
         try:
-            with db_lock:
-                db.insert_frame(frame)
+            # FrameDatabase serialises its own connection use; encoding runs outside its lock
+            db.insert_frame(frame, thermal=thermal, timestamp=timestamp)
             return True
         except Exception as e:
             logging.warning(f"DB insert error on attempt {attempt}: {e}")
@@ -565,12 +1005,149 @@ def safe_insert_frame(frame, retries=3, delay=0.2):
     log_error_to_user("Failed to insert frame into DB after retries.")
     return False
 
+def store_frame(frame, thermal=None, timestamp=None):
+    """
+    Hands a frame to the background writer; falls back to a synchronous insert without one.
+    Never blocks on I/O when the writer is running.
+    """
+    if frame_writer is not None:
+        return frame_writer.submit(frame, thermal=thermal, timestamp=timestamp)
+    return safe_insert_frame(frame, thermal=thermal, timestamp=timestamp)
+
+def create_frame_writer(database):
+    writer = FrameWriter(database, capacity=STORAGE_QUEUE_SIZE, policy=STORAGE_OVERFLOW_POLICY,
+                         on_error=log_error_to_user, on_timing=stage_seconds.labels("db_insert").observe)
+    writer.start()
+    return writer
+
+def observe_stage(stage, start):
+    """
+    Records the time since `start` (time.perf_counter()) for a frame loop stage; returns the current time.
+    """
+    now = time.perf_counter()
+    stage_seconds.labels(stage).observe(now - start)
+    return now
+
+def register_status_metrics():
+    """
+    Exposes the counters the pipeline objects already keep; read at scrape time.
+    """
+    def status(obj, key):
+        return (lambda: obj().get_status()[key] if obj() is not None else None)
+    metrics.gauge("thermal_capture_fps", "Measured capture frame rate.",
+                  fn=lambda: capture.measured_fps() if capture else None)
+    metrics.counter("thermal_capture_frames_total", "Frames captured from the camera.",
+                    fn=status(lambda: capture, "frames_captured"))
+    metrics.counter("thermal_capture_dropped_frames_total", "Frames the camera delivered but capture missed.",
+                    fn=status(lambda: capture, "dropped_frames"))
+    metrics.counter("thermal_capture_errors_total", "Failed camera reads.",
+                    fn=status(lambda: capture, "capture_errors"))
+    metrics.gauge("thermal_storage_queue_depth", "Frames waiting for the database writer.",
+                  fn=status(lambda: frame_writer, "queue_depth"))
+    metrics.counter("thermal_storage_written_total", "Frames stored in the database.",
+                    fn=status(lambda: frame_writer, "written"))
+    metrics.counter("thermal_storage_failed_total", "Frames not stored after retries.",
+                    fn=status(lambda: frame_writer, "failed"))
+    metrics.counter("thermal_storage_dropped_frames_total", "Frames dropped by the storage overflow policy.",
+                    ["policy"], fn=status(lambda: frame_writer, "dropped"))
+    metrics.gauge("thermal_event_queue_depth", "Frames waiting for the anomaly clip writer.",
+                  fn=status(lambda: event_manager, "queued_frames"))
+    metrics.counter("thermal_event_dropped_frames_total", "Frames the anomaly clip writer could not take.",
+                    fn=status(lambda: event_manager, "dropped_frames"))
+    metrics.counter("thermal_event_clips_total", "Anomaly clips completed.",
+                    fn=status(lambda: event_manager, "completed"))
+    metrics.gauge("thermal_event_active_clips", "Anomaly clips being recorded.",
+                  fn=lambda: len(event_manager.get_status()["active_clips"]) if event_manager else None)
+    metrics.gauge("thermal_segment_queue_depth", "Frames waiting for the continuous recording.",
+                  fn=status(lambda: segment_recorder, "queue_depth"))
+    metrics.counter("thermal_segment_dropped_frames_total", "Frames the continuous recording could not take.",
+                    fn=status(lambda: segment_recorder, "dropped_frames"))
+    metrics.gauge("thermal_segment_used_bytes", "Disk space used by the continuous recording.",
+                  fn=status(lambda: segment_recorder, "used_bytes"))
+    metrics.counter("thermal_frame_log_records_total", "Records written to the frame log.",
+                    fn=status(lambda: frame_log, "records"))
+    metrics.counter("thermal_log_dropped_total", "Log records dropped because the log queue was full.",
+                    fn=lambda: get_logging_status().get("dropped"))
+    metrics.counter("thermal_log_suppressed_total", "Log records suppressed by the rate limit.",
+                    fn=lambda: get_logging_status().get("suppressed"))
+    metrics.gauge("thermal_alarm_latency_max_seconds", "Worst-case latency from capture, per alarm path.",
+                  ["path"], fn=lambda: {name: h.max for name, h in list(latency_tracker.histograms.items())})
+    metrics.gauge("thermal_recording", "1 while an anomaly clip or manual recording is running.",
+                  fn=lambda: int(is_recording()))
+    metrics.gauge("thermal_mode", "Current system mode.", ["mode"],
+                  fn=lambda: {m: int(mode == m) for m in (SystemMode.NORMAL, SystemMode.TEST, SystemMode.FAULT)})
+
+def start_metrics_server():
+    if METRICS_PORT is None:
+        return None
+    server = MetricsServer(metrics, METRICS_HOST, METRICS_PORT)
+    try:
+        server.start()
+    except OSError as e:
+        logging.warning(f"[METRICS] Metrics endpoint not started on port {METRICS_PORT}: {e}")
+        return None
+    return server
+
+def configure_logging():
+    setup_logging(LOG_FILE, max_bytes=LOG_MAX_MB * 1024 * 1024 if LOG_MAX_MB else 0, backup_count=LOG_BACKUPS,
+                  console_level=LOG_CONSOLE_LEVEL, rate_limit_interval=LOG_RATE_INTERVAL,
+                  rate_limit_burst=LOG_RATE_BURST)
+
+def create_frame_log():
+    binary = FRAME_LOG_FORMAT != "csv"
+    legacy = Path(f"{FRAME_LOG_FILE}.csv")
+    if binary and legacy.exists() and not Path(f"{FRAME_LOG_FILE}.bin").exists():
+        # First binary start: the CSV log of older versions is moved aside once, like a rotated log
+        target = legacy.with_name(f"{legacy.stem}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        legacy.rename(target)
+        logging.info(f"[LOG] {legacy} moved to {target}.")
+    return FrameLog(f"{FRAME_LOG_FILE}.{'bin' if binary else 'csv'}", binary=binary,
+                    max_bytes=FRAME_LOG_MAX_MB * 1024 * 1024 if FRAME_LOG_MAX_MB else None,
+                    rotate_interval=FRAME_LOG_ROTATE_HOURS * 3600 if FRAME_LOG_ROTATE_HOURS else None,
+                    backup_count=FRAME_LOG_BACKUPS)
+
+def update_segment_recorder():
+    """
+    Starts the continuous recording when recording_type is CONTINUOUS and stops it otherwise.
+    Stopping joins the encoder and closes the open segment in a background thread; a new recorder
+    is only started once that is done, so both never write the same index.
+    """
+    global segment_recorder, segment_closer
+    if recording_type == "CONTINUOUS" and segment_recorder is None:
+        if segment_closer is not None and segment_closer.is_alive():
+            return None
+        segment_recorder = SegmentRecorder(save_dir / "segments", SEGMENT_DURATION,
+                                           SEGMENT_QUOTA_MB * 1024 * 1024 if SEGMENT_QUOTA_MB else None,
+                                           fps=CAPTURE_FPS, on_timing=stage_seconds.labels("segment_write").observe)
+        segment_recorder.start()
+    elif recording_type != "CONTINUOUS" and segment_recorder is not None:
+        segment_closer = threading.Thread(target=segment_recorder.close, name="segment-closer", daemon=True)
+        segment_closer.start()
+        segment_recorder = None
+    return segment_recorder
+
+def extract_recording(start_time, end_time, user="server"):
+    """
+    Cuts [start_time, end_time] (epoch seconds) out of the continuous recording into save_dir.
+    Returns the file name, or None if nothing was recorded in that range.
+    Works from the segments on disk when continuous recording is no longer active.
+    """
+    stamp = datetime.datetime.fromtimestamp(start_time).strftime("%Y%m%d_%H%M%S")
+    filename = save_dir / f"extract_{stamp}_{int(end_time - start_time)}s.avi"
+    recorder = segment_recorder
+    if recorder is not None:
+        frames = recorder.extract(start_time, end_time, filename)
+    else:
+        frames = extract_segments(save_dir / "segments", start_time, end_time, filename, fps=CAPTURE_FPS)
+    logging.info(f"Recording extracted by {user}: {filename} ({frames} frames)")
+    return str(filename) if frames else None
+
 def set_recording_type_from_server(rec_type, user="server"):
     """
-    Allows server to set recording type: 'EVENT' or 'MANUAL'.
+    Allows server to set recording type: 'EVENT', 'MANUAL' or 'CONTINUOUS' (segmented DVR recording).
     """
     global recording_type
-    if rec_type.upper() in ["EVENT", "MANUAL"]:
+    if rec_type.upper() in ["EVENT", "MANUAL", "CONTINUOUS"]:
         old = recording_type
         recording_type = rec_type.upper()
         log_config_change("RECORDING_TYPE", old, recording_type, user)
@@ -584,13 +1161,24 @@ def set_recording_type_from_server(rec_type, user="server"):
 
 # Main Loop 
 def main():
-    global anomaly_worker_thread 
-    global cam, db, mode, frame, temp, recording, anomaly_active
-    global anomaly_thread, manual_record_thread
+    global cam, capture, db, frame_writer, pre_event_buffer, event_manager, frame_log, actuators, metrics_server, mode, frame, frame_item, temp, recording, anomaly_active, zone_stats
+    global manual_record_thread
     global last_trigger_time, last_test_time, exit_flag, event_recording_enabled
 
     load_config()  
-    anomaly_worker_thread = None
+    configure_logging()
+    pre_event_buffer = PreEventBuffer(PRE_EVENT_DURATION, CAPTURE_FPS,
+                                      render=palette.render if THERMAL_ONLY else None,
+                                      memory_budget=PRE_EVENT_MEMORY_MB * 1024 * 1024 if PRE_EVENT_MEMORY_MB else None)
+    event_manager = EventManager(pre_event_buffer, save_dir, PRE_EVENT_DURATION, POST_EVENT_DURATION,
+                                 EVENT_MAX_CLIP_DURATION, fps=CAPTURE_FPS, writer_factory=open_video_writer,
+                                 on_error=log_error_to_user, on_timing=stage_seconds.labels("clip_write").observe)
+    event_manager.start()
+    frame_log = create_frame_log()
+    actuators = create_actuators()
+    actuators.start()
+    register_status_metrics()
+    metrics_server = start_metrics_server()
 
     RETRIGGER_COOLDOWN = 15
     TEST_TIMEOUT = 180
@@ -598,18 +1186,32 @@ def main():
     last_test_time = time.time()
 
     try:
-        cam = CameraController()
-        db = FrameDatabase("frame_store.db")
+        cam = create_camera()
+        capture = create_capture_engine(cam)
+        capture.start()
+        db = FrameDatabase("frame_store.db", palette=palette, synchronous=DB_SYNCHRONOUS,
+                           batch_size=DB_BATCH_SIZE, batch_interval=DB_BATCH_INTERVAL, max_age=DB_MAX_AGE,
+                           max_size_bytes=DB_MAX_SIZE_MB * 1024 * 1024 if DB_MAX_SIZE_MB else None)
+        frame_writer = create_frame_writer(db)
     except Exception as e:
         logging.critical(f"Failed to initialize camera or DB: {e}")
         mode = SystemMode.FAULT
         event_recording_enabled = False
         cam = None
 
+    try:
+        start_camera_supervisor()
+    except Exception as e:
+        log_error_to_user(f"Failed to start additional camera pipelines: {e}")
+
 
     try:
         while True:
-            key = cv2.waitKey(1) & 0xFF
+            key = cv2.waitKey(1) & 0xFF if not HEADLESS else 0xFF
+            if getattr(cam, "finished", False) is True:
+                logging.info("Replay finished, exiting.")
+                exit_flag = True
+                break
             if key == ord('q'):
                 logging.info("Exiting now...")
                 exit_flag = True
@@ -622,27 +1224,33 @@ def main():
                 set_mode(SystemMode.NORMAL)
             elif key == ord('s') and frame is not None:
                 threading.Thread(target=screenshot, args=(frame.copy(),)).start()
+            elif key == ord('l'):
+                dump_latency()
             elif key == ord('v') and frame is not None and not recording and mode == SystemMode.TEST:
                 manual_record_thread = threading.Thread(
-                    target=record_video, args=(cam, mode, POST_EVENT_DURATION))
+                    target=record_video, args=(frame_source(), mode, POST_EVENT_DURATION))
                 manual_record_thread.start()
                 recording = True
 
-            elif key == ord('a') and USE_MOCK_CAMERA:
+            elif key == ord('a') and (USE_MOCK_CAMERA or USE_SYNTHETIC_CAMERA):
                 cam.trigger_anomaly()
             elif key == ord('h') and mode == SystemMode.TEST:
                 trigger_hupe()
             elif key == ord('b') and mode == SystemMode.TEST:
                 trigger_blitz()
             elif key == ord('r') and mode == SystemMode.TEST:
-                set_relais_state(True)
+                switch_relais(True)
             elif key == ord('z') and mode == SystemMode.TEST:
                 freeze_relais()
             elif key == ord('u') and mode == SystemMode.TEST:
                 unfreeze_relais()
             elif key == ord('f'):  # Reinitialize the camera
                     try:
-                        cam = CameraController()
+                        if capture:
+                            capture.stop()
+                        cam = create_camera()
+                        capture = create_capture_engine(cam)
+                        capture.start()
                         logging.info("Camera re-initialized successfully. Switching to NORMAL mode.")
                         set_mode(SystemMode.NORMAL)
                     except Exception as e:
@@ -654,89 +1262,127 @@ def main():
                 logging.info("Test mode timeout. Switching to NORMAL.")
                 mode = SystemMode.NORMAL
 
+            item = frame_item = frame = None
+            thermal = None
+            capture_time = time.time()
+            flag_valid = True
+            stage_start = time.perf_counter()
             try:
-                with camera_lock:
-                    frame, temp = cam.get_frame()
-                if frame is None:
+                item = frame_item = read_captured(frame_source())
+                temp = item.temp if item else None
+                thermal = item.thermal if item else None
+                capture_time = item.timestamp if item else capture_time
+                flag_valid = item.flag_valid if item else True
+                # Thermal-only frames have no image yet: it is rendered below only where one is consumed
+                if item is None or (thermal is None and item.frame is None):
                     log_error_to_user("Camera returned no frame. Switching to FAULT mode.")
                     set_mode(SystemMode.FAULT)
                     frame = generate_error_image()  # Show error image
                     temp = None
+                loop_frames.labels("no_frame" if item is None else "ok" if flag_valid else "flag").inc()
             except Exception as e:
+                loop_frames.labels("error").inc()
                 log_error_to_user(f"Camera error: {e}. Switching to FAULT mode.")
                 set_mode(SystemMode.FAULT)
                 frame = generate_error_image()
                 temp = None
+            stage_start = observe_stage("read_frame", stage_start)
 
-            if frame is not None:
+            zone_stats = None
+            if thermal is not None:
+                engine = get_roi_engine(thermal.shape)
+                if engine is not None:
+                    try:
+                        zone_stats = engine.compute(thermal)
+                    except Exception as e:
+                        logging.warning("ROI statistics error: %s", e)
+            # Temperatures during a shutter flag cycle are frozen or invalid: never alarm on them
+            alarm_temp = alarm_temperature(temp, zone_stats) if flag_valid else None
+            detection_time = time.monotonic()
+            if item is not None and alarm_temp is not None:
+                latency_tracker.frame(item.monotonic, detection_time)
+            stage_start = observe_stage("detection", stage_start)
+
+            if item is not None or frame is not None:
                 try:
-                    safe_insert_frame(frame)
-                    timestamp = datetime.datetime.now().isoformat()
-                    with open(FRAME_LOG_FILE, mode='a', newline='') as csvfile:
-                        writer = csv.writer(csvfile)
-                        writer.writerow([timestamp, mode, f"{temp:.2f}" if temp is not None else "N/A", recording])
+                    if flag_valid or FLAG_FRAME_POLICY == "store":
+                        stored_thermal = thermal if STORE_THERMAL else None
+                        # Thermal-only: the palette image is rendered from the stored matrix on read
+                        if THERMAL_ONLY and stored_thermal is not None:
+                            store_frame(None, thermal=stored_thermal, timestamp=capture_time)
+                        else:
+                            frame = loop_frame(item, frame)
+                            store_frame(frame, thermal=stored_thermal, timestamp=capture_time)
+                        stage_start = observe_stage("store", stage_start)
+                        if item is not None:
+                            # Thermal-only: the ring keeps the matrices, clips render what they take
+                            if pre_event_buffer.render is not None and thermal is not None:
+                                pre_event_buffer.push(thermal, capture_time)
+                            else:
+                                frame = loop_frame(item, frame)
+                                pre_event_buffer.push(frame, capture_time)
+                            if event_manager.active:
+                                frame = loop_frame(item, frame)
+                                event_manager.push(frame, capture_time)
+                            if update_segment_recorder():
+                                frame = loop_frame(item, frame)
+                                segment_recorder.push(frame, capture_time,
+                                                      alarm_temp if alarm_temp is not None else temp)
+                            stage_start = observe_stage("buffers", stage_start)
+                    frame_log.log(capture_time, mode, temp, is_recording(), flag_valid,
+                                  info=item.info if item is not None else None, zones=zone_stats)
+                    observe_stage("frame_log", stage_start)
                 except Exception as e:
                     logging.warning("DB insert error: %s", e)
 
-            # Event-based recording for Normal mode
-            # Event-based recording and IO control for Normal mode
-            # Event-based anomaly detection with STOP_THRESHOLD + queue
-            if mode == SystemMode.NORMAL and temp is not None:
-                if temp > START_THRESHOLD and not anomaly_active:
-                    logging.info(f"New anomaly detected: Temp = {temp:.2f} °C")
-                    # Queue anomaly event
-                    anomaly_queue.put((temp, datetime.datetime.now()))
-
-                    # Trigger IO
-                    retry_io_action(trigger_hupe, "HUPE Trigger")
-                    retry_io_action(trigger_blitz, "BLITZ Trigger")
-                    retry_io_action(lambda: set_relais_state(True), "Set RELAIS ON")
+            # Event-based anomaly detection with STOP_THRESHOLD: the event manager records the clip,
+            # re-armed events during a running clip extend it
+            if mode == SystemMode.NORMAL and alarm_temp is not None:
+                if alarm_temp > START_THRESHOLD and not anomaly_active:
+                    # Outputs first; the trigger only registers the clip, the event manager opens it
+                    trace_id = start_alarm_trace(item.monotonic, detection_time, source=ALARM_ZONE) \
+                        if item is not None else None
+                    trigger_alarm_outputs(trace_id)
+                    logging.info(f"New anomaly detected: Temp = {alarm_temp:.2f} °C")
+                    event_manager.trigger(alarm_temp, capture_time, source=ALARM_ZONE)
 
                     anomaly_active = True  # Mark anomaly as ongoing
-                elif temp < STOP_THRESHOLD and not recording:
+                elif alarm_temp < STOP_THRESHOLD:
                     anomaly_active = False  # Reset anomaly state for next event
 
-                # Start anomaly worker if idle
-                if not recording and not anomaly_queue.empty() and \
-                (anomaly_worker_thread is None or not anomaly_worker_thread.is_alive()):
-                    anomaly_worker_thread = threading.Thread(target=anomaly_worker)
-                    anomaly_worker_thread.start()
-
             # TEST MODE anomaly simulation
-            if mode == SystemMode.TEST and USE_MOCK_CAMERA and temp is not None:
-                if temp > START_THRESHOLD and recording_type == "EVENT" and not anomaly_active:
-                    logging.info(f"Test Mode Anomaly: Temp = {temp:.2f} °C (EVENT mode)")
-                    anomaly_queue.put((temp, datetime.datetime.now()))
+            if mode == SystemMode.TEST and USE_MOCK_CAMERA and alarm_temp is not None:
+                if alarm_temp > START_THRESHOLD and recording_type == "EVENT" and not anomaly_active:
+                    logging.info(f"Test Mode Anomaly: Temp = {alarm_temp:.2f} °C (EVENT mode)")
+                    event_manager.trigger(alarm_temp, capture_time, source=ALARM_ZONE)
                     anomaly_active = True
-                elif temp < STOP_THRESHOLD and not recording:
+                elif alarm_temp < STOP_THRESHOLD:
                     anomaly_active = False
 
-                if not recording and not anomaly_queue.empty() and \
-                    (anomaly_worker_thread is None or not anomaly_worker_thread.is_alive()):
-                    anomaly_worker_thread = threading.Thread(target=anomaly_worker)
-                    anomaly_worker_thread.start()
-
             elif recording and manual_record_thread and not manual_record_thread.is_alive():
                 try:
-                    set_relais_state(False)
+                    switch_relais(False)
                 except Exception as e:
                     log_error_to_user(f"Failed to reset relais: {e}")
                 logging.info("Event recording finished, system re-armed.")
                 recording = False
                 manual_record_thread = None
 
-            if anomaly_thread and not anomaly_thread.is_alive():
-                anomaly_thread = None
             if manual_record_thread and not manual_record_thread.is_alive():
                 recording = False
                 manual_record_thread = None
             if exit_flag:
                 break
 
-            if frame is not None:
+            if not HEADLESS:
+                frame = loop_frame(item, frame)
+            if frame is not None and not HEADLESS:
+                stage_start = time.perf_counter()
                 resized = cv2.resize(frame, (frame.shape[1] * 3, frame.shape[0] * 3))
-                display_frame = display(resized, temp, mode, recording)
+                display_frame = display(resized, temp, mode, is_recording())
+                stage_start = observe_stage("display", stage_start)
                 cv2.imshow("Thermal View", display_frame)
+                observe_stage("imshow", stage_start)
 
 
     finally:
@@ -745,14 +1391,32 @@ def main():
         if manual_record_thread and manual_record_thread.is_alive():
             manual_stop_flag = True
             manual_record_thread.join(timeout=0.5)
-        if anomaly_worker_thread and anomaly_worker_thread.is_alive():
-            anomaly_worker_thread.join(timeout=0.5)
-
+        if event_manager:
+            event_manager.stop()
+        if segment_recorder:
+            segment_recorder.close()
+        if segment_closer:
+            segment_closer.join(timeout=10)
+        if frame_log:
+            frame_log.close()
+        if actuators:
+            actuators.stop(release=False)  # Outputs keep their state, as without the executor
+        if metrics_server:
+            metrics_server.stop()
+
+        if camera_supervisor:
+            camera_supervisor.stop()
+        if capture:
+            capture.stop()
         if cam and hasattr(cam, "shutdown"):
             cam.shutdown()
+        if frame_writer:
+            frame_writer.stop()
+            frame_writer = None
         if db:
             db.close()
-        cv2.destroyAllWindows()
+        if not HEADLESS:
+            cv2.destroyAllWindows()
         logging.info("Shutdown complete.")
 
 
@@ -0,0 +1,251 @@
+import bisect
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; frame stages take well under a frame period (31 ms at 32 fps) when healthy
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(value)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class _Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name):
+        return [(name, (), self.value)]
+
+
+class _Gauge(_Counter):
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self, name):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        samples, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            samples.append((f"{name}_bucket", (("le", _format_value(bound)),), cumulative))
+        samples += [(f"{name}_sum", (), total), (f"{name}_count", (), count)]
+        return samples
+
+
+class _Timer:
+    """
+    Context manager observing the duration of its block.
+    """
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Metric:
+    """
+    A metric family: one child per combination of label values (created by labels()).
+    Without label names the family forwards inc/set/observe/time to its only child.
+    """
+
+    def __init__(self, name, documentation, kind, labelnames=(), factory=None):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}.")
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def __getattr__(self, attr):
+        if attr in ("inc", "dec", "set", "observe", "time") and not self.labelnames:
+            return getattr(self.labels(), attr)
+        raise AttributeError(attr)
+
+    def collect(self):
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            for name, extra, value in child.samples(self.name):
+                yield name, self.labelnames + tuple(k for k, _ in extra), values + tuple(v for _, v in extra), value
+
+
+class CallbackMetric(Metric):
+    """
+    Gauge or counter read at scrape time from `fn`, which returns a number, None (no sample), or
+    {label values tuple: number} for families with labels. Exposes counts other modules already keep.
+    """
+
+    def __init__(self, name, documentation, kind, fn, labelnames=()):
+        super().__init__(name, documentation, kind, labelnames)
+        self.fn = fn
+
+    def collect(self):
+        try:
+            result = self.fn()
+        except Exception as e:
+            logging.debug(f"[METRICS] {self.name} not collected: {e}")
+            return
+        if result is None:
+            return
+        if not isinstance(result, dict):
+            result = {(): result}
+        for values, value in result.items():
+            if value is not None:
+                values = values if isinstance(values, tuple) else (values,)
+                yield self.name, self.labelnames, tuple(str(v) for v in values), value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if existing.kind != metric.kind or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered differently.")
+                if isinstance(metric, CallbackMetric):
+                    existing.fn = metric.fn   # Re-registered for a new pipeline object
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=(), fn=None):
+        if fn is not None:
+            return self._register(CallbackMetric(name, documentation, "counter", fn, labelnames))
+        return self._register(Metric(name, documentation, "counter", labelnames, _Counter))
+
+    def gauge(self, name, documentation, labelnames=(), fn=None):
+        if fn is not None:
+            return self._register(CallbackMetric(name, documentation, "gauge", fn, labelnames))
+        return self._register(Metric(name, documentation, "gauge", labelnames, _Gauge))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        buckets = tuple(sorted(buckets))
+        return self._register(Metric(name, documentation, "histogram", labelnames, lambda: _Histogram(buckets)))
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            help_text = metric.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+            lines += [f"# HELP {metric.name} {help_text}", f"# TYPE {metric.name} {metric.kind}"]
+            for name, labelnames, values, value in metric.collect():
+                lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serves a registry at http://host:port/metrics for Prometheus scrapes, from a daemon thread.
+    """
+
+    def __init__(self, registry, host="127.0.0.1", port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.scrapes = 0
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = server.registry.render().encode()
+                server.scrapes += 1
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(f"[METRICS] {self.address_string()} {format % args}")
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]   # Port 0 picks a free port
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        logging.info(f"[METRICS] Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5)
+        self._server = self._thread = None
+        logging.info("[METRICS] Metrics server stopped.")
@@ -0,0 +1,217 @@
+import logging
+import os
+import struct
+from fractions import Fraction
+
+import cv2
+
+AVIF_HASINDEX = 0x10
+AVIIF_KEYFRAME = 0x10
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_dimensions(data):
+    """
+    Returns (width, height) from the start-of-frame segment of a JPEG, without decoding it.
+    """
+    data = memoryview(data)
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            raise ValueError("Malformed JPEG: expected a marker.")
+        marker = data[i + 1]
+        if marker == 0xFF:  # Fill byte
+            i += 1
+            continue
+        length = struct.unpack_from(">H", data, i + 2)[0]
+        if marker in _SOF_MARKERS:
+            height, width = struct.unpack_from(">HH", data, i + 5)
+            return width, height
+        i += 2 + length
+    raise ValueError("Malformed JPEG: no start-of-frame segment.")
+
+
+def encode_jpeg(frame, quality=95):
+    success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        raise RuntimeError("JPEG encoding failed.")
+    return buffer.tobytes()
+
+
+class MjpegAviWriter:
+    """
+    Writes an MJPG AVI file from JPEG payloads. Already encoded frames (e.g. the JPEGs in the
+    frame database) are muxed as they are, so they are not decoded and re-encoded, and raw BGR
+    frames are encoded exactly once. The result plays like a cv2.VideoWriter MJPG file.
+    AVI 1.0 layout (RIFF sizes are 32 bit), which is ample for anomaly clips.
+
+    Frames go to disk as they are written. Every `sync_interval` frames the header sizes and
+    frame counts are updated and the file is flushed, so a clip cut short by a crash still plays
+    up to the last sync (without an index; players fall back to scanning the chunks).
+    """
+
+    wants_jpeg = True  # JPEG bytes are muxed as they are
+
+    def __init__(self, filename, fps=32, quality=95, sync_interval=32):
+        """
+        The frame size is taken from the first frame written.
+        quality: JPEG quality for frames that still have to be encoded.
+        sync_interval: frames between header updates and flushes (0 = only on close).
+        """
+        self.filename = str(filename)
+        self.fps = fps
+        self.quality = quality
+        self.sync_interval = sync_interval
+        self.width = self.height = None
+        self.frames = 0
+        self.encoded = 0   # Frames that had to be encoded here
+        self.passthrough = 0
+        self._index = []
+        self._max_chunk = 0
+        self._file = open(self.filename, "wb")
+        self._movi_start = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _rate(self):
+        return Fraction(self.fps).limit_denominator(1000) if self.fps and self.fps > 0 else Fraction(32)
+
+    def _write_headers(self):
+        rate = self._rate()
+        f = self._file
+        f.write(b"RIFF" + struct.pack("<I", 0) + b"AVI ")
+        f.write(b"LIST" + struct.pack("<I", 4 + 8 + 56 + 8 + 4 + 8 + 56 + 8 + 40) + b"hdrl")
+        self._avih = f.tell() + 8
+        f.write(b"avih" + struct.pack("<I", 56))
+        f.write(struct.pack("<10I4I", int(round(1e6 / rate)), 0, 0, AVIF_HASINDEX, 0, 0, 1, 0,
+                            self.width, self.height, 0, 0, 0, 0))
+        f.write(b"LIST" + struct.pack("<I", 4 + 8 + 56 + 8 + 40) + b"strl")
+        self._strh = f.tell() + 8
+        f.write(b"strh" + struct.pack("<I", 56))
+        f.write(b"vids" + b"MJPG" + struct.pack("<IHHIIIIIIIIhhhh", 0, 0, 0, 0, rate.denominator,
+                                                  rate.numerator, 0, 0, 0, 0xFFFFFFFF, 0,
+                                                  0, 0, self.width, self.height))
+        f.write(b"strf" + struct.pack("<I", 40))
+        f.write(struct.pack("<IiiHH4sIiiII", 40, self.width, self.height, 1, 24, b"MJPG",
+                            self.width * self.height * 3, 0, 0, 0, 0))
+        f.write(b"LIST" + struct.pack("<I", 0))
+        self._movi_start = f.tell()
+        f.write(b"movi")
+
+    def write_jpeg(self, data):
+        """
+        Appends one already encoded JPEG frame.
+        """
+        if self._movi_start is None:
+            self.width, self.height = jpeg_dimensions(data)
+            self._write_headers()
+        size = len(data)
+        self._index.append((self._file.tell() - self._movi_start, size))
+        self._file.write(b"00dc" + struct.pack("<I", size))
+        self._file.write(data)
+        if size % 2:
+            self._file.write(b"\0")
+        self._max_chunk = max(self._max_chunk, size)
+        self.frames += 1
+        self.passthrough += 1
+        if self.sync_interval and self.frames % self.sync_interval == 0:
+            self.sync()
+
+    def write(self, frame):
+        """
+        Appends a BGR frame (encoded once here) or JPEG bytes (muxed unchanged).
+        """
+        if isinstance(frame, (bytes, bytearray, memoryview)):
+            self.write_jpeg(frame)
+            return
+        if self._movi_start is not None and frame.shape[:2] != (self.height, self.width):
+            frame = cv2.resize(frame, (self.width, self.height))
+        self.write_jpeg(encode_jpeg(frame, self.quality))
+        self.passthrough -= 1
+        self.encoded += 1
+
+    def _patch_headers(self, movi_end, end):
+        f = self._file
+        rate = self._rate()
+        f.seek(4)
+        f.write(struct.pack("<I", end - 8))
+        f.seek(self._avih)  # dwMicroSecPerFrame
+        f.write(struct.pack("<I", int(round(1e6 / rate))))
+        f.seek(self._avih + 16)  # dwTotalFrames
+        f.write(struct.pack("<I", self.frames))
+        f.seek(self._avih + 28)  # dwSuggestedBufferSize
+        f.write(struct.pack("<I", self._max_chunk + 8))
+        f.seek(self._strh + 20)  # dwScale, dwRate, dwStart, dwLength, dwSuggestedBufferSize
+        f.write(struct.pack("<IIIII", rate.denominator, rate.numerator, 0, self.frames, self._max_chunk + 8))
+        f.seek(self._movi_start - 4)
+        f.write(struct.pack("<I", movi_end - self._movi_start))
+        f.seek(end)
+
+    def sync(self):
+        """
+        Makes the frames written so far playable: updates the header sizes and flushes to disk.
+        """
+        if self._movi_start is None or self._file.closed:
+            return
+        end = self._file.tell()
+        self._patch_headers(end, end)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self, fps=None):
+        """
+        Writes the index and final headers. `fps` replaces the frame rate given at creation,
+        e.g. with the rate measured while the clip was streamed.
+        """
+        f = self._file
+        if f.closed:
+            return
+        try:
+            if self._movi_start is None:
+                return  # No frames, nothing to index
+            if fps:
+                self.fps = fps
+            movi_end = f.tell()
+            f.write(b"idx1" + struct.pack("<I", 16 * len(self._index)))
+            f.write(b"".join(struct.pack("<4sIII", b"00dc", AVIIF_KEYFRAME, offset, size)
+                             for offset, size in self._index))
+            self._patch_headers(movi_end, f.tell())
+            logging.debug(f"[AVI] {self.filename}: {self.frames} frames, {self.passthrough} passed through.")
+        finally:
+            f.close()
+
+
+def write_mjpeg_video(frames, filename, fps=32, quality=95):
+    """
+    Writes BGR frames and/or JPEG bytes to an MJPG AVI. Returns the writer (for its counters).
+    """
+    writer = MjpegAviWriter(filename, fps, quality)
+    with writer:
+        for frame in frames:
+            writer.write(frame)
+    return writer
+
+
+def read_mjpeg_frames(filename):
+    """
+    Yields the JPEG payloads of an MJPG AVI in order, without decoding them.
+    Walks the movi chunks directly, so clips that were never closed are read up to their last frame.
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+    movi = data.find(b"movi")
+    if data[:4] != b"RIFF" or movi < 0:
+        raise ValueError(f"{filename} is not an AVI file.")
+    i = movi + 4
+    while i + 8 <= len(data):
+        fourcc = data[i:i + 4]
+        size = struct.unpack_from("<I", data, i + 4)[0]
+        if fourcc == b"idx1" or i + 8 + size > len(data):
+            break
+        if fourcc[2:] == b"dc":
+            yield data[i + 8:i + 8 + size]
+        i += 8 + size + (size & 1)
@@ -358,7 +358,7 @@ def main():
                     with db_lock:
                         db.insert_frame(frame)
                     timestamp = datetime.datetime.now().isoformat()
-                    logging.info("Frame stored at timestamp: %s", timestamp)
+                    logging.debug("Frame stored at timestamp: %s", timestamp)
                     with open(FRAME_LOG_FILE, mode='a', newline='') as csvfile:
                         writer = csv.writer(csvfile)
                         writer.writerow([timestamp, mode, f"{temp:.2f}" if temp is not None else "N/A", recording])
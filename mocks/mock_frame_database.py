@@ -14,13 +14,14 @@ class MockFrameDatabase:
         self.fps = fps
         logging.info("[MOCK DB] Initialized in-memory frame storage.")
 
-    def insert_frame(self, frame):
+    def insert_frame(self, frame, thermal=None, timestamp=None):
         """
-        Store the frame with the current timestamp in memory.
+        Store the frame with its capture timestamp (default: now) in memory.
+        The thermal matrix is accepted for API compatibility and ignored.
         """
         self.frame_buffer.append(frame)
-        self.timestamp_buffer.append(time.time())
-        logging.info(f"[MOCK DB] Frame stored (total {len(self.frame_buffer)} frames).")
+        self.timestamp_buffer.append(time.time() if timestamp is None else timestamp)
+        logging.debug(f"[MOCK DB] Frame stored (total {len(self.frame_buffer)} frames).")
 
     def get_frames_from_last_n_seconds(self, seconds=10):
         """
@@ -0,0 +1,255 @@
+import bisect
+import csv
+import datetime
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from camera_control import FLAG_OPEN
+from frame_log import FRAME_LOG_MAGIC, read_frame_log
+from palette import PaletteLut
+from thermal_codec import decode_thermal, raw_to_celsius
+
+
+class DatabaseSource:
+    """
+    Frames stored in a FrameDatabase file (frame_store.db), read row by row.
+    """
+
+    def __init__(self, path, start_time=None, end_time=None):
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        rows = self.conn.execute(
+            "SELECT id, timestamp FROM frames WHERE timestamp >= ? AND timestamp <= ? ORDER BY timestamp ASC",
+            (start_time if start_time is not None else float("-inf"),
+             end_time if end_time is not None else float("inf"))
+        ).fetchall()
+        self.ids = [row[0] for row in rows]
+        self.timestamps = [row[1] for row in rows]
+
+    def read(self, index):
+        image, thermal, width, height = self.conn.execute(
+            "SELECT image, thermal, thermal_width, thermal_height FROM frames WHERE id = ?", (self.ids[index],)
+        ).fetchone()
+        frame = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR) if image is not None else None
+        thermal = decode_thermal(thermal, width, height) if thermal is not None else None
+        return frame, thermal
+
+    def close(self):
+        self.conn.close()
+
+
+class ThermalRecordingSource:
+    """
+    Raw thermal recording: a .npz file with "thermal" (N, height, width) uint16 and "timestamps" (N) arrays,
+    as written by save_thermal_recording.
+    """
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.frames = data["thermal"]
+            self.timestamps = data["timestamps"].tolist()
+
+    def read(self, index):
+        return None, self.frames[index]
+
+    def close(self):
+        pass
+
+
+class VideoSource:
+    """
+    AVI (or any OpenCV readable) video; frame times come from its frame rate.
+    """
+
+    def __init__(self, path, fps=None):
+        self.cap = cv2.VideoCapture(str(path))
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Could not open video {path}.")
+        fps = fps or self.cap.get(cv2.CAP_PROP_FPS) or 32.0
+        count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.timestamps = [i / fps for i in range(count)]
+        self._position = 0
+
+    def read(self, index):
+        if index != self._position:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = self.cap.read()
+        self._position = index + 1
+        if not ret:
+            raise RuntimeError(f"Could not read video frame {index}.")
+        return frame, None
+
+    def close(self):
+        self.cap.release()
+
+
+def save_thermal_recording(path, timestamps, frames):
+    """
+    Writes raw thermal frames (e.g. from FrameDatabase.get_thermal_frames(..., raw=True)) for replay.
+    """
+    np.savez(path, thermal=np.asarray(frames, dtype=np.uint16), timestamps=np.asarray(timestamps, dtype=np.float64))
+
+
+def load_temperature_log(path):
+    """
+    Reads (timestamps, temperatures) from a frame log (binary frame_log.bin or CSV);
+    rows without a temperature are skipped.
+    """
+    with open(path, "rb") as f:
+        binary = f.read(len(FRAME_LOG_MAGIC)) == FRAME_LOG_MAGIC
+    if binary:
+        _, records = read_frame_log(path)
+        records = np.sort(records[~np.isnan(records["temperature"])], order="timestamp")
+        return records["timestamp"].tolist(), records["temperature"].astype(float).tolist()
+    timestamps, temps = [], []
+    with open(path, newline='') as csvfile:
+        for row in csv.DictReader(csvfile):
+            try:
+                temps.append(float(row["temperature"]))
+                timestamps.append(datetime.datetime.fromisoformat(row["timestamp"]).timestamp())
+            except (KeyError, ValueError):
+                continue
+    order = np.argsort(timestamps)
+    return [timestamps[i] for i in order], [temps[i] for i in order]
+
+
+class ReplayCameraController:
+    """
+    Camera that plays back a stored session with its original frame timing, or `speed` times faster.
+    Sources: a FrameDatabase file (.db), a raw thermal recording (.npz) or a video file (.avi, ...).
+    Frames are delivered like a live camera: capture times are the replay times, the recorded
+    time of each frame is kept in last_info["recorded_time"].
+    """
+
+    def __init__(self, path, speed=1.0, loop=True, start_time=None, end_time=None, temperature_log=None,
+                 thermal_only=False, palette=None, video_fps=None):
+        """
+        speed: playback speed factor, 0 = as fast as frames can be read.
+        loop: restart at the first frame after the last one; otherwise get_frame returns (None, None)
+        and `finished` is set.
+        start_time / end_time: recorded time range to replay (database sources only).
+        temperature_log: frame log (frame_log.bin or .csv) whose temperatures are used for frames without thermal data.
+        """
+        path = Path(path)
+        suffix = path.suffix.lower()
+        if suffix == ".db":
+            self.source = DatabaseSource(path, start_time, end_time)
+        elif suffix == ".npz":
+            self.source = ThermalRecordingSource(path)
+        else:
+            self.source = VideoSource(path, video_fps)
+        if not self.source.timestamps:
+            raise RuntimeError(f"No frames to replay in {path}.")
+
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.buffer_slots = 0
+        self.self_paced = True  # get_frame sleeps to the recorded timing itself
+        self.thermal_only = thermal_only
+        self.palette = palette or PaletteLut()
+        self.last_thermal = None
+        self.last_info = None
+        self.finished = False
+        self.loops = 0
+        self._counter = 0
+        self._index = 0
+        self._temps = load_temperature_log(temperature_log) if temperature_log else None
+        self._anchor()
+        logging.info(f"[REPLAY] {len(self.source.timestamps)} frames from {path} at {speed}x speed.")
+
+    def __len__(self):
+        return len(self.source.timestamps)
+
+    @property
+    def position(self):
+        return self._index
+
+    @property
+    def duration(self):
+        return self.source.timestamps[-1] - self.source.timestamps[0]
+
+    def _anchor(self):
+        # Frame `_index` is due now; later frames follow at their recorded offsets
+        self._anchor_time = time.monotonic()
+        self._anchor_recorded = self.source.timestamps[self._index]
+
+    def seek(self, seconds=None, index=None):
+        """
+        Jumps to a frame index, or to `seconds` after the first recorded frame.
+        """
+        if index is None:
+            target = self.source.timestamps[0] + (seconds or 0.0)
+            index = bisect.bisect_left(self.source.timestamps, target)
+        self._index = max(0, min(index, len(self) - 1))
+        self.finished = False
+        self._anchor()
+
+    def _temperature(self, thermal, recorded_time):
+        if thermal is not None:
+            return raw_to_celsius(cv2.mean(thermal)[0])
+        if self._temps and self._temps[0]:
+            timestamps, temps = self._temps
+            i = min(bisect.bisect_left(timestamps, recorded_time), len(temps) - 1)
+            if i > 0 and recorded_time - timestamps[i - 1] < timestamps[i] - recorded_time:
+                i -= 1
+            return temps[i]
+        return None
+
+    def _next(self):
+        if self._index >= len(self):
+            if not self.loop:
+                self.finished = True
+                return None
+            self.loops += 1
+            self._index = 0
+            self._anchor()
+
+        index = self._index
+        recorded_time = self.source.timestamps[index]
+        if self.speed:
+            delay = self._anchor_time + (recorded_time - self._anchor_recorded) / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        frame, thermal = self.source.read(index)
+        self._index += 1
+        self._counter += 1
+        self.last_thermal = thermal
+        self.last_info = {
+            "counter": self._counter,
+            "counter_hw": self._counter,
+            "hw_timestamp": None,
+            "flag_state": FLAG_OPEN,
+            "capture_time": time.time(),
+            "capture_monotonic": time.monotonic(),
+            "recorded_time": recorded_time,
+        }
+        return frame, thermal, self._temperature(thermal, recorded_time)
+
+    def get_frame(self):
+        result = self._next()
+        if result is None:
+            return None, None
+        frame, thermal, temp = result
+        if frame is None:
+            frame = self.palette.render(thermal)
+        return frame, temp
+
+    def get_thermal(self):
+        result = self._next()
+        if result is None:
+            return None, None
+        frame, thermal, temp = result
+        if thermal is None:
+            raise RuntimeError(f"{self.path} has no thermal data, disable thermal_only for replay.")
+        return thermal, temp
+
+    def trigger_anomaly(self):
+        logging.warning("[REPLAY] Anomalies come from the recording, trigger ignored.")
+
+    def shutdown(self):
+        self.source.close()
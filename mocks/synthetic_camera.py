@@ -0,0 +1,209 @@
+import argparse
+import logging
+import time
+
+import cv2
+import numpy as np
+
+from camera_control import FLAG_OPEN, FLAG_CLOSING, FLAG_CLOSE, FLAG_OPENING
+from palette import PaletteLut
+from thermal_codec import RAW_SCALE, RAW_OFFSET
+
+# Default scene: two hotspots crossing the image and a slow warm-up of the background
+DEFAULT_HOTSPOTS = [
+    {"position": [0.1, 0.5], "velocity": [0.05, 0.0], "radius": 0.06, "peak": 40.0},
+    {"position": [0.8, 0.2], "velocity": [-0.03, 0.04], "radius": 0.1, "peak": 15.0, "period": 8.0},
+]
+DEFAULT_RAMPS = [{"start": 5.0, "duration": 20.0, "delta": 5.0}]
+
+
+class SyntheticCameraController:
+    """
+    Generates synthetic raw thermal frames with the interface of CameraController.
+    The scene is an ambient background with a horizontal gradient, scripted moving hotspots,
+    background ramps, sensor noise and shutter flag cycles. Scene time advances by 1/fps per frame,
+    so a run is reproducible regardless of how fast frames are pulled.
+
+    Every frame is built from vectorised operations only: hotspots are separable Gaussians
+    (one outer product each) and noise comes from a pregenerated bank.
+    """
+
+    def __init__(self, width=160, height=120, fps=32, realtime=True, ambient=22.0, gradient=3.0,
+                 hotspots=None, ramps=None, noise=0.3, flag_interval=0.0, flag_duration=0.3,
+                 buffer_slots=0, thermal_only=False, palette=None, seed=0, serial=None):
+        """
+        fps: scene frame rate; with `realtime` get_frame sleeps to hold it, otherwise frames come as fast as possible.
+        ambient / gradient: background temperature in °C and its left-to-right increase.
+        hotspots: [{"position": [x, y], "velocity": [vx, vy], "radius", "peak", "start", "duration", "period"}],
+        positions and radius as fractions of the image size, velocity in fractions per second, peak in °C
+        above the background; "period" makes the hotspot pulse, "start"/"duration" limit when it is visible.
+        ramps: [{"start", "duration", "delta"}] linear background changes in °C.
+        noise: standard deviation of the per-pixel noise in °C.
+        flag_interval: seconds between shutter flag cycles (0 = never); the image is frozen during
+        the `flag_duration` seconds of a cycle, like on the real imager.
+        buffer_slots / thermal_only / palette: as for CameraController.
+        """
+        self.width, self.height = width, height
+        self.fps = fps
+        self.realtime = realtime
+        self.self_paced = True
+        self.ambient = ambient
+        self.hotspots = DEFAULT_HOTSPOTS if hotspots is None else hotspots
+        self.ramps = DEFAULT_RAMPS if ramps is None else ramps
+        self.flag_interval = flag_interval
+        self.flag_duration = flag_duration
+        self.buffer_slots = buffer_slots
+        self.thermal_only = thermal_only
+        self.palette = palette or PaletteLut()
+        self.requested_serial = serial
+        self.last_thermal = None
+        self.last_info = None
+        self.frame_index = 0
+        self._anomaly_until = None
+        self._next_time = None
+
+        rng = np.random.default_rng(seed)
+        self._x = np.arange(width, dtype=np.float32)
+        self._y = np.arange(height, dtype=np.float32)
+        self._background = np.broadcast_to(
+            (ambient + gradient * self._x / max(1, width - 1)).astype(np.float32), (height, width)).copy()
+        self._noise = (rng.standard_normal((8, height, width)) * noise).astype(np.float32)
+        self._scene = np.empty((height, width), dtype=np.float32)
+
+        slots = max(1, buffer_slots)
+        self.thermal_pool = [np.zeros((height, width), dtype=np.uint16) for _ in range(slots)]
+        self.thermal_views = [self._read_only_view(t) for t in self.thermal_pool]
+        self._slot = 0
+        logging.info(f"[SYNTH] Synthetic camera {width}x{height} at {fps} fps, {len(self.hotspots)} hotspots.")
+
+    @staticmethod
+    def _read_only_view(array):
+        view = array.view()
+        view.flags.writeable = False
+        return view
+
+    def _flag_state(self, t):
+        if not self.flag_interval or t < self.flag_interval:
+            return FLAG_OPEN
+        phase = t % self.flag_interval
+        if phase >= self.flag_duration:
+            return FLAG_OPEN
+        third = self.flag_duration / 3
+        return FLAG_CLOSING if phase < third else FLAG_CLOSE if phase < 2 * third else FLAG_OPENING
+
+    def _ramp_offset(self, t):
+        offset = 0.0
+        for ramp in self.ramps:
+            start, duration = ramp.get("start", 0.0), ramp.get("duration", 0.0)
+            if t >= start:
+                offset += ramp["delta"] * (min(1.0, (t - start) / duration) if duration else 1.0)
+        return offset
+
+    def _add_hotspot(self, scene, t, spot):
+        start = spot.get("start", 0.0)
+        duration = spot.get("duration")
+        if t < start or (duration is not None and t > start + duration):
+            return
+        elapsed = t - start
+        x = (spot["position"][0] + spot.get("velocity", (0, 0))[0] * elapsed) % 1.0 * self.width
+        y = (spot["position"][1] + spot.get("velocity", (0, 0))[1] * elapsed) % 1.0 * self.height
+        sigma = spot.get("radius", 0.05) * min(self.width, self.height)
+        peak = spot["peak"]
+        if spot.get("period"):
+            peak *= 0.5 * (1.0 + np.sin(2 * np.pi * elapsed / spot["period"]))
+        # exp(-(dx² + dy²) / 2σ²) is the outer product of two 1-D Gaussians
+        gx = np.exp(-((self._x - x) ** 2) / (2 * sigma ** 2)).astype(np.float32)
+        gy = np.exp(-((self._y - y) ** 2) / (2 * sigma ** 2)).astype(np.float32) * np.float32(peak)
+        scene += np.outer(gy, gx)
+
+    def render_scene(self, t, out):
+        """
+        Writes the raw uint16 thermal matrix of scene time `t` into `out`.
+        """
+        scene = self._scene
+        np.add(self._background, self._noise[self.frame_index % len(self._noise)], out=scene)
+        scene += np.float32(self._ramp_offset(t))
+        for spot in self.hotspots:
+            self._add_hotspot(scene, t, spot)
+        if self._anomaly_until is not None and t < self._anomaly_until:
+            self._add_hotspot(scene, t, {"position": [0.5, 0.5], "radius": 0.15, "peak": 60.0})
+        scene += np.float32(RAW_OFFSET)
+        scene *= np.float32(RAW_SCALE)
+        np.clip(scene, 0, 65535, out=scene)
+        np.copyto(out, scene, casting="unsafe")
+        return out
+
+    def trigger_anomaly(self, duration=1.0):
+        """
+        Adds a large hotspot in the image centre for `duration` seconds of scene time.
+        """
+        self._anomaly_until = self.frame_index / self.fps + duration
+        logging.info("[SYNTH] Anomaly hotspot injected.")
+
+    def _pace(self):
+        if not self.realtime or not self.fps:
+            return
+        now = time.monotonic()
+        if self._next_time is None or now - self._next_time > 1.0:
+            self._next_time = now
+        delay = self._next_time - now
+        if delay > 0:
+            time.sleep(delay)
+        self._next_time += 1.0 / self.fps
+
+    def get_thermal(self):
+        self._pace()
+        t = self.frame_index / self.fps if self.fps else 0.0
+        flag_state = self._flag_state(t)
+        slot = self._slot
+        previous = self.thermal_pool[(slot - 1) % len(self.thermal_pool)]
+        if self.buffer_slots:
+            self._slot = (slot + 1) % self.buffer_slots
+        thermal = self.thermal_pool[slot]
+        if flag_state != FLAG_OPEN and self.frame_index:
+            np.copyto(thermal, previous)  # The closed flag freezes the image
+        else:
+            self.render_scene(t, thermal)
+        self.frame_index += 1
+        self.last_info = {
+            "counter": self.frame_index,
+            "counter_hw": self.frame_index,
+            "hw_timestamp": int(t * 1e7),
+            "flag_state": flag_state,
+            "capture_time": time.time(),
+            "capture_monotonic": time.monotonic(),
+        }
+        mean_temp = cv2.mean(thermal)[0] / RAW_SCALE - RAW_OFFSET
+        self.last_thermal = self.thermal_views[slot] if self.buffer_slots else thermal.copy()
+        return self.last_thermal, mean_temp
+
+    def get_frame(self):
+        thermal, mean_temp = self.get_thermal()
+        return self.palette.render(thermal), mean_temp
+
+    def shutdown(self):
+        logging.info(f"[SYNTH] Synthetic camera stopped after {self.frame_index} frames.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how fast synthetic thermal frames can be generated.")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--hotspots", type=int, default=4)
+    args = parser.parse_args()
+
+    hotspots = [{"position": [i / args.hotspots, 0.5], "velocity": [0.1, 0.02 * i], "radius": 0.05, "peak": 30.0}
+                for i in range(args.hotspots)]
+    cam = SyntheticCameraController(args.width, args.height, fps=32, realtime=False, hotspots=hotspots,
+                                    buffer_slots=16)
+    for name, read in (("thermal", cam.get_thermal), ("thermal + palette", cam.get_frame)):
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            read()
+        elapsed = time.perf_counter() - start
+        print(f"{args.width}x{args.height} {name}: {args.frames / elapsed:.0f} fps")
+
+
+if __name__ == "__main__":
+    main()
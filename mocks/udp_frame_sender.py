@@ -0,0 +1,155 @@
+import argparse
+import logging
+import socket
+import time
+
+import numpy as np
+
+from camera_control import FLAG_OPEN, FLAG_CLOSING, FLAG_CLOSE, FLAG_OPENING
+from network_camera import pack_chunks, DEFAULT_PORT, DEFAULT_CHUNK_SIZE
+from thermal_codec import celsius_to_raw
+
+
+class UdpFrameSender:
+    """
+    Simulates an ethernet imager: sends synthetic raw thermal frames to a NetworkCameraController.
+    Frames are generated once and reused, so the send rate is only limited by the socket.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, width=160, height=120, fps=32,
+                 chunk_size=DEFAULT_CHUNK_SIZE, flag_interval=0, loss=0.0, pattern_frames=64):
+        """
+        fps: target frame rate, 0 = as fast as possible.
+        flag_interval: send a shutter flag cycle (closing, close, opening) every N frames, 0 = never.
+        loss: fraction of datagrams dropped on purpose to exercise incomplete frame handling.
+        """
+        self.address = (host, port)
+        self.fps = fps
+        self.chunk_size = chunk_size
+        self.flag_interval = flag_interval
+        self.loss = loss
+        self.frames_sent = 0
+        self.packets_sent = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        self._rng = np.random.default_rng(0)
+        self.frames = self._make_frames(width, height, pattern_frames)
+
+    def _make_frames(self, width, height, count):
+        """
+        Background around 25 °C with a hot spot moving across the image.
+        """
+        y, x = np.mgrid[0:height, 0:width]
+        background = celsius_to_raw(22.0) + (x * 60 // max(1, width - 1))
+        frames = []
+        for i in range(count):
+            cx = int((i / count) * width)
+            cy = height // 2
+            spot = np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * (min(width, height) / 12) ** 2))
+            noise = self._rng.integers(-3, 4, size=(height, width))
+            frame = background + spot * 400 + noise
+            frames.append(np.clip(frame, 0, 65535).astype(np.uint16))
+        return frames
+
+    def flag_state(self, frame_id):
+        if not self.flag_interval:
+            return FLAG_OPEN
+        phase = frame_id % self.flag_interval
+        return {1: FLAG_CLOSING, 2: FLAG_CLOSE, 3: FLAG_CLOSE, 4: FLAG_OPENING}.get(phase, FLAG_OPEN)
+
+    def send_frame(self, thermal, frame_id):
+        timestamp = int(time.monotonic() * 1e7)  # 100 ns units like the SDK
+        packets = pack_chunks(thermal, frame_id, hw_timestamp=timestamp,
+                              flag_state=self.flag_state(frame_id), chunk_size=self.chunk_size)
+        for packet in packets:
+            if self.loss and self._rng.random() < self.loss:
+                continue
+            self.sock.sendto(packet, self.address)
+            self.packets_sent += 1
+        self.frames_sent += 1
+
+    def run(self, duration=None, count=None):
+        """
+        Sends frames until `duration` seconds passed or `count` frames were sent.
+        Returns the achieved frame rate.
+        """
+        interval = 1.0 / self.fps if self.fps else 0.0
+        start = next_time = time.monotonic()
+        frame_id = 0
+        while (duration is None or time.monotonic() - start < duration) and (count is None or frame_id < count):
+            frame_id += 1
+            self.send_frame(self.frames[frame_id % len(self.frames)], frame_id)
+            if interval:
+                next_time += interval
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        elapsed = time.monotonic() - start
+        return self.frames_sent / elapsed if elapsed > 0 else 0.0
+
+    def close(self):
+        self.sock.close()
+
+
+def load_test(args):
+    """
+    Runs a NetworkCameraController on the target port and reports how many frames arrived.
+    """
+    import threading
+    from network_camera import NetworkCameraController
+
+    cam = NetworkCameraController(port=args.port, buffer_slots=16)
+    received = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                cam.get_frame()
+                received.append(time.monotonic())
+            except RuntimeError:
+                pass
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    sender = UdpFrameSender(args.host, args.port, args.width, args.height, args.fps, args.chunk_size,
+                            args.flag_interval, args.loss)
+    sent_fps = sender.run(duration=args.duration)
+    time.sleep(0.2)
+    stop.set()
+    thread.join(timeout=args.duration + 1)
+    status = cam.get_status()
+    cam.shutdown()
+    sender.close()
+    print(f"Sent {sender.frames_sent} frames ({sent_fps:.1f} fps, {sender.packets_sent} packets)")
+    print(f"Read {len(received)} frames ({len(received) / args.duration:.1f} fps)")
+    print(f"Receiver: {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send synthetic thermal frames over UDP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--width", type=int, default=160)
+    parser.add_argument("--height", type=int, default=120)
+    parser.add_argument("--fps", type=float, default=32, help="0 = as fast as possible")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--flag-interval", type=int, default=0, help="Flag cycle every N frames")
+    parser.add_argument("--loss", type=float, default=0.0, help="Fraction of datagrams to drop")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--receive", action="store_true", help="Also run the receiver and report its statistics")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if args.receive:
+        load_test(args)
+        return
+    sender = UdpFrameSender(args.host, args.port, args.width, args.height, args.fps, args.chunk_size,
+                            args.flag_interval, args.loss)
+    fps = sender.run(duration=args.duration)
+    sender.close()
+    print(f"Sent {sender.frames_sent} frames at {fps:.1f} fps ({sender.packets_sent} packets)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import threading
+import time
+
+from camera_control import CameraController
+from capture_engine import CaptureEngine
+from frame_database import FrameDatabase
+from frame_writer import FrameWriter
+from network_camera import NetworkCameraController
+from mocks.synthetic_camera import SyntheticCameraController
+from palette import PaletteLut
+from roi_engine import RoiEngine, select_alarm_temperature
+
+STATUS_INTERVAL = 1.0  # Seconds between status reports of a worker
+
+
+class CameraPipeline:
+    """
+    Detection and storage pipeline for one camera, fed from its capture engine.
+    config keys: serial, start_threshold, stop_threshold, roi, alarm_zone, alarm_stat, store_thermal,
+    flag_frame_policy, thermal_only, palette, palette_span.
+    """
+
+    def __init__(self, config, capture, db, status_queue=None):
+        """
+        db: FrameDatabase, or a FrameWriter in front of it so storage never blocks detection.
+        """
+        self.config = config
+        self.serial = config["serial"]
+        self.capture = capture
+        self.db = db
+        self.status_queue = status_queue
+        self.roi_engine = None
+        self.anomaly_active = False
+        self.frames = 0
+        self.store_errors = 0
+        self.last_temp = None
+        self.alarm_temp = None
+        self.zone_stats = None
+        self.last_error = None
+        self._fps_frames = 0
+        self._fps_start = time.monotonic()
+        self.fps = 0.0
+
+    def _zone_stats(self, thermal):
+        roi = self.config.get("roi") or {}
+        if thermal is None or not roi.get("zones"):
+            return None
+        if self.roi_engine is None or self.roi_engine.shape != thermal.shape[:2]:
+            self.roi_engine = RoiEngine(roi["zones"], thermal.shape[:2],
+                                        percentile=roi.get("percentile", 95),
+                                        hot_threshold=roi.get("hot_threshold"))
+        return self.roi_engine.compute(thermal)
+
+    def process(self, item):
+        """
+        Runs detection and storage for one CapturedFrame.
+        Returns an alarm event dict when a new anomaly starts, otherwise None.
+        """
+        self.frames += 1
+        self._fps_frames += 1
+        self.last_temp = item.temp
+        store = item.flag_valid or self.config.get("flag_frame_policy", "skip") == "store"
+        if self.db is not None and store:
+            thermal = item.thermal if self.config.get("store_thermal", True) else None
+            # Frames nobody looked at yet are stored without a palette image (rendered on read)
+            image = item.frame if thermal is None or item.has_image else None
+            try:
+                self.db.insert_frame(image, thermal=thermal, timestamp=item.timestamp)
+            except Exception:
+                self.store_errors += 1  # Logged by the database; alarms keep being evaluated
+        if not item.flag_valid:
+            return None  # Shutter flag cycle: temperatures are frozen, never alarm on them
+
+        try:
+            self.zone_stats = self._zone_stats(item.thermal)
+        except Exception as e:
+            self.last_error = f"ROI statistics error: {e}"
+            self.zone_stats = None
+        self.alarm_temp = select_alarm_temperature(
+            self.zone_stats, self.config.get("alarm_zone"), self.config.get("alarm_stat", "max"), item.temp)
+
+        if self.alarm_temp is None:
+            return None
+        if self.alarm_temp > self.config.get("start_threshold", 50.0) and not self.anomaly_active:
+            self.anomaly_active = True
+            logging.info(f"[CAM {self.serial}] New anomaly detected: Temp = {self.alarm_temp:.2f} °C")
+            return {"type": "alarm", "serial": self.serial, "temp": self.alarm_temp, "timestamp": item.timestamp,
+                    "monotonic": item.monotonic, "detection": time.monotonic()}
+        if self.alarm_temp < self.config.get("stop_threshold", 45.0):
+            self.anomaly_active = False
+        return None
+
+    def get_status(self):
+        now = time.monotonic()
+        if now - self._fps_start >= STATUS_INTERVAL:
+            self.fps = self._fps_frames / (now - self._fps_start)
+            self._fps_frames, self._fps_start = 0, now
+        database = self.db.db if isinstance(self.db, FrameWriter) else self.db
+        return {
+            "type": "status",
+            "serial": self.serial,
+            "fps": round(self.fps, 1),
+            "frames": self.frames,
+            "store_errors": self.store_errors,
+            "temp": self.last_temp,
+            "alarm_temp": self.alarm_temp,
+            "anomaly_active": self.anomaly_active,
+            "zones": self.zone_stats,
+            "capture": self.capture.get_status() if self.capture else None,
+            "database": database.get_write_stats() if hasattr(database, "get_write_stats") else None,
+            "storage": self.db.get_status() if isinstance(self.db, FrameWriter) else None,
+            "network": self.capture.cam.get_status()
+            if self.capture and isinstance(self.capture.cam, NetworkCameraController) else None,
+            "last_error": self.last_error,
+            "timestamp": time.time(),
+        }
+
+    def run(self, stop_event):
+        last_status = 0.0
+        while not stop_event.is_set():
+            item = self.capture.next_frame(timeout=0.5)
+            if item is not None:
+                try:
+                    event = self.process(item)
+                    if event and self.status_queue is not None:
+                        self.status_queue.put(event)
+                except Exception as e:
+                    self.last_error = str(e)
+                    logging.error(f"[CAM {self.serial}] Pipeline error: {e}")
+            if self.status_queue is not None and time.monotonic() - last_status >= STATUS_INTERVAL:
+                self.status_queue.put(self.get_status())
+                last_status = time.monotonic()
+
+
+def run_camera_pipeline(config, status_queue, log_queue, stop_event):
+    """
+    Worker process entry point: opens the camera with the configured serial and runs
+    capture, detection and storage until `stop_event` is set.
+    A "network" entry ({"port", "sender_ip"}) receives the camera over UDP instead of USB,
+    a "synthetic" entry (scene parameters) generates frames with SyntheticCameraController.
+    """
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+
+    serial = config["serial"]
+    cam, capture, db, writer = None, None, None, None
+    try:
+        palette = PaletteLut(config.get("palette", "iron"), config.get("palette_span"))
+        options = dict(buffer_slots=config.get("buffer_slots", 16), serial=serial,
+                       thermal_only=config.get("thermal_only", False), palette=palette)
+        if config.get("network"):
+            cam = NetworkCameraController(**options, **config["network"])
+        elif config.get("synthetic") is not None:
+            cam = SyntheticCameraController(**options, **config["synthetic"])
+        else:
+            cam = CameraController(**options)
+        capture = CaptureEngine(cam, fps=config.get("fps", 32), buffer_size=config.get("buffer_size", 64),
+                                flag_settle_frames=config.get("flag_settle_frames", 2),
+                                flag_timeout=config.get("flag_timeout", 10),
+                                on_fault=lambda message: logging.error(f"[CAM {serial}] {message}"))
+        capture.start()
+        db = FrameDatabase(config.get("db_path", f"frame_store_{serial}.db"), palette=palette,
+                           synchronous=config.get("db_synchronous", "NORMAL"),
+                           batch_size=config.get("db_batch_size", 16),
+                           batch_interval=config.get("db_batch_interval", 0.25),
+                           max_age=config.get("db_max_age"),
+                           max_size_bytes=config["db_max_size_mb"] * 1024 * 1024
+                           if config.get("db_max_size_mb") else None)
+        writer = FrameWriter(db, capacity=config.get("storage_queue_size", 128),
+                             policy=config.get("storage_overflow_policy", "drop_oldest"))
+        writer.start()
+        CameraPipeline(config, capture, writer, status_queue).run(stop_event)
+    except Exception as e:
+        logging.critical(f"[CAM {serial}] Pipeline failed: {e}")
+        status_queue.put({"type": "status", "serial": serial, "last_error": str(e), "timestamp": time.time()})
+    finally:
+        if capture:
+            capture.stop()
+        if cam:
+            cam.shutdown()
+        if writer:
+            writer.stop()
+        if db:
+            db.close()
+
+
+class MultiCameraSupervisor:
+    """
+    Runs one worker process per camera serial and aggregates their status and alarms.
+    Worker log records are forwarded to this process's logging handlers.
+    """
+
+    def __init__(self, cameras, defaults=None, on_alarm=None):
+        """
+        cameras: list of per-camera config dicts (must contain "serial").
+        defaults: config values used for keys a camera entry does not set.
+        on_alarm: callback(event) called in this process when a worker reports a new anomaly.
+        """
+        self.cameras = [dict(defaults or {}, **camera) for camera in cameras]
+        self.on_alarm = on_alarm
+        self.status = {camera["serial"]: {"serial": camera["serial"]} for camera in self.cameras}
+        self._ctx = multiprocessing.get_context("spawn")
+        self._processes = {}
+        self._status_queue = self._ctx.Queue()
+        self._log_queue = self._ctx.Queue()
+        self._stop_event = self._ctx.Event()
+        self._log_listener = None
+        self._reader_thread = None
+        self._running = False
+
+    def start(self):
+        self._running = True
+        self._stop_event.clear()
+        self._log_listener = logging.handlers.QueueListener(
+            self._log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+        self._log_listener.start()
+        for camera in self.cameras:
+            process = self._ctx.Process(
+                target=run_camera_pipeline,
+                args=(camera, self._status_queue, self._log_queue, self._stop_event),
+                name=f"camera-{camera['serial']}", daemon=True)
+            process.start()
+            self._processes[camera["serial"]] = process
+            logging.info(f"[MULTI] Started pipeline for camera {camera['serial']} (pid {process.pid}).")
+        self._reader_thread = threading.Thread(target=self._read_messages, daemon=True)
+        self._reader_thread.start()
+
+    def _read_messages(self):
+        while self._running:
+            try:
+                message = self._status_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            self.handle_message(message)
+
+    def handle_message(self, message):
+        serial = message.get("serial")
+        if message.get("type") == "alarm":
+            self.status.setdefault(serial, {"serial": serial})["last_alarm"] = message
+            if self.on_alarm:
+                try:
+                    self.on_alarm(message)
+                except Exception as e:
+                    logging.error(f"[MULTI] Alarm handler failed for camera {serial}: {e}")
+        else:
+            self.status[serial] = dict(self.status.get(serial, {}), **message)
+
+    def get_status(self):
+        result = {}
+        for serial, status in self.status.items():
+            process = self._processes.get(serial)
+            result[serial] = dict(status, alive=bool(process and process.is_alive()))
+        return result
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        for serial, process in self._processes.items():
+            process.join(timeout=timeout)
+            if process.is_alive():
+                logging.warning(f"[MULTI] Camera {serial} did not stop, terminating.")
+                process.terminate()
+        self._running = False
+        if self._reader_thread:
+            self._reader_thread.join(timeout=1.0)
+        if self._log_listener:
+            self._log_listener.stop()
+        logging.info("[MULTI] All camera pipelines stopped.")
@@ -0,0 +1,329 @@
+import logging
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from camera_control import FLAG_OPEN
+from palette import PaletteLut
+
+# --- UDP frame protocol ---
+# Every datagram carries one chunk of a raw uint16 thermal frame (little endian) after this header:
+# magic, version, flag_state, chunk_index, chunk_count, width, height, frame_id, counter_hw,
+# hw_timestamp (100 ns units), byte offset of the chunk payload inside the frame.
+PACKET_MAGIC = b"IRFR"
+PACKET_VERSION = 1
+PACKET_HEADER = struct.Struct("<4sBBHHHHIIqI")
+MAX_PACKET_SIZE = 65507
+DEFAULT_PORT = 50011
+DEFAULT_CHUNK_SIZE = 1400  # Payload bytes per datagram; fits a standard 1500 byte ethernet MTU
+REORDER_WINDOW = 64        # Frame ids further back than this mean the sender restarted its counter
+MAX_LATE_RUN = 1024        # Consecutive late datagrams after which the sender is assumed restarted
+
+
+def pack_chunks(thermal, frame_id, counter_hw=None, hw_timestamp=0, flag_state=FLAG_OPEN,
+                chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Splits a uint16 thermal matrix into datagrams of the frame protocol.
+    Returns a list of bytes objects, one per chunk.
+    """
+    height, width = thermal.shape[:2]
+    payload = memoryview(np.ascontiguousarray(thermal, dtype='<u2')).cast('B')
+    chunk_count = (len(payload) + chunk_size - 1) // chunk_size
+    if chunk_count > 0xFFFF:
+        raise ValueError(f"Frame needs {chunk_count} chunks, increase the chunk size.")
+    counter_hw = frame_id if counter_hw is None else counter_hw
+    packets = []
+    for index in range(chunk_count):
+        offset = index * chunk_size
+        header = PACKET_HEADER.pack(PACKET_MAGIC, PACKET_VERSION, flag_state, index, chunk_count, width, height,
+                                    frame_id & 0xFFFFFFFF, counter_hw & 0xFFFFFFFF, hw_timestamp, offset)
+        packets.append(header + payload[offset:offset + chunk_size])
+    return packets
+
+
+class _Assembly:
+    """
+    A frame being reassembled into one of the preallocated buffers.
+    """
+    __slots__ = ("slot", "frame_id", "counter_hw", "hw_timestamp", "flag_state", "chunk_count", "received",
+                 "chunks")
+
+    def __init__(self):
+        self.slot = None
+        self.frame_id = None
+        self.chunks = bytearray(0x10000)  # One byte per chunk index, reset for every frame
+
+
+class NetworkCameraController:
+    """
+    Camera backend for ethernet imagers: receives raw thermal frames over UDP and renders
+    the palette image locally, with the same interface as CameraController.
+
+    A receiver thread reads datagrams with recv_into into one preallocated packet buffer and copies
+    each chunk straight into a preallocated frame buffer; completed frame buffers are handed to
+    get_frame by swapping, never copied. Only the newest complete frame is kept, like the SDK does.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, bind_address="0.0.0.0", sender_ip=None, buffer_slots=0,
+                 timeout=2.0, receive_buffer_bytes=8 * 1024 * 1024, serial=None, thermal_only=False,
+                 palette=None):
+        """
+        sender_ip: only accept datagrams from this address (like check_udp_sender_ip in generic.xml).
+        buffer_slots: same meaning as for CameraController; 0 returns a new array per frame.
+        timeout: seconds get_frame waits for a complete frame before raising.
+        serial: informational only, the camera is selected by the UDP port.
+        thermal_only / palette: as for CameraController.
+        """
+        self.use_webcam = False
+        self.self_paced = True  # get_frame blocks until the sender delivered the next frame
+        self.thermal_only = thermal_only
+        self.palette = palette or PaletteLut()
+        self.buffer_slots = buffer_slots
+        self.sender_ip = sender_ip
+        self.timeout = timeout
+        self.requested_serial = serial
+        self.last_thermal = None
+        self.last_info = None
+
+        self.packets = 0
+        self.bad_packets = 0      # Malformed, foreign or out-of-range datagrams
+        self.late_packets = 0     # Chunks of frames that were already completed or dropped
+        self.frames_completed = 0
+        self.frames_incomplete = 0   # Frames dropped because chunks went missing
+        self.frames_overwritten = 0  # Complete frames replaced before get_frame picked them up
+        self.sender_restarts = 0     # Frame id sequence started over
+        self._late_run = 0
+        self._counter = 0
+
+        self.shape = None
+        self._thermal = []
+        self._bytes = []
+        self._images = []
+        self._thermal_views = []
+        self._image_views = []
+        self._free = deque()
+        self._handed = deque()
+        self._ready = None
+        self._assemblies = [_Assembly(), _Assembly()]
+        self._last_completed = None
+        self._cond = threading.Condition()
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer_bytes)
+        self.sock.settimeout(0.5)
+        self.sock.bind((bind_address, port))
+        self.port = self.sock.getsockname()[1]
+        self._packet = bytearray(MAX_PACKET_SIZE)
+        self._packet_view = memoryview(self._packet)
+        self._zero = memoryview(bytes(0x10000))
+
+        self._running = True
+        self._thread = threading.Thread(target=self._receive, name=f"udp-camera-{self.port}", daemon=True)
+        self._thread.start()
+        logging.info(f"[NET] Listening for thermal frames on UDP {bind_address}:{self.port}.")
+
+    def _allocate(self, width, height):
+        """
+        (Re)allocates the frame buffers for a new resolution. Views handed out earlier keep
+        their old arrays alive, so a resolution change never invalidates them.
+        """
+        count = max(1, self.buffer_slots) + len(self._assemblies) + 1
+        self._thermal = [np.zeros((height, width), dtype=np.uint16) for _ in range(count)]
+        self._bytes = [memoryview(t).cast('B') for t in self._thermal]
+        self._images = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(count)]
+        self._thermal_views = [self._read_only_view(t) for t in self._thermal]
+        self._image_views = [self._read_only_view(img) for img in self._images]
+        with self._cond:
+            self._free = deque(range(count))
+            self._handed.clear()
+            self._ready = None
+        for assembly in self._assemblies:
+            assembly.frame_id = None
+        self.shape = (height, width)
+        logging.info(f"[NET] Frame size {width}x{height}, {count} frame buffers.")
+
+    @staticmethod
+    def _read_only_view(array):
+        view = array.view()
+        view.flags.writeable = False
+        return view
+
+    @staticmethod
+    def _is_older(frame_id, reference):
+        return reference is not None and ((reference - frame_id) & 0xFFFFFFFF) < 0x80000000
+
+    def _start_assembly(self, frame_id, chunk_count):
+        assembly = next((a for a in self._assemblies if a.frame_id is None), None)
+        if assembly is None:
+            # Both buffers busy: the oldest frame will never complete
+            assembly = max(self._assemblies, key=lambda a: (frame_id - a.frame_id) & 0xFFFFFFFF)
+            self.frames_incomplete += 1
+            logging.debug(f"[NET] Frame {assembly.frame_id} incomplete ({assembly.received}/{assembly.chunk_count}).")
+        else:
+            with self._cond:
+                assembly.slot = self._free.popleft()
+        assembly.frame_id = frame_id
+        assembly.chunk_count = chunk_count
+        assembly.received = 0
+        assembly.chunks[:chunk_count] = self._zero[:chunk_count]
+        return assembly
+
+    def _complete(self, assembly):
+        self._last_completed = assembly.frame_id
+        with self._cond:
+            if self._ready is not None:
+                self.frames_overwritten += 1
+                self._free.append(self._ready[0])
+            self._ready = (assembly.slot, assembly.counter_hw, assembly.hw_timestamp, assembly.flag_state,
+                           time.time(), time.monotonic())
+            self._cond.notify_all()
+        self.frames_completed += 1
+        assembly.frame_id = None
+        for other in self._assemblies:
+            # Chunks of older frames still in flight can only arrive late now
+            if other.frame_id is not None and self._is_older(other.frame_id, self._last_completed):
+                self.frames_incomplete += 1
+                other.frame_id = None
+                with self._cond:
+                    self._free.append(other.slot)
+
+    def _restart_sequence(self, frame_id):
+        # The sender restarted (frame ids begin again): forget the old sequence and its partial frames
+        logging.info(f"[NET] Frame id {frame_id} after {self._last_completed}: sender restarted.")
+        self.sender_restarts += 1
+        self._last_completed = None
+        self._late_run = 0
+        for assembly in self._assemblies:
+            if assembly.frame_id is not None:
+                assembly.frame_id = None
+                with self._cond:
+                    self._free.append(assembly.slot)
+
+    def _receive(self):
+        packet, view = self._packet, self._packet_view
+        header_size = PACKET_HEADER.size
+        while self._running:
+            try:
+                if self.sender_ip:
+                    size, address = self.sock.recvfrom_into(packet)
+                    if address[0] != self.sender_ip:
+                        self.bad_packets += 1
+                        continue
+                else:
+                    size = self.sock.recv_into(packet)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if self._running:
+                    logging.error(f"[NET] Receive error: {e}")
+                    time.sleep(0.1)
+                continue
+
+            self.packets += 1
+            if size < header_size:
+                self.bad_packets += 1
+                continue
+            (magic, version, flag_state, index, chunk_count, width, height,
+             frame_id, counter_hw, hw_timestamp, offset) = PACKET_HEADER.unpack_from(packet)
+            if magic != PACKET_MAGIC or version != PACKET_VERSION or index >= chunk_count:
+                self.bad_packets += 1
+                continue
+            if self.shape != (height, width):
+                self._allocate(width, height)
+                self._last_completed = None
+            end = offset + size - header_size
+            if end > height * width * 2:
+                self.bad_packets += 1
+                continue
+            if self._is_older(frame_id, self._last_completed):
+                self._late_run += 1
+                if ((self._last_completed - frame_id) & 0xFFFFFFFF) <= REORDER_WINDOW and \
+                        self._late_run < MAX_LATE_RUN:
+                    self.late_packets += 1
+                    continue
+                self._restart_sequence(frame_id)
+            self._late_run = 0
+
+            assembly = next((a for a in self._assemblies if a.frame_id == frame_id), None)
+            if assembly is None:
+                assembly = self._start_assembly(frame_id, chunk_count)
+            if assembly.chunks[index]:
+                continue  # Duplicate datagram
+            assembly.chunks[index] = 1
+            assembly.received += 1
+            self._bytes[assembly.slot][offset:end] = view[header_size:size]
+            if assembly.received == assembly.chunk_count:
+                assembly.counter_hw = counter_hw
+                assembly.hw_timestamp = hw_timestamp
+                assembly.flag_state = flag_state
+                self._complete(assembly)
+
+    def get_frame(self):
+        slot, thermal, mean_temp = self._next_frame()
+        if not self.buffer_slots or self.thermal_only:
+            return self.palette.render(thermal), mean_temp
+        image, image_view = self._images[slot], self._image_views[slot]
+        if image.shape[:2] != thermal.shape:
+            return self.palette.render(thermal), mean_temp  # Buffers were reallocated meanwhile
+        self.palette.render(thermal, out=image)
+        return image_view, mean_temp
+
+    def get_thermal(self):
+        """
+        Returns (thermal, mean_temp) of the next frame without rendering the palette image.
+        """
+        _, thermal, mean_temp = self._next_frame()
+        return thermal, mean_temp
+
+    def _next_frame(self):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._ready is not None or not self._running, self.timeout):
+                raise RuntimeError(f"No frame received on UDP port {self.port} within {self.timeout} s.")
+            if not self._running:
+                raise RuntimeError("Network camera is shut down.")
+            (slot, counter_hw, hw_timestamp, flag_state, capture_time, capture_monotonic), self._ready = \
+                self._ready, None
+            # Keep the last `buffer_slots` frames valid, recycle older ones
+            self._handed.append(slot)
+            while len(self._handed) > max(1, self.buffer_slots):
+                self._free.append(self._handed.popleft())
+            thermal, thermal_view = self._thermal[slot], self._thermal_views[slot]
+
+        self._counter += 1
+        self.last_info = {
+            "counter": self._counter,
+            "counter_hw": counter_hw,
+            "hw_timestamp": hw_timestamp,
+            "flag_state": flag_state,
+            "capture_time": capture_time,
+            "capture_monotonic": capture_monotonic,
+        }
+        mean_temp = cv2.mean(thermal)[0] / 10.0 - 100.0
+        self.last_thermal = thermal_view if self.buffer_slots else thermal.copy()
+        return slot, self.last_thermal, mean_temp
+
+    def get_status(self):
+        return {
+            "port": self.port,
+            "frame_size": list(self.shape) if self.shape else None,
+            "packets": self.packets,
+            "bad_packets": self.bad_packets,
+            "late_packets": self.late_packets,
+            "sender_restarts": self.sender_restarts,
+            "frames_completed": self.frames_completed,
+            "frames_incomplete": self.frames_incomplete,
+            "frames_overwritten": self.frames_overwritten,
+        }
+
+    def shutdown(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+        self.sock.close()
+        logging.info(f"[NET] UDP camera on port {self.port} stopped.")
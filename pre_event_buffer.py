@@ -0,0 +1,98 @@
+import logging
+import math
+import threading
+
+import numpy as np
+
+
+class PreEventBuffer:
+    """
+    Keeps the most recent `duration` seconds of palette frames in one preallocated numpy ring,
+    so an event can take its pre-event clip without touching the database or decoding JPEGs.
+    Memory use is capacity * height * width * 3 bytes, or * 2 for uint16 thermal matrices. For 10 s
+    at 32 fps (400 frames) that is 23 MB at 160x120 but 368 MB at 640x480, and every snapshot copies
+    the frames it returns once more.
+    """
+
+    def __init__(self, duration=10, fps=32, margin=1.25, render=None, memory_budget=None):
+        """
+        duration: seconds of frames to keep.
+        fps: expected frame rate; the ring holds duration * fps * margin frames.
+        render: callable(matrix) returning the BGR image of a pushed 2-D thermal matrix; with it the
+                ring can keep the matrices of a thermal-only camera and snapshot() renders only the
+                frames it returns.
+        memory_budget: bytes; a larger ring is logged as a warning when it is allocated (None = no check).
+        """
+        self.duration = duration
+        self.render = render
+        self.memory_budget = memory_budget
+        self.capacity = max(2, int(math.ceil(duration * fps * margin)))
+        self._frames = None
+        self._timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self._count = 0   # Frames pushed since the last (re)allocation
+        self._lock = threading.Lock()
+
+    @property
+    def shape(self):
+        return self._frames.shape[1:] if self._frames is not None else None
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def push(self, frame, timestamp):
+        """
+        Copies a frame into the ring. A frame of a new size restarts the buffer.
+        """
+        with self._lock:
+            if self._frames is None or self._frames.shape[1:] != frame.shape:
+                self._frames = np.empty((self.capacity,) + frame.shape, dtype=frame.dtype)
+                self._count = 0
+                logging.info(f"[PRE-EVENT] Buffer of {self.capacity} frames of {frame.shape} "
+                             f"({self._frames.nbytes / 1e6:.1f} MB).")
+                if self.memory_budget and self._frames.nbytes > self.memory_budget:
+                    logging.warning(f"[PRE-EVENT] Buffer uses {self._frames.nbytes / 1e6:.1f} MB, more than the "
+                                    f"budget of {self.memory_budget / 1e6:.1f} MB; shorten the pre-event duration.")
+            index = self._count % self.capacity
+            np.copyto(self._frames[index], frame)
+            self._timestamps[index] = timestamp
+            self._count += 1
+
+    def snapshot(self, seconds=None, end_time=None):
+        """
+        Returns (frames, timestamps) of the last `seconds` (default: duration) before `end_time`
+        (default: the newest frame) in chronological order. frames is a new (N, h, w, 3) array,
+        rendered with `render` if the ring holds thermal matrices.
+        """
+        with self._lock:
+            count = min(self._count, self.capacity)
+            if count == 0:
+                return np.empty((0, 0, 0, 3), dtype=np.uint8), np.empty(0)
+            # Chronological slot order: oldest first
+            start = self._count % self.capacity if self._count > self.capacity else 0
+            order = (np.arange(count) + start) % self.capacity
+            timestamps = self._timestamps[order]
+            end = timestamps[-1] if end_time is None else end_time
+            window = self.duration if seconds is None else seconds
+            selected = order[(timestamps > end - window) & (timestamps <= end)]
+            frames, timestamps = self._frames[selected], self._timestamps[selected]
+        if self.render is not None and frames.ndim == 3:
+            frames = np.stack([self.render(matrix) for matrix in frames]) if len(frames) \
+                else np.empty((0,) + frames.shape[1:] + (3,), dtype=np.uint8)
+        return frames, timestamps
+
+    def clear(self):
+        with self._lock:
+            self._count = 0
+
+    def get_status(self):
+        with self._lock:
+            count = min(self._count, self.capacity)
+            newest = (self._count - 1) % self.capacity
+            oldest = self._count % self.capacity if self._count > self.capacity else 0
+            return {
+                "duration": self.duration,
+                "capacity": self.capacity,
+                "frames": count,
+                "span": float(self._timestamps[newest] - self._timestamps[oldest]) if count else 0.0,
+                "bytes": self._frames.nbytes if self._frames is not None else 0,
+            }
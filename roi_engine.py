@@ -0,0 +1,129 @@
+import logging
+import cv2
+import numpy as np
+
+from thermal_codec import raw_to_celsius, celsius_to_raw
+
+
+def zone_mask(zone, shape):
+    """
+    Builds a boolean mask for a zone config entry:
+    {"name": ..., "rect": [x, y, w, h]} or {"name": ..., "polygon": [[x, y], ...]}.
+    """
+    mask = np.zeros(shape, dtype=np.uint8)
+    if "rect" in zone:
+        x, y, w, h = zone["rect"]
+        mask[max(0, y):max(0, y + h), max(0, x):max(0, x + w)] = 1
+    elif "polygon" in zone:
+        points = np.array(zone["polygon"], dtype=np.int32).reshape(-1, 1, 2)
+        cv2.fillPoly(mask, [points], 1)
+    else:
+        raise ValueError(f"Zone {zone.get('name')} needs a 'rect' or 'polygon'.")
+    return mask.astype(bool)
+
+
+def select_alarm_temperature(stats, zone_name, stat, default):
+    """
+    Picks the temperature alarm thresholds run against.
+    zone_name: zone name, "*" for the hottest zone, or None to use `default` (whole-frame value).
+    """
+    if not zone_name or not stats:
+        return default
+    if zone_name == "*":
+        return max(zone.get(stat, zone["max"]) for zone in stats.values())
+    zone = stats.get(zone_name)
+    if zone is None:
+        return default
+    return zone.get(stat, zone["max"])
+
+
+class RoiEngine:
+    """
+    Computes per-zone min/max/mean/percentile/hot-pixel statistics for many zones at once.
+    Zone pixels are gathered with one precomputed index array (zones may overlap), so each
+    frame costs a single gather plus a few segment reductions regardless of the zone count.
+    """
+
+    def __init__(self, zones, shape, percentile=95, hot_threshold=None):
+        """
+        zones: list of zone config dicts (see zone_mask); an optional per-zone "hot_threshold"
+        in °C overrides the global `hot_threshold`.
+        shape: (height, width) of the thermal matrix.
+        percentile: percentile reported per zone, or None to skip it (saves the per-frame sort).
+        """
+        self.shape = tuple(shape)
+        self.percentile = percentile
+        self.names = []
+        indices = []
+        hot_raw = []
+        for zone in zones:
+            idx = np.flatnonzero(zone_mask(zone, self.shape))
+            name = zone.get("name", f"zone{len(self.names) + 1}")
+            if idx.size == 0:
+                logging.warning(f"[ROI] Zone {name} is empty for frame size {self.shape}, ignored.")
+                continue
+            threshold = zone.get("hot_threshold", hot_threshold)
+            self.names.append(name)
+            indices.append(idx)
+            hot_raw.append(min(65535, max(0, celsius_to_raw(threshold))) if threshold is not None else 65535)
+
+        if not indices:
+            raise ValueError("No valid ROI zones configured.")
+
+        self.counts = np.array([idx.size for idx in indices], dtype=np.int64)
+        self._index = np.concatenate(indices).astype(np.intp)
+        self._labels = np.repeat(np.arange(len(indices)), self.counts)
+        self._starts = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        self._ends = self._starts + self.counts
+        self._hot_raw = np.array(hot_raw, dtype=np.uint32)
+        self._hot_per_pixel = self._hot_raw[self._labels]
+        # Sorting value | (label << 16) orders every zone's values inside its own segment
+        self._label_key = self._labels.astype(np.uint32) << np.uint32(16)
+        self._hot_key = (np.arange(len(indices), dtype=np.uint32) << np.uint32(16)) | self._hot_raw
+        logging.info(f"[ROI] {len(self.names)} zones over {self._index.size} pixels.")
+
+    def compute_raw(self, thermal):
+        """
+        Returns a dict of per-zone arrays (aligned with self.names) in raw uint16 units,
+        except "hot_pixels" (count) and "mean" (float).
+        """
+        if thermal.shape[:2] != self.shape:
+            raise ValueError(f"Thermal frame {thermal.shape[:2]} does not match ROI shape {self.shape}.")
+        values = thermal.ravel()[self._index]
+        stats = {
+            "mean": np.bincount(self._labels, weights=values, minlength=len(self.names)) / self.counts,
+        }
+
+        if self.percentile is None:
+            stats["min"] = np.minimum.reduceat(values, self._starts)
+            stats["max"] = np.maximum.reduceat(values, self._starts)
+            stats["hot_pixels"] = np.bincount(
+                self._labels, weights=values > self._hot_per_pixel, minlength=len(self.names)
+            ).astype(np.int64)
+            return stats
+
+        keyed = self._label_key | values
+        keyed.sort()
+        ordered = keyed & np.uint32(0xFFFF)
+        stats["min"] = ordered[self._starts]
+        stats["max"] = ordered[self._ends - 1]
+        position = (self.counts - 1) * (self.percentile / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, self.counts - 1)
+        fraction = position - lower
+        stats["percentile"] = (ordered[self._starts + lower] * (1 - fraction)
+                               + ordered[self._starts + upper] * fraction)
+        stats["hot_pixels"] = self._ends - np.searchsorted(keyed, self._hot_key, side="right")
+        return stats
+
+    def compute(self, thermal):
+        """
+        Returns {zone name: {"min", "max", "mean", "percentile", "hot_pixels"}} with temperatures in °C.
+        """
+        raw = self.compute_raw(thermal)
+        result = {}
+        for i, name in enumerate(self.names):
+            zone_stats = {key: raw_to_celsius(float(values[i])) for key, values in raw.items() if key != "hot_pixels"}
+            zone_stats["hot_pixels"] = int(raw["hot_pixels"][i])
+            result[name] = zone_stats
+        return result
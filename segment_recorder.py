@@ -0,0 +1,312 @@
+import datetime
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from mjpeg_writer import MjpegAviWriter, encode_jpeg, read_mjpeg_frames
+
+
+class SegmentRecorder:
+    """
+    Continuous (DVR) recording into fixed-length MJPG AVI segments with an SQLite time index.
+
+    Every segment row holds its start/end capture time, frame count, maximum temperature,
+    file size and the capture time of each frame, so any time range can be cut out by copying
+    the JPEG payloads of the overlapping segments into a new file, without re-encoding.
+    The oldest segments are deleted once the segments exceed `quota_bytes` (ring retention).
+    Frames are encoded in a background thread; push() never blocks the capture loop.
+    Segments left open by a crash or power loss are indexed on the next start (see recover()).
+    """
+
+    def __init__(self, directory, segment_duration=60, quota_bytes=None, fps=32, capacity=64, quality=90,
+                 on_timing=None):
+        """
+        directory: folder for the segment files and the index (segments.db).
+        segment_duration: seconds of capture time per segment.
+        quota_bytes: disk quota for all segments (None = unlimited).
+        capacity: frames queued for encoding before new frames are dropped.
+        on_timing: callback(seconds) with the encode and write time of every frame.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_duration = segment_duration
+        self.quota_bytes = quota_bytes
+        self.fps = fps
+        self.capacity = max(1, capacity)
+        self.quality = quality
+        self.on_timing = on_timing
+        self.frames = 0
+        self.dropped = 0
+        self.segments_written = 0
+        self.segments_deleted = 0
+        self._lock = threading.RLock()   # Index connection
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._running = False
+        self._thread = None
+        self._writer = None
+        self._segment_start = None
+        self._frame_times = []
+        self._max_temp = None
+
+        self.conn = sqlite3.connect(str(self.directory / "segments.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL,
+                start_time REAL NOT NULL,
+                end_time REAL NOT NULL,
+                frames INTEGER NOT NULL,
+                max_temp REAL,
+                bytes INTEGER NOT NULL,
+                frame_times BLOB NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_segments_time ON segments(start_time, end_time)")
+        self.conn.commit()
+        self.recover()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="segment-recorder", daemon=True)
+        self._thread.start()
+        logging.info(f"[DVR] Continuous recording to {self.directory} ({self.segment_duration} s segments).")
+
+    def stop(self, timeout=5.0):
+        """
+        Encodes the queued frames and closes the current segment; the index stays open for queries.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self._close_segment()
+        logging.info("[DVR] Continuous recording stopped.")
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self.conn.close()
+
+    def push(self, frame, timestamp, temp=None):
+        """
+        Queues a BGR frame (or JPEG bytes) with its capture time and temperature. Returns False if dropped.
+        """
+        with self._cond:
+            if len(self._queue) >= self.capacity:
+                self.dropped += 1
+                return False
+            if isinstance(frame, np.ndarray) and not frame.flags.writeable:
+                frame = frame.copy()  # Pooled cameras hand out read-only views into reused buffers
+            self._queue.append((frame, timestamp, temp))
+            self._cond.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and self._running:
+                    self._cond.wait()
+                if not self._queue:
+                    break
+                frame, timestamp, temp = self._queue.popleft()
+            try:
+                start = time.perf_counter()
+                self._write(frame, timestamp, temp)
+                if self.on_timing:
+                    self.on_timing(time.perf_counter() - start)
+            except Exception as e:
+                logging.error(f"[DVR] Segment write failed: {e}")
+
+    def _write(self, frame, timestamp, temp):
+        if self._writer is not None and timestamp >= self._segment_start + self.segment_duration:
+            self._close_segment()
+        if self._writer is None:
+            self._segment_start = timestamp
+            stamp = datetime.datetime.fromtimestamp(timestamp).strftime("%Y%m%d_%H%M%S_%f")[:-3]
+            self._writer = MjpegAviWriter(self.directory / f"segment_{stamp}.avi", fps=self.fps)
+        self._writer.write(frame if isinstance(frame, bytes) else encode_jpeg(frame, self.quality))
+        self._frame_times.append(timestamp)
+        if temp is not None:
+            self._max_temp = temp if self._max_temp is None else max(self._max_temp, temp)
+        self.frames += 1
+
+    def _close_segment(self):
+        writer, times = self._writer, self._frame_times
+        if writer is None:
+            return
+        self._writer, self._frame_times = None, []
+        fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else self.fps
+        writer.close(fps=fps)
+        path = Path(writer.filename)
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO segments (path, start_time, end_time, frames, max_temp, bytes, frame_times) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path.name, times[0], times[-1], len(times), self._max_temp, path.stat().st_size,
+                 np.asarray(times, dtype=np.float64).tobytes())
+            )
+            self.conn.commit()
+        self._max_temp = None
+        self.segments_written += 1
+        logging.debug(f"[DVR] Segment {path.name} closed ({len(times)} frames).")
+        self.enforce_quota()
+
+    def recover(self):
+        """
+        Indexes segment files that are on disk but not in the index (the segment being written when
+        the process died), so they count against the quota and can be extracted; unreadable or empty
+        ones are deleted. Frame times are spread at `fps` from the start time in the file name.
+        Returns the number of segments indexed.
+        """
+        with self._lock:
+            known = {row[0] for row in self.conn.execute("SELECT path FROM segments")}
+        recovered = 0
+        for path in sorted(self.directory.glob("segment_*.avi")):
+            if path.name in known or (self._writer is not None and Path(self._writer.filename) == path):
+                continue
+            try:
+                frames = sum(1 for _ in read_mjpeg_frames(path))
+            except (OSError, ValueError):
+                frames = 0
+            if not frames:
+                path.unlink(missing_ok=True)
+                logging.info(f"[DVR] Deleted empty segment {path.name}.")
+                continue
+            try:
+                start = datetime.datetime.strptime(path.stem[len("segment_"):], "%Y%m%d_%H%M%S_%f").timestamp()
+            except ValueError:
+                start = path.stat().st_mtime - frames / self.fps
+            times = start + np.arange(frames, dtype=np.float64) / self.fps
+            with self._lock:
+                self.conn.execute(
+                    "INSERT INTO segments (path, start_time, end_time, frames, max_temp, bytes, frame_times) "
+                    "VALUES (?, ?, ?, ?, NULL, ?, ?)",
+                    (path.name, times[0], times[-1], frames, path.stat().st_size, times.tobytes())
+                )
+                self.conn.commit()
+            recovered += 1
+            logging.warning(f"[DVR] Recovered unclosed segment {path.name} ({frames} frames).")
+        if recovered:
+            self.enforce_quota()
+        return recovered
+
+    def used_bytes(self):
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM segments").fetchone()[0]
+
+    def enforce_quota(self):
+        """
+        Deletes the oldest segments until the indexed segments fit into the quota.
+        """
+        if not self.quota_bytes:
+            return 0
+        deleted = 0
+        with self._lock:
+            used = self.used_bytes()
+            rows = self.conn.execute("SELECT id, path, bytes FROM segments ORDER BY start_time ASC").fetchall()
+            for segment_id, name, size in rows[:-1]:  # Never delete the newest segment
+                if used <= self.quota_bytes:
+                    break
+                (self.directory / name).unlink(missing_ok=True)
+                self.conn.execute("DELETE FROM segments WHERE id = ?", (segment_id,))
+                used -= size
+                deleted += 1
+            self.conn.commit()
+        if deleted:
+            self.segments_deleted += deleted
+            logging.info(f"[DVR] Quota: deleted {deleted} oldest segments.")
+        return deleted
+
+    def query(self, start_time, end_time):
+        """
+        Returns the indexed segments overlapping [start_time, end_time], oldest first.
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path, start_time, end_time, frames, max_temp, bytes FROM segments "
+                "WHERE end_time >= ? AND start_time <= ? ORDER BY start_time ASC",
+                (start_time, end_time)
+            ).fetchall()
+        return [{"path": str(self.directory / row[0]), "start_time": row[1], "end_time": row[2],
+                 "frames": row[3], "max_temp": row[4], "bytes": row[5]} for row in rows]
+
+    def extract(self, start_time, end_time, filename):
+        """
+        Writes the frames captured in [start_time, end_time] to `filename` by concatenating the
+        JPEG payloads of the overlapping segments. Returns the number of frames written.
+        The segment being recorded is indexed, and so extractable, once it is closed.
+        """
+        with self._lock:
+            return _extract(self.conn, self.directory, start_time, end_time, filename, self.fps)
+
+    def get_status(self):
+        with self._cond:
+            queue_depth = len(self._queue)
+        with self._lock:
+            count, oldest, newest = self.conn.execute(
+                "SELECT COUNT(*), MIN(start_time), MAX(end_time) FROM segments").fetchone()
+        return {
+            "directory": str(self.directory),
+            "segment_duration": self.segment_duration,
+            "segments": count,
+            "oldest": oldest,
+            "newest": newest,
+            "used_bytes": self.used_bytes(),
+            "quota_bytes": self.quota_bytes,
+            "frames": self.frames,
+            "queue_depth": queue_depth,
+            "dropped_frames": self.dropped,
+            "segments_deleted": self.segments_deleted,
+        }
+
+
+def _extract(conn, directory, start_time, end_time, filename, fps):
+    rows = conn.execute(
+        "SELECT path, frame_times FROM segments WHERE end_time >= ? AND start_time <= ? "
+        "ORDER BY start_time ASC",
+        (start_time, end_time)
+    ).fetchall()
+    timestamps = []
+    writer = MjpegAviWriter(filename, fps=fps, sync_interval=0)
+    try:
+        for name, frame_times in rows:
+            times = np.frombuffer(frame_times, dtype=np.float64)
+            for data, timestamp in zip(read_mjpeg_frames(Path(directory) / name), times):
+                if start_time <= timestamp <= end_time:
+                    writer.write_jpeg(data)
+                    timestamps.append(timestamp)
+    finally:
+        rate = (len(timestamps) - 1) / (timestamps[-1] - timestamps[0]) \
+            if len(timestamps) > 1 and timestamps[-1] > timestamps[0] else None
+        writer.close(fps=rate)
+    if not timestamps:
+        Path(filename).unlink(missing_ok=True)
+    logging.info(f"[DVR] Extracted {len(timestamps)} frames to {filename}.")
+    return len(timestamps)
+
+
+def extract_segments(directory, start_time, end_time, filename, fps=32):
+    """
+    SegmentRecorder.extract() for a segment directory without a running recorder:
+    opens the index read-only, so it neither creates nor changes anything.
+    Returns the number of frames written (0 if there is no index).
+    """
+    index = Path(directory) / "segments.db"
+    if not index.exists():
+        return 0
+    conn = sqlite3.connect(f"{index.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        return _extract(conn, directory, start_time, end_time, filename, fps)
+    finally:
+        conn.close()
@@ -0,0 +1,110 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+import time
+import pytest
+
+from actuator import ActuatorExecutor, Output
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def executors():
+    created = []
+
+    def create(outputs, **kwargs):
+        executor = ActuatorExecutor(outputs, **kwargs)
+        executor.start()
+        created.append(executor)
+        return executor
+
+    yield create
+    for executor in created:
+        executor.stop(release=False)
+
+
+def test_fire_does_not_wait_for_slow_outputs(executors):
+    gate = threading.Event()
+    fast_done = threading.Event()
+    slow = Output("HUPE", lambda: gate.wait(5))
+    fast = Output("BLITZ", lambda: fast_done.set() or True)
+    executor = executors([slow, fast])
+    start = time.monotonic()
+    assert executor.fire() == ["HUPE", "BLITZ"]
+    assert time.monotonic() - start < 0.05
+    assert fast_done.wait(2)   # Runs while HUPE still blocks
+    assert slow.state == "activating"
+    gate.set()
+    assert wait_for(lambda: slow.state == "idle")
+    assert slow.successes == 1 and slow.last_latency is not None
+
+
+def test_failed_output_is_retried_with_backoff(executors):
+    calls = []
+
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise OSError("GPIO busy")
+        return True
+
+    output = Output("RELAIS", flaky, lambda: True)
+    executors([output], retries=3, backoff=0.05, deadline=2).fire()
+    assert wait_for(lambda: output.state == "active")
+    assert output.failures == 2 and output.successes == 1
+    assert output.last_error == "GPIO busy"
+    assert calls[1] - calls[0] >= 0.05 and calls[2] - calls[1] >= 0.1
+
+
+def test_output_given_up_after_deadline(executors):
+    errors = []
+    output = Output("BLITZ", lambda: False)
+    executors([output], retries=10, backoff=0.1, deadline=0.25, on_error=errors.append).fire()
+    assert wait_for(lambda: errors)
+    # Attempts at 0, 0.1 and 0.3 s would exceed the deadline, so only two are made
+    assert output.attempts == 2
+    assert output.state == "idle"
+    assert "BLITZ activate failed after 2 attempts" in errors[0]
+
+
+def test_latched_output_released_at_deadline_and_extended_by_fire(executors):
+    states = []
+    output = Output("RELAIS", lambda: states.append(True) or True, lambda: states.append(False) or True, hold=0.3)
+    executor = executors([output])
+    executor.fire()
+    assert wait_for(lambda: output.state == "active")
+    time.sleep(0.2)
+    assert executor.fire() == []   # Already on: only the latch is extended
+    time.sleep(0.2)
+    assert output.state == "active"
+    assert wait_for(lambda: output.state == "idle")
+    assert states == [True, False]
+
+
+def test_release_switches_latched_output_off(executors):
+    states = []
+    output = Output("RELAIS", lambda: states.append(True) or True, lambda: states.append(False) or True)
+    executor = executors([output])
+    executor.fire()
+    assert wait_for(lambda: output.state == "active")
+    executor.release()
+    assert wait_for(lambda: output.state == "idle")
+    assert states == [True, False]
+    assert executor.get_status()["RELAIS"]["successes"] == 2
+
+
+def test_actuation_reported_with_fire_context(executors):
+    actuated = []
+    output = Output("HUPE", lambda: True)
+    executor = executors([output], on_actuated=lambda name, context, when: actuated.append((name, context)))
+    executor.fire(context=7)
+    assert wait_for(lambda: actuated)
+    assert actuated == [("HUPE", 7)]
@@ -0,0 +1,185 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+import pytest
+import numpy as np
+from unittest.mock import MagicMock
+
+import capture_engine
+from capture_engine import FrameRingBuffer, CaptureEngine
+
+
+@pytest.fixture
+def mock_frame():
+    return np.zeros((120, 160, 3), dtype=np.uint8)
+
+
+def test_ring_buffer_latest_and_sequence(mock_frame):
+    ring = FrameRingBuffer(capacity=4)
+    assert ring.latest() is None
+    for i in range(6):
+        ring.publish(mock_frame, 20.0 + i)
+    latest = ring.latest()
+    assert latest.seq == 6
+    assert latest.temp == 25.0
+    # Older frames beyond capacity are overwritten
+    assert ring.get(1) is None
+    assert ring.get(3).temp == 22.0
+
+
+def test_ring_buffer_wait_for_next_timeout(mock_frame):
+    ring = FrameRingBuffer(capacity=4)
+    ring.publish(mock_frame, 30.0)
+    assert ring.wait_for_next(1, timeout=0.05) is None
+    item = ring.wait_for_next(0, timeout=0.05)
+    assert item.seq == 1
+
+
+def test_ring_buffer_wakes_waiting_reader(mock_frame):
+    ring = FrameRingBuffer(capacity=4)
+    result = {}
+
+    def reader():
+        result["item"] = ring.wait_for_next(0, timeout=2.0)
+
+    t = threading.Thread(target=reader)
+    t.start()
+    ring.publish(mock_frame, 42.0)
+    t.join(timeout=2.0)
+    assert result["item"].temp == 42.0
+
+
+def test_ring_buffer_slow_reader_skips_to_oldest(mock_frame):
+    ring = FrameRingBuffer(capacity=4)
+    for i in range(10):
+        ring.publish(mock_frame, float(i))
+    assert ring.wait_for_next(1, timeout=0).seq == 7
+
+
+def test_capture_engine_delivers_consecutive_frames(mock_frame):
+    cam = MagicMock()
+    cam.buffer_slots = 0
+    temps = iter(range(1000))
+    cam.get_frame.side_effect = lambda: (mock_frame, float(next(temps)))
+    engine = CaptureEngine(cam, fps=200, buffer_size=64)
+    engine.start()
+    try:
+        _, first = engine.get_frame(timeout=1.0)
+        _, second = engine.get_frame(timeout=1.0)
+        assert second == first + 1
+        assert engine.get_status()["running"] is True
+    finally:
+        engine.stop()
+    assert engine.frames_captured >= 2
+
+
+def test_capture_engine_counts_errors():
+    cam = MagicMock()
+    cam.buffer_slots = 0
+    cam.get_frame.return_value = (None, None)
+    engine = CaptureEngine(cam, fps=100)
+    engine.start()
+    try:
+        assert engine.get_frame(timeout=0.2) == (None, None)
+    finally:
+        engine.stop()
+    assert engine.capture_errors >= 1
+
+
+def test_capture_engine_ring_never_exceeds_camera_pool():
+    cam = MagicMock()
+    cam.buffer_slots = 8
+    engine = CaptureEngine(cam, buffer_size=64)
+    assert engine.buffer.capacity == 7
+
+
+def test_hardware_counter_gaps_are_counted_as_drops():
+    engine = CaptureEngine(MagicMock(buffer_slots=0))
+    for counter in (10, 11, 12, 15, 16):
+        assert engine._track_counter(counter) is True
+    assert engine.dropped_frames == 2
+    assert engine._track_counter(16) is False
+    assert engine.duplicate_frames == 1
+
+
+def test_hardware_counter_scaled_framerate_and_wraparound():
+    engine = CaptureEngine(MagicMock(buffer_slots=0))
+    # Counter advances by 3 per delivered frame and wraps at 2**32
+    for counter in (0xFFFFFFF9, 0xFFFFFFFC, 0xFFFFFFFF, 2, 11):
+        engine._track_counter(counter)
+    assert engine.dropped_frames == 2
+
+
+def test_capture_engine_uses_camera_capture_time(mock_frame):
+    cam = MagicMock()
+    cam.buffer_slots = 0
+    cam.last_thermal = None
+    counters = iter(range(1, 1000))
+
+    def get_frame():
+        n = next(counters)
+        cam.last_info = {"counter": n, "counter_hw": n, "flag_state": 0,
+                         "capture_time": 5000.0 + n / 32, "capture_monotonic": 100.0 + n / 32}
+        return mock_frame, 30.0
+
+    cam.get_frame.side_effect = get_frame
+    engine = CaptureEngine(cam, fps=200)
+    engine.start()
+    try:
+        item = engine.next_frame(timeout=1.0)
+        while engine.buffer.seq < 5:
+            engine.next_frame(timeout=1.0)
+    finally:
+        engine.stop()
+    assert item.timestamp == 5000.0 + item.info["counter"] / 32
+    assert engine.measured_fps() == pytest.approx(32.0)
+
+
+def test_flag_cycle_frames_are_tagged_invalid():
+    engine = CaptureEngine(MagicMock(buffer_slots=0), flag_settle_frames=2)
+    states = [0, 0, 3, 1, 1, 2, 0, 0, 0, 0]
+    valid = [engine._track_flag(state) for state in states]
+    # Closing/closed/opening frames plus two settle frames after the flag reopened
+    assert valid == [True, True, False, False, False, False, False, False, True, True]
+    assert engine.flag_cycles == 1
+    assert engine.flag_frames == 6
+    assert engine.get_status()["flag_active"] is False
+
+
+def test_flag_error_and_stuck_flag_are_faults(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(capture_engine.time, "monotonic", lambda: now[0])
+    faults = []
+    engine = CaptureEngine(MagicMock(buffer_slots=0), flag_settle_frames=0, flag_timeout=5, on_fault=faults.append)
+    # Initializing and error are no flag cycle: alarms keep working, the error is reported once
+    assert [engine._track_flag(state) for state in (5, 4, 4, 0)] == [True] * 4
+    assert engine.flag_cycles == 0 and len(faults) == 1
+    assert engine.get_status()["flag_fault"] is None
+    assert not engine._track_flag(1)
+    now[0] += 6
+    assert not engine._track_flag(1)
+    assert len(faults) == 2 and "not finished after 5 s" in faults[1]
+    assert engine.get_status()["flag_fault"] == faults[1]
+    assert engine._track_flag(0)
+    assert engine.flag_faults == 2 and engine.flag_fault is None
+
+
+def test_thermal_only_camera_renders_lazily():
+    cam = MagicMock()
+    cam.buffer_slots = 0
+    cam.thermal_only = True
+    cam.last_info = None
+    cam.get_thermal.return_value = (np.full((120, 160), 1250, dtype=np.uint16), 25.0)
+    cam.palette.render.side_effect = lambda thermal: np.zeros(thermal.shape + (3,), dtype=np.uint8)
+    engine = CaptureEngine(cam, fps=200)
+    engine.start()
+    try:
+        item = engine.next_frame(timeout=1.0)
+    finally:
+        engine.stop()
+    assert cam.get_frame.call_count == 0
+    assert not item.has_image
+    assert item.frame.shape == (120, 160, 3)
+    assert item.has_image
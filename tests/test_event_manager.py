@@ -0,0 +1,169 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import time
+import cv2
+import numpy as np
+import pytest
+
+from event_manager import EventManager
+from pre_event_buffer import PreEventBuffer
+
+
+def make_frame(value):
+    return np.full((60, 80, 3), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    buffer = PreEventBuffer(duration=2, fps=10)
+    manager = EventManager(buffer, tmp_path, pre_duration=1, post_duration=1, max_clip_duration=3, fps=10)
+    manager.start()
+    yield manager
+    manager.stop()
+
+
+def feed(manager, start, count, fps=10):
+    """
+    Pushes frames with synthetic capture times, like the main loop does.
+    """
+    for i in range(count):
+        timestamp = start + i / fps
+        manager.pre_buffer.push(make_frame(i % 256), timestamp)
+        manager.push(make_frame(i % 256), timestamp)
+    return start + count / fps
+
+
+def wait_opened(manager, timeout=3.0):
+    """
+    Waits until the manager thread took the pre-event snapshots; feed() is faster than real time.
+    """
+    deadline = time.time() + timeout
+    while not all(clip.ready for clip in manager._clips) and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def frame_count(filename):
+    cap = cv2.VideoCapture(str(filename))
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return count
+
+
+def test_single_event_has_pre_and_post_frames(manager, tmp_path):
+    t = feed(manager, 1000.0, 20)
+    trigger = t - 0.1
+    filename = manager.trigger(60.0, trigger)
+    assert manager.active
+    wait_opened(manager)
+    feed(manager, t, 15)   # Past the post-event window, which finishes the clip
+    manager.stop()
+    assert not manager.active
+    # 1 s before the trigger (10 frames incl. the trigger frame) and 1 s after it
+    assert frame_count(filename) == 20
+    sidecar = json.loads(filename.with_suffix(".json").read_text())
+    assert sidecar["events"][0]["trigger_time"] == trigger
+    assert sidecar["fps"] == pytest.approx(10.0)
+
+
+def test_overlapping_events_merge_into_one_clip(manager, tmp_path):
+    t = feed(manager, 2000.0, 10)
+    first = manager.trigger(60.0, t - 0.1)
+    t = feed(manager, t, 5)
+    second = manager.trigger(65.0, t - 0.1, source="zone2")
+    feed(manager, t, 20)
+    manager.stop()
+    assert first == second
+    assert manager.merged == 1 and manager.completed == 1
+    events = json.loads(first.with_suffix(".json").read_text())["events"]
+    assert [e["temperature"] for e in events] == [60.0, 65.0]
+    assert events[1]["source"] == "zone2"
+
+
+def test_events_beyond_max_clip_length_start_concurrent_clip(manager, tmp_path):
+    t = feed(manager, 3000.0, 10)
+    first = manager.trigger(60.0, t - 0.1)
+    wait_opened(manager)
+    t = feed(manager, t, 9)
+    assert manager.trigger(61.0, t - 0.1) == first   # Clip spans 1.9 s
+    t = feed(manager, t, 9)
+    assert manager.trigger(62.0, t - 0.1) == first   # 2.8 s
+    t = feed(manager, t, 9)
+    second = manager.trigger(63.0, t - 0.1)          # 3.7 s would exceed max_clip_duration
+    assert second != first
+    wait_opened(manager)
+    assert len(manager.get_status()["active_clips"]) == 2
+    feed(manager, t, 20)
+    manager.stop()
+    assert manager.completed == 2
+    # The new clip has its own pre-event frames, overlapping the end of the first one
+    assert frame_count(second) == 20
+    assert frame_count(first) > 30
+
+
+def test_clip_finishes_when_frames_stop(tmp_path):
+    manager = EventManager(None, tmp_path, post_duration=60, fps=10, idle_timeout=0.2)
+    manager.start()
+    filename = manager.trigger(60.0, 100.0)
+    feed_only = [manager.push(make_frame(i), 100.0 + i / 10) for i in range(1, 6)]
+    assert all(feed_only)
+    deadline = time.time() + 5
+    while manager.active and time.time() < deadline:
+        time.sleep(0.05)
+    assert not manager.active
+    assert frame_count(filename) == 5
+    manager.stop()
+
+
+class RawFrameWriter:
+    wants_jpeg = False
+
+    def __init__(self, filename, fps):
+        self.filename = str(filename)
+        self.frames = 0
+        self.received = []
+
+    def write(self, frame):
+        self.received.append(frame)
+        self.frames += 1
+
+    def close(self, fps=None):
+        pass
+
+
+def test_raw_frame_writers_get_frames_unencoded(tmp_path):
+    writers = []
+
+    def factory(filename, fps):
+        writers.append(RawFrameWriter(filename, fps))
+        return writers[-1]
+
+    manager = EventManager(None, tmp_path, post_duration=1, fps=10, writer_factory=factory)
+    manager.start()
+    manager.trigger(60.0, 100.0)
+    for i in range(1, 15):
+        manager.push(make_frame(i), 100.0 + i / 10)
+    manager.stop()
+    assert writers[0].frames == 10
+    assert all(isinstance(f, np.ndarray) for f in writers[0].received)
+
+
+def test_clip_opened_off_the_triggering_thread(tmp_path):
+    import threading
+    opened_by, errors = [], []
+
+    def failing_factory(filename, fps):
+        opened_by.append(threading.current_thread().name)
+        raise OSError("ffmpeg not found")
+
+    manager = EventManager(PreEventBuffer(duration=1, fps=10), tmp_path, post_duration=1, fps=10,
+                           writer_factory=failing_factory, on_error=errors.append)
+    manager.start()
+    manager.pre_buffer.push(make_frame(1), 99.9)
+    assert manager.trigger(60.0, 100.0) is not None
+    manager.stop()
+    assert opened_by == ["event-manager"]
+    assert errors == ["Error opening anomaly clip: ffmpeg not found"]
+    assert not manager.active
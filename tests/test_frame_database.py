@@ -0,0 +1,175 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sqlite3
+import time
+import pytest
+import numpy as np
+
+from frame_database import FrameDatabase, CommitError
+
+
+@pytest.fixture
+def mock_frame():
+    return np.zeros((120, 160, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = FrameDatabase(str(tmp_path / "frames.db"))
+    yield database
+    database.close()
+
+
+def test_insert_and_get_recent_frames(db, mock_frame):
+    db.insert_frame(mock_frame)
+    frames = db.get_frames_from_last_n_seconds(seconds=5)
+    assert len(frames) == 1
+    assert frames[0].shape == (120, 160, 3)
+
+
+def test_thermal_frames_roundtrip(db, mock_frame):
+    thermal = np.full((120, 160), 1250, dtype=np.uint16)
+    thermal[10, 20] = 1600
+    start = time.time() - 1
+    db.insert_frame(mock_frame, thermal=thermal)
+    db.insert_frame(mock_frame)  # Palette-only frames are not returned
+
+    timestamps, temps = db.get_thermal_frames(start)
+    assert len(timestamps) == 1
+    assert temps.shape == (1, 120, 160)
+    assert temps[0, 10, 20] == pytest.approx(60.0)
+    assert temps[0, 0, 0] == pytest.approx(25.0)
+
+    _, raw = db.get_thermal_frames(start, raw=True)
+    assert np.array_equal(raw[0], thermal)
+
+
+def test_thermal_frames_empty_range(db):
+    timestamps, temps = db.get_thermal_frames(0, 1)
+    assert len(timestamps) == 0
+    assert temps.shape[0] == 0
+
+
+def test_migrates_legacy_schema(tmp_path, mock_frame):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE frames (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp REAL, image BLOB)")
+    conn.commit()
+    conn.close()
+
+    database = FrameDatabase(path)
+    database.insert_frame(mock_frame, thermal=np.zeros((120, 160), dtype=np.uint16))
+    _, raw = database.get_thermal_frames(0, raw=True)
+    database.close()
+    assert raw.shape == (1, 120, 160)
+
+
+def test_thermal_only_frames_are_rendered_on_read(db):
+    thermal = np.full((120, 160), 1250, dtype=np.uint16)
+    db.insert_frame(None, thermal=thermal)
+    frames = db.get_frames_from_last_n_seconds(seconds=5)
+    assert len(frames) == 1
+    assert frames[0].shape == (120, 160, 3)
+
+
+def test_jpeg_frames_are_returned_without_decoding(db, mock_frame):
+    db.insert_frame(mock_frame)
+    db.insert_frame(None, thermal=np.full((120, 160), 1250, dtype=np.uint16))
+    frames = db.get_jpeg_frames_from_last_n_seconds(seconds=5)
+    assert len(frames) == 2
+    assert all(isinstance(f, bytes) and f[:2] == b"\xff\xd8" for f in frames)
+
+
+def count_committed(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_batched_commits_and_bounded_flush_latency(tmp_path, mock_frame):
+    path = str(tmp_path / "batched.db")
+    database = FrameDatabase(path, batch_size=4, batch_interval=0.1)
+    try:
+        assert database.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        for _ in range(5):
+            database.insert_frame(mock_frame)
+        # One full batch committed, the fifth frame waits for the flush interval
+        assert database.commits == 1
+        assert count_committed(path) == 4
+        time.sleep(0.4)
+        assert count_committed(path) == 5
+        stats = database.get_write_stats()
+        assert stats["frames_written"] == 5
+        assert stats["commits"] == 2
+        assert stats["pending"] == 0
+        assert stats["max_flush_latency_ms"] < 400
+    finally:
+        database.close()
+    assert count_committed(path) == 5
+
+
+def test_failed_flush_is_raised_to_the_next_insert(tmp_path, mock_frame):
+    database = FrameDatabase(str(tmp_path / "lost.db"), batch_size=10, batch_interval=60)
+    try:
+        database.insert_frame(mock_frame)
+        database.insert_frame(mock_frame)
+        real_conn = database.conn
+
+        class FailingCommit:
+            def commit(self):
+                raise sqlite3.OperationalError("disk I/O error")
+
+            def __getattr__(self, name):
+                return getattr(real_conn, name)
+
+        database.conn = FailingCommit()
+        database.flush()   # What the flush thread does after batch_interval
+        database.conn = real_conn
+        stats = database.get_write_stats()
+        assert stats["frames_lost"] == 2 and stats["frames_written"] == 0 and stats["pending"] == 0
+        with pytest.raises(CommitError) as error:
+            database.insert_frame(mock_frame)
+        assert error.value.lost == 2
+        database.insert_frame(mock_frame)   # The failure is reported once
+        database.flush()
+        assert count_committed(str(tmp_path / "lost.db")) == 1
+    finally:
+        database.close()
+
+
+def test_retention_prunes_old_frames_in_batches(tmp_path, mock_frame):
+    database = FrameDatabase(str(tmp_path / "retention.db"), max_age=60, prune_interval=3600, prune_batch=7)
+    try:
+        now = time.time()
+        thermal = np.random.randint(1000, 1500, (120, 160)).astype(np.uint16)
+        for i in range(40):
+            database.insert_frame(mock_frame, thermal=thermal, timestamp=now - 100 + i)
+        for i in range(10):
+            database.insert_frame(mock_frame, thermal=thermal, timestamp=now - 10 + i)
+        assert database.prune(now=now) == 40
+        assert database.conn.execute("SELECT COUNT(*) FROM frames").fetchone()[0] == 10
+        assert database.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert database.conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        assert database.get_write_stats()["rows_pruned"] == 40
+    finally:
+        database.close()
+
+
+def test_retention_enforces_size_limit(tmp_path, mock_frame):
+    database = FrameDatabase(str(tmp_path / "size.db"), max_size_bytes=400 * 1024, prune_interval=3600,
+                             prune_batch=5)
+    try:
+        thermal = np.random.randint(1000, 3000, (120, 160)).astype(np.uint16)
+        for i in range(40):
+            database.insert_frame(mock_frame, thermal=thermal, timestamp=1000.0 + i)
+        assert database.used_bytes() > 400 * 1024
+        assert database.prune() > 0
+        assert database.used_bytes() <= 400 * 1024
+        newest = database.conn.execute("SELECT MAX(timestamp) FROM frames").fetchone()[0]
+        assert newest == 1039.0
+    finally:
+        database.close()
@@ -0,0 +1,90 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import csv
+import math
+import pytest
+
+from frame_log import FrameLog, convert_to_csv, read_frame_log
+from mocks.replay_camera import load_temperature_log
+
+ZONES = {"left": {"max": 41.5, "mean": 30.25, "hot_pixels": 12, "min": 20.0},
+         "right": {"max": 55.0, "mean": 35.5, "hot_pixels": 0, "min": 22.0}}
+INFO = {"counter": 7, "counter_hw": 107, "hw_timestamp": 123456789, "flag_state": 0}
+
+
+def test_binary_records_round_trip(tmp_path):
+    log = FrameLog(tmp_path / "frame_log.bin", flush_interval=60)
+    log.log(1000.0, "Normal", 36.6, False, True, info=INFO, zones=ZONES)
+    log.log(1000.03, "Fault", None, True, False)   # Camera error: no zone statistics
+    log.close()
+
+    zones, records = read_frame_log(tmp_path / "frame_log.bin")
+    assert zones == ["left", "right"] and len(records) == 2
+    assert log.rotations == 0
+    record = records[0]
+    assert record["timestamp"] == 1000.0 and record["counter_hw"] == 107
+    assert record["zone1_max"] == 55.0 and record["zone0_hot_pixels"] == 12
+    error = records[1]
+    assert math.isnan(error["temperature"]) and math.isnan(error["zone0_max"])
+    assert error["zone1_hot_pixels"] == 0
+
+
+def test_changed_zones_start_a_new_file(tmp_path):
+    log = FrameLog(tmp_path / "frame_log.bin", flush_interval=60)
+    log.log(1000.0, "Normal", 36.6, False, zones=ZONES)
+    for i in range(5):
+        log.log(1000.1 + i, "Fault", None, False)   # A flapping camera does not rotate
+    log.log(1001.0, "Normal", 36.6, False, zones={"left": ZONES["left"]})
+    log.close()
+    assert log.rotations == 1
+    assert read_frame_log(tmp_path / "frame_log.bin")[0] == ["left"]
+    zones, records = read_frame_log(next(tmp_path.glob("frame_log_*.bin")))
+    assert zones == ["left", "right"] and len(records) == 6
+
+
+def test_records_are_buffered_until_flush(tmp_path):
+    log = FrameLog(tmp_path / "frame_log.bin", flush_interval=60, buffer_records=4)
+    for i in range(3):
+        log.log(1000.0 + i, "Normal", 30.0, False)
+    assert len(read_frame_log(tmp_path / "frame_log.bin")[1]) == 0
+    log.log(1003.0, "Normal", 30.0, False)  # Buffer full
+    assert len(read_frame_log(tmp_path / "frame_log.bin")[1]) == 4
+    log.close()
+
+
+def test_size_rotation_keeps_backups(tmp_path):
+    log = FrameLog(tmp_path / "frame_log.bin", flush_interval=0, max_bytes=200, backup_count=2)
+    for i in range(40):
+        log.log(1000.0 + i, "Normal", 30.0, False)
+    log.close()
+    assert log.rotations > 2
+    assert len(list(tmp_path.glob("frame_log_*.bin"))) <= 2
+
+
+def test_csv_mode_and_converter_match(tmp_path):
+    csv_log = FrameLog(tmp_path / "frame_log.csv", binary=False)
+    bin_log = FrameLog(tmp_path / "frame_log.bin")
+    for log in (csv_log, bin_log):
+        log.log(1000.0, "Normal", 36.6, True, info=INFO, zones=ZONES)
+        log.log(1000.5, "Test", 37.0, False, info=INFO, zones=ZONES)
+        log.close()
+    converted = convert_to_csv(tmp_path / "frame_log.bin", tmp_path / "converted.csv")
+    with open(tmp_path / "frame_log.csv") as a, open(converted) as b:
+        rows = list(csv.reader(a))
+        assert rows == list(csv.reader(b))
+    assert rows[0][:4] == ["timestamp", "mode", "temperature", "recording"]
+    assert rows[1][1:4] == ["Normal", "36.60", "True"]
+    assert "zone_right_max" in rows[0]
+
+
+def test_replay_reads_binary_temperature_log(tmp_path):
+    log = FrameLog(tmp_path / "frame_log.bin")
+    log.log(1001.0, "Normal", 31.0, False)
+    log.log(1000.0, "Normal", 30.0, False)
+    log.log(1002.0, "Normal", None, False)
+    log.close()
+    timestamps, temps = load_temperature_log(tmp_path / "frame_log.bin")
+    assert timestamps == [1000.0, 1001.0]
+    assert temps == [pytest.approx(30.0), pytest.approx(31.0)]
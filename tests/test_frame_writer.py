@@ -0,0 +1,130 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sqlite3
+import threading
+import time
+import pytest
+import numpy as np
+from unittest.mock import MagicMock
+
+from frame_writer import FrameWriter
+
+
+class BlockingDB:
+    """Database whose inserts wait until released, to fill the writer queue."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.timestamps = []
+
+    def insert_frame(self, frame, thermal=None, timestamp=None):
+        self.release.wait(2.0)
+        self.timestamps.append(timestamp)
+
+
+@pytest.mark.parametrize("policy, expected", [
+    ("drop_oldest", [0.0, 3.0, 4.0, 5.0, 6.0]),
+    ("drop_newest", [0.0, 1.0, 2.0, 3.0, 4.0]),
+    ("decimate", [0.0, 2.0, 4.0, 5.0, 6.0]),
+])
+def test_overflow_policies(policy, expected):
+    db = BlockingDB()
+    writer = FrameWriter(db, capacity=4, policy=policy)
+    writer.start()
+    writer.submit(np.zeros((4, 4, 3), dtype=np.uint8), timestamp=0.0)
+    while writer.get_status()["queue_depth"]:
+        time.sleep(0.001)
+    assert writer.wait_until_idle(timeout=0.05) is False  # First frame is stuck in the database
+    fill_results = [writer.submit(None, thermal=np.zeros((2, 2), np.uint16), timestamp=float(i)) for i in range(1, 7)]
+    assert all(fill_results) == (policy != "drop_newest")
+    db.release.set()
+    writer.stop()
+    assert db.timestamps == expected
+    status = writer.get_status()
+    assert status["dropped"][policy] == 2
+    assert status["written"] == 5
+    assert status["max_depth"] == 4
+
+
+def test_read_only_frames_are_copied():
+    db = MagicMock()
+    writer = FrameWriter(db)
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    view = frame.view()
+    view.flags.writeable = False
+    writer.submit(view, timestamp=1.0)
+    frame[:] = 255  # The camera reuses its slot
+    writer.start()
+    writer.stop()
+    stored = db.insert_frame.call_args[0][0]
+    assert stored.max() == 0
+
+
+def test_failed_inserts_are_retried_then_reported():
+    db = MagicMock()
+    db.insert_frame.side_effect = OSError("disk full")
+    errors = []
+    writer = FrameWriter(db, retries=2, retry_delay=0, on_error=errors.append)
+    writer.start()
+    writer.submit(np.zeros((4, 4, 3), dtype=np.uint8))
+    writer.stop()
+    assert db.insert_frame.call_count == 2
+    assert writer.get_status()["failed"] == 1
+    assert len(errors) == 1
+
+
+def test_database_errors_reach_the_writer(tmp_path):
+    from frame_database import FrameDatabase
+    db = FrameDatabase(str(tmp_path / "frames.db"))
+    with db._lock:
+        db.conn.execute("DROP TABLE frames")
+    errors = []
+    writer = FrameWriter(db, retries=2, retry_delay=0, on_error=errors.append)
+    writer.start()
+    writer.submit(np.zeros((4, 4, 3), dtype=np.uint8), timestamp=1.0)
+    writer.stop()
+    db.close()
+    status = writer.get_status()
+    assert status["written"] == 0 and status["failed"] == 1
+    assert len(errors) == 1
+
+
+class FailingCommitConnection:
+    """
+    sqlite3 connection whose next commit fails, like a full disk or an I/O error would.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.fail = True
+
+    def commit(self):
+        if self.fail:
+            self.fail = False
+            raise sqlite3.OperationalError("disk I/O error")
+        self.conn.commit()
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def test_frames_lost_in_a_failed_batch_commit_are_reported(tmp_path):
+    from frame_database import FrameDatabase
+    path = str(tmp_path / "frames.db")
+    db = FrameDatabase(path, batch_size=3, batch_interval=60)
+    db.conn = FailingCommitConnection(db.conn)
+    errors = []
+    writer = FrameWriter(db, retries=2, retry_delay=0, on_error=errors.append)
+    writer.start()
+    for i in range(3):   # The third insert commits the batch, which fails and is rolled back
+        writer.submit(np.zeros((4, 4, 3), dtype=np.uint8), timestamp=float(i))
+    writer.stop()
+    db.flush()
+    assert db.get_write_stats()["frames_lost"] == 3
+    assert db.conn.execute("SELECT timestamp FROM frames").fetchall() == [(2.0,)]   # Retried
+    db.close()
+    status = writer.get_status()
+    assert status["written"] == 1 and status["failed"] == 2
+    assert errors == ["2 stored frames lost in a failed database commit."]
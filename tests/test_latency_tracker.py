@@ -0,0 +1,62 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import pytest
+
+from latency_tracker import LatencyHistogram, LatencyTracker
+
+
+def test_histogram_percentiles_over_window_keep_worst_case():
+    histogram = LatencyHistogram(window=100)
+    histogram.add(5.0)              # Worst case, pushed out of the window below
+    for i in range(1, 101):
+        histogram.add(i / 1000)
+    stats = histogram.to_dict()
+    assert stats["count"] == 101 and stats["window"] == 100
+    assert stats["p50_ms"] == pytest.approx(50.5)
+    assert stats["p99_ms"] == pytest.approx(99.01)
+    assert stats["window_max_ms"] == pytest.approx(100.0)
+    assert stats["max_ms"] == pytest.approx(5000.0)
+
+
+def test_alarm_trace_from_capture_to_outputs(tmp_path):
+    tracker = LatencyTracker()
+    tracker.frame(10.0, 10.004)
+    trace = tracker.alarm(10.0, 10.004, decision=10.005, outputs=["HUPE", "RELAIS"], source="zone1")
+    tracker.actuated(trace, "RELAIS", 10.020)
+    tracker.actuated(trace, "HUPE", 10.030)
+    tracker.actuated(trace, "HUPE", 10.500)   # Only the first actuation counts
+    status = tracker.get_status()
+    assert status["capture_to_detection"]["max_ms"] == pytest.approx(4.0)
+    assert status["capture_to_decision"]["max_ms"] == pytest.approx(5.0)
+    assert status["capture_to_alarm"]["max_ms"] == pytest.approx(20.0)
+    assert status["capture_to_hupe"]["count"] == 1
+
+    report = tracker.dump(tmp_path / "latency.json")
+    assert json.loads((tmp_path / "latency.json").read_text()) == report
+    assert report["traces"][0]["actuation_ms"] == {"RELAIS": pytest.approx(20.0), "HUPE": pytest.approx(30.0)}
+    assert report["traces"][0]["not_actuated"] == []
+
+
+def test_outputs_that_never_switch_are_reported():
+    tracker = LatencyTracker(traces=2)
+    first = tracker.alarm(1.0, 1.001, outputs=["BLITZ"])
+    for i in range(3):
+        tracker.alarm(2.0 + i, 2.001 + i, outputs=["BLITZ"])
+    tracker.actuated(first, "BLITZ", 1.5)     # Trace no longer open
+    report = tracker.dump()
+    assert len(report["traces"]) == 2
+    assert all(trace["not_actuated"] == ["BLITZ"] for trace in report["traces"])
+    assert "capture_to_alarm" not in report["histograms"]
+
+
+def test_outputs_already_active_do_not_keep_the_trace_open():
+    tracker = LatencyTracker()
+    trace = tracker.alarm(1.0, 1.001, outputs=["HUPE", "RELAIS"])
+    tracker.scheduled(trace, ["HUPE"])   # RELAIS is still latched from the previous alarm
+    tracker.actuated(trace, "HUPE", 1.02)
+    report = tracker.dump()["traces"][0]
+    assert report["not_actuated"] == [] and report["already_active"] == ["RELAIS"]
+    assert not tracker._open
@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import logging
+import queue
+import pytest
+
+import log_pipeline
+from log_pipeline import RateLimitFilter, DroppingQueueHandler, setup_logging, stop_logging, get_logging_status
+
+
+def make_record(msg, lineno=10):
+    return logging.LogRecord("test", logging.INFO, "frame_loop.py", lineno, msg, None, None)
+
+
+def test_rate_limit_per_call_site(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(log_pipeline.time, "monotonic", lambda: now[0])
+    limit = RateLimitFilter(interval=10, burst=3)
+    passed = [limit.filter(make_record(f"frame {i}")) for i in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    assert limit.filter(make_record("other call site", lineno=20))   # Own budget
+    now[0] += 10
+    record = make_record("frame 10")
+    assert limit.filter(record)
+    assert record.getMessage() == "frame 10 [7 similar messages suppressed]"
+    assert limit.suppressed == 7
+
+
+def test_errors_are_never_rate_limited():
+    limit = RateLimitFilter(interval=10, burst=1)
+    for level in (logging.ERROR, logging.CRITICAL):
+        for i in range(5):
+            record = logging.LogRecord("test", level, "main.py", 174, f"error {i}", None, None)
+            assert limit.filter(record)
+    assert limit.filter(make_record("warning", lineno=174))
+    assert not limit.filter(make_record("warning", lineno=174))
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(2))
+    for i in range(5):
+        handler.handle(make_record(f"message {i}"))
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+@pytest.fixture
+def pipeline_logger():
+    logger = logging.getLogger()
+    level = logger.level
+    yield logger
+    stop_logging()
+    logger.setLevel(level)
+
+
+def test_pipeline_writes_rotated_file_off_thread(tmp_path, pipeline_logger):
+    log_file = tmp_path / "system.log"
+    setup_logging(log_file, max_bytes=2000, backup_count=2, console_level=None, rate_limit_interval=0)
+    for i in range(200):
+        logging.info("Line %d of the pipeline test", i)
+    assert get_logging_status()["active"]
+    stop_logging()   # Writes everything still queued
+    assert not get_logging_status()["active"]
+    assert (tmp_path / "system.log.1").exists() and (tmp_path / "system.log.2").exists()
+    assert not (tmp_path / "system.log.3").exists()
+    assert "Line 199 of the pipeline test" in log_file.read_text()
+
+
+def test_pipeline_limits_repeated_messages(tmp_path, pipeline_logger):
+    log_file = tmp_path / "system.log"
+    setup_logging(log_file, console_level=None, rate_limit_interval=60, rate_limit_burst=2)
+    for i in range(50):
+        logging.info("Frame %d stored", i)
+    assert get_logging_status()["suppressed"] == 48
+    stop_logging()
+    assert log_file.read_text().count("stored") == 2
@@ -98,30 +98,35 @@ def test_screenshot(tmp_path, mock_frame):
 
 
 def test_save_frames_as_video(tmp_path, mock_frame):
-    filename = tmp_path / "test_video.avi"
-    main.save_frames_as_video([mock_frame] * 5, filename, fps=10)
+    filename = main.save_frames_as_video([mock_frame] * 5, tmp_path / "test_video.avi", fps=10)
     assert filename.exists()
+    assert filename.stem == "test_video"
 
 
 def test_record_video(mock_frame):
     mock_cam = MagicMock()
     mock_cam.get_frame.return_value = (mock_frame, 40.0)
-    with patch("cv2.VideoWriter") as mock_writer:
+    with patch.object(main, "create_video_writer") as mock_writer:
         instance = mock_writer.return_value
-        instance.isOpened.return_value = True
         main.record_video(mock_cam, main.SystemMode.NORMAL, duration=1)
         assert instance.write.called
+        assert instance.close.called
 
 
-def test_save_anomaly_video(tmp_path, mock_frame):
-    mock_cam = MagicMock()
-    mock_cam.get_frame.return_value = (mock_frame, 40.0)
-    with patch.object(main, "FrameDatabase") as mock_db:
-        mock_db.return_value.get_frames_from_last_n_seconds.return_value = [mock_frame]
-        main.save_dir = tmp_path
-        main.save_anomaly_video(mock_cam, "fake.db", 55.0, "timestamp", tmp_path, duration=1)
-        files = list(tmp_path.glob("merged_anomaly_*.avi"))
-        assert len(files) > 0
+def test_alarm_temperature():
+    stats = {
+        "left": {"min": 20.0, "max": 48.0, "mean": 30.0, "percentile": 40.0},
+        "right": {"min": 22.0, "max": 61.0, "mean": 35.0, "percentile": 55.0},
+    }
+    main.ALARM_ZONE, main.ALARM_STAT = None, "max"
+    assert main.alarm_temperature(30.0, stats) == 30.0
+    main.ALARM_ZONE = "left"
+    assert main.alarm_temperature(30.0, stats) == 48.0
+    main.ALARM_ZONE, main.ALARM_STAT = "*", "percentile"
+    assert main.alarm_temperature(30.0, stats) == 55.0
+    main.ALARM_ZONE = "missing"
+    assert main.alarm_temperature(30.0, stats) == 30.0
+    main.ALARM_ZONE, main.ALARM_STAT = None, "max"
 
 
 def test_display(mock_frame):
@@ -183,6 +188,63 @@ def test_relais_functions():
     assert main.relais_frozen is False
 
 
+def test_manual_relais_changes_keep_executor_in_sync(monkeypatch):
+    import time
+    from actuator import ActuatorExecutor, Output
+    states = []
+    monkeypatch.setattr(main, "set_relais_state", lambda state: states.append(state) or True)
+    executor = ActuatorExecutor([Output("RELAIS", lambda: main.set_relais_state(True),
+                                        lambda: main.set_relais_state(False))])
+    executor.start()
+    monkeypatch.setattr(main, "actuators", executor)
+    monkeypatch.setattr(main, "mode", main.SystemMode.TEST)
+    monkeypatch.setattr(main, "relais_frozen", False)
+    try:
+        def settle(state):
+            deadline = time.time() + 3
+            while executor.outputs["RELAIS"].state != state and time.time() < deadline:
+                time.sleep(0.01)
+        executor.fire(["RELAIS"])
+        settle("active")
+        assert main.set_relais_state_from_server(False)
+        settle("idle")
+        assert executor.fire(["RELAIS"]) == ["RELAIS"]   # The next alarm switches it on again
+        settle("active")
+        assert states == [True, False, True]
+    finally:
+        executor.stop(release=False)
+
+
+def test_recording_extractable_after_continuous_recording_stops(tmp_path, monkeypatch, mock_frame):
+    monkeypatch.setattr(main, "save_dir", tmp_path)
+    monkeypatch.setattr(main, "recording_type", "CONTINUOUS")
+    monkeypatch.setattr(main, "segment_recorder", None)
+    monkeypatch.setattr(main, "segment_closer", None)
+    recorder = main.update_segment_recorder()
+    for i in range(20):
+        recorder.push(mock_frame, 1000.0 + i / main.CAPTURE_FPS)
+    main.recording_type = "EVENT"
+    assert main.update_segment_recorder() is None
+    main.segment_closer.join(timeout=5)   # Closed off the caller's thread
+    filename = main.extract_recording(1000.0, 1001.0)
+    assert filename is not None and Path(filename).exists()
+
+
+def test_legacy_csv_frame_log_moved_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "FRAME_LOG_FILE", str(tmp_path / "frame_log"))
+    monkeypatch.setattr(main, "FRAME_LOG_FORMAT", "binary")
+    (tmp_path / "frame_log.csv").write_text("timestamp\n")
+    frame_log = main.create_frame_log()
+    frame_log.log(1000.0, main.SystemMode.NORMAL, 30.0, False)
+    frame_log.close()
+    assert not (tmp_path / "frame_log.csv").exists()
+    assert len(list(tmp_path.glob("frame_log_*.csv"))) == 1
+    (tmp_path / "frame_log.csv").write_text("timestamp\n")   # e.g. a csv-mode run in between
+    main.create_frame_log().close()
+    assert (tmp_path / "frame_log.csv").exists()
+    assert len(list(tmp_path.glob("frame_log_*.csv"))) == 1
+
+
 def test_take_screenshot_from_server(tmp_path, mock_frame):
     main.save_dir = tmp_path
     main.frame = mock_frame
@@ -191,9 +253,14 @@ def test_take_screenshot_from_server(tmp_path, mock_frame):
 
 # ---------- Main Loop ----------
 
-def test_main_loop_quit(monkeypatch):
+def test_main_loop_quit(monkeypatch, tmp_path):
     """Test main loop exit on 'q' key press."""
     monkeypatch.setattr("cv2.waitKey", lambda x: ord('q'))
+    # Files main() writes stay out of the working directory
+    monkeypatch.setattr(main, "CONFIG_FILE", str(tmp_path / "config.json"))
+    monkeypatch.setattr(main, "LOG_FILE", str(tmp_path / "system.log"))
+    monkeypatch.setattr(main, "FRAME_LOG_FILE", str(tmp_path / "frame_log"))
+    monkeypatch.setattr(main, "save_dir", tmp_path)
     main.exit_flag = False
     main.cam = MagicMock()
     main.cam.get_frame.return_value = (np.zeros((120, 160, 3)), 30.0)
@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import urllib.error
+import urllib.request
+import pytest
+
+from metrics import MetricsRegistry, MetricsServer
+
+
+def test_render_counters_gauges_and_histograms():
+    registry = MetricsRegistry()
+    frames = registry.counter("frames_total", "Frames read.", ["result"])
+    frames.labels("ok").inc()
+    frames.labels("ok").inc(2)
+    frames.labels("flag").inc()
+    depth = registry.gauge("queue_depth", "Queued frames.")
+    depth.set(7)
+    stages = registry.histogram("stage_seconds", "Stage duration.", ["stage"], buckets=(0.01, 0.1))
+    for value in (0.005, 0.05, 0.5):
+        stages.labels("store").observe(value)
+
+    text = registry.render()
+    assert "# TYPE frames_total counter" in text
+    assert 'frames_total{result="ok"} 3.0' in text
+    assert 'frames_total{result="flag"} 1.0' in text
+    assert "queue_depth 7.0" in text
+    assert 'stage_seconds_bucket{stage="store",le="0.01"} 1' in text
+    assert 'stage_seconds_bucket{stage="store",le="0.1"} 2' in text
+    assert 'stage_seconds_bucket{stage="store",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="store"} 3' in text
+    assert text.endswith("\n")
+
+
+def test_callback_metrics_read_at_scrape_time():
+    registry = MetricsRegistry()
+    state = {"dropped": {"drop_oldest": 2, "decimate": 0}, "fps": None}
+    registry.counter("dropped_total", "Dropped frames.", ["policy"], fn=lambda: state["dropped"])
+    registry.gauge("fps", "Capture rate.", fn=lambda: state["fps"])
+    registry.gauge("broken", "Raises.", fn=lambda: 1 / 0)
+    text = registry.render()
+    assert 'dropped_total{policy="drop_oldest"} 2.0' in text
+    assert "\nfps " not in text   # None = no sample
+    state["fps"] = 31.5
+    assert "fps 31.5" in registry.render()
+
+
+def test_labels_are_checked_and_escaped():
+    registry = MetricsRegistry()
+    errors = registry.counter("errors_total", "Errors.", ["message"])
+    with pytest.raises(ValueError):
+        errors.labels()
+    errors.labels('bad "quote"\n').inc()
+    assert 'errors_total{message="bad \\"quote\\"\\n"} 1.0' in registry.render()
+    with pytest.raises(ValueError):
+        registry.gauge("errors_total", "Same name, other type.")
+
+
+def test_server_serves_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("scraped_total", "Test counter.").inc()
+    server = MetricsServer(registry, port=0)
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "scraped_total 1.0" in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other", timeout=5)
+        assert server.scrapes == 1
+    finally:
+        server.stop()
@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+import numpy as np
+from unittest.mock import MagicMock
+
+from capture_engine import CapturedFrame
+from camera_control import CameraController
+from multi_camera import CameraPipeline, MultiCameraSupervisor
+
+
+@pytest.fixture
+def mock_frame():
+    return np.zeros((120, 160, 3), dtype=np.uint8)
+
+
+def make_item(frame, temp, thermal=None, seq=1):
+    return CapturedFrame(seq, frame, temp, 1000.0 + seq, thermal)
+
+
+def test_pipeline_alarm_hysteresis(mock_frame):
+    db = MagicMock()
+    pipeline = CameraPipeline({"serial": 42, "start_threshold": 55, "stop_threshold": 45}, None, db)
+    assert pipeline.process(make_item(mock_frame, 40.0)) is None
+    event = pipeline.process(make_item(mock_frame, 60.0, seq=2))
+    assert event["type"] == "alarm" and event["serial"] == 42 and event["temp"] == 60.0
+    assert pipeline.process(make_item(mock_frame, 61.0, seq=3)) is None  # Still active
+    pipeline.process(make_item(mock_frame, 40.0, seq=4))
+    assert pipeline.anomaly_active is False
+    assert db.insert_frame.call_count == 4
+
+
+def test_pipeline_alarm_on_zone(mock_frame):
+    thermal = np.full((120, 160), 1300, dtype=np.uint16)  # 30 °C
+    thermal[5, 5] = 1700                                   # 70 °C hotspot
+    config = {
+        "serial": 7, "start_threshold": 55, "stop_threshold": 45,
+        "roi": {"zones": [{"name": "corner", "rect": [0, 0, 10, 10]}]},
+        "alarm_zone": "corner", "alarm_stat": "max",
+    }
+    pipeline = CameraPipeline(config, None, None)
+    event = pipeline.process(make_item(mock_frame, 30.0, thermal))
+    assert event is not None
+    assert event["temp"] == pytest.approx(70.0)
+    assert pipeline.get_status()["zones"]["corner"]["max"] == pytest.approx(70.0)
+
+
+def test_supervisor_aggregates_status_and_alarms():
+    alarms = []
+    supervisor = MultiCameraSupervisor([{"serial": 1}, {"serial": 2, "start_threshold": 80}],
+                                       defaults={"start_threshold": 55}, on_alarm=alarms.append)
+    assert supervisor.cameras[0]["start_threshold"] == 55
+    assert supervisor.cameras[1]["start_threshold"] == 80
+    supervisor.handle_message({"type": "status", "serial": 1, "fps": 31.8})
+    supervisor.handle_message({"type": "alarm", "serial": 2, "temp": 90.0, "timestamp": 5.0})
+    status = supervisor.get_status()
+    assert status[1]["fps"] == 31.8
+    assert status[1]["alive"] is False
+    assert status[2]["last_alarm"]["temp"] == 90.0
+    assert alarms and alarms[0]["serial"] == 2
+
+
+def test_serial_config_rewrites_xml(tmp_path):
+    xml = tmp_path / "generic.xml"
+    xml.write_text("<imager>\n  <serial>0</serial>\n</imager>\n")
+    path = CameraController._serial_config(str(xml).encode(), 24104186)
+    assert "<serial>24104186</serial>" in open(path.decode()).read()
+
+
+def test_pipeline_ignores_flag_frames(mock_frame):
+    db = MagicMock()
+    pipeline = CameraPipeline({"serial": 3, "start_threshold": 55, "stop_threshold": 45}, None, db)
+    item = make_item(mock_frame, 90.0)
+    item.flag_valid = False
+    assert pipeline.process(item) is None
+    assert pipeline.anomaly_active is False
+    assert db.insert_frame.call_count == 0
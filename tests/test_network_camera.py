@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import socket
+import time
+import pytest
+import numpy as np
+
+from network_camera import NetworkCameraController, pack_chunks
+
+
+@pytest.fixture
+def cam():
+    cam = NetworkCameraController(port=0, bind_address="127.0.0.1", buffer_slots=4, timeout=1.0)
+    yield cam
+    cam.shutdown()
+
+
+@pytest.fixture
+def sender():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    yield sock
+    sock.close()
+
+
+def make_thermal(value):
+    thermal = np.full((120, 160), value, dtype=np.uint16)
+    thermal[10:20, 30:40] = value + 500
+    return thermal
+
+
+def test_frame_is_reassembled_from_chunks(cam, sender):
+    thermal = make_thermal(1250)
+    for packet in reversed(pack_chunks(thermal, frame_id=7, hw_timestamp=123, chunk_size=1000)):
+        sender.sendto(packet, ("127.0.0.1", cam.port))
+    frame, temp = cam.get_frame()
+    assert frame.shape == (120, 160, 3)
+    assert np.array_equal(cam.last_thermal, thermal)
+    assert temp == pytest.approx(thermal.mean() / 10.0 - 100.0)
+    assert cam.last_info["counter_hw"] == 7
+    assert cam.last_info["hw_timestamp"] == 123
+    assert not frame.flags.writeable
+
+
+def test_incomplete_frame_is_dropped(cam, sender):
+    packets = pack_chunks(make_thermal(1100), frame_id=1)
+    for packet in packets[:-1]:
+        sender.sendto(packet, ("127.0.0.1", cam.port))
+    for frame_id in (2, 3):
+        for packet in pack_chunks(make_thermal(1200 + frame_id), frame_id=frame_id):
+            sender.sendto(packet, ("127.0.0.1", cam.port))
+    # Late chunk of the dropped frame must not resurrect it
+    sender.sendto(packets[-1], ("127.0.0.1", cam.port))
+    deadline = time.monotonic() + 1.0
+    while cam.late_packets == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    cam.get_frame()
+    assert cam.last_info["counter_hw"] in (2, 3)
+    assert cam.frames_incomplete == 1
+    assert cam.frames_completed == 2
+    assert cam.late_packets == 1
+
+
+def test_malformed_packets_are_counted(cam, sender):
+    sender.sendto(b"garbage", ("127.0.0.1", cam.port))
+    cam.timeout = 0.2
+    with pytest.raises(RuntimeError):
+        cam.get_frame()
+    assert cam.bad_packets == 1
+
+
+def test_sender_restart_resets_frame_sequence(cam, sender):
+    for frame_id in (1000, 1001):
+        for packet in pack_chunks(make_thermal(1100), frame_id=frame_id):
+            sender.sendto(packet, ("127.0.0.1", cam.port))
+    cam.get_frame()
+    # The sender restarts and counts from 1 again
+    for frame_id in (1, 2, 3):
+        for packet in pack_chunks(make_thermal(1300), frame_id=frame_id):
+            sender.sendto(packet, ("127.0.0.1", cam.port))
+    deadline = time.monotonic() + 1.0
+    while cam.frames_completed < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    cam.get_frame()
+    assert cam.last_info["counter_hw"] == 3
+    assert cam.sender_restarts == 1
+    assert cam.late_packets == 0
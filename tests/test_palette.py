@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+import numpy as np
+
+from palette import PaletteLut, palette_colors, PALETTE_NAMES
+from thermal_codec import celsius_to_raw
+
+
+def test_palettes_have_256_colors():
+    for name in PALETTE_NAMES:
+        assert palette_colors(name).shape == (256, 3)
+    with pytest.raises(ValueError):
+        palette_colors("nope")
+
+
+def test_fixed_span_maps_ends_and_clips():
+    lut = PaletteLut("jet", span=(20.0, 40.0))
+    colors = palette_colors("jet")
+    thermal = np.array([[celsius_to_raw(20.0), celsius_to_raw(40.0), celsius_to_raw(-5.0), celsius_to_raw(90.0)]],
+                       dtype=np.uint16)
+    image = lut.render(thermal)
+    assert image.shape == (1, 4, 3)
+    assert np.array_equal(image[0], [colors[0], colors[255], colors[0], colors[255]])
+
+
+def test_auto_span_stretches_each_frame_and_fills_out():
+    lut = PaletteLut("gray")
+    thermal = np.array([[1200, 1300], [1250, 1300]], dtype=np.uint16)
+    out = np.zeros((2, 2, 3), dtype=np.uint8)
+    assert lut.render(thermal, out=out) is out
+    assert out[0, 0].tolist() == [0, 0, 0]
+    assert out[0, 1].tolist() == [255, 255, 255]
+    assert 120 <= out[1, 0, 0] <= 135
+
+
+def test_invalid_span_keeps_previous_table():
+    lut = PaletteLut("iron", span=(0, 100))
+    with pytest.raises(ValueError):
+        lut.set_palette("jet", span=(50, 10))
+    assert lut.get_status() == {"palette": "iron", "span": [0.0, 100.0]}
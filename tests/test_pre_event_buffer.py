@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from pre_event_buffer import PreEventBuffer
+
+
+def make_frame(value, shape=(4, 6, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_snapshot_is_chronological_after_wraparound():
+    buffer = PreEventBuffer(duration=1, fps=4, margin=1.0)
+    assert buffer.capacity == 4
+    for i in range(10):
+        buffer.push(make_frame(i), 100.0 + i * 0.25)
+    frames, timestamps = buffer.snapshot(seconds=10)
+    assert [f[0, 0, 0] for f in frames] == [6, 7, 8, 9]
+    assert list(timestamps) == [101.5, 101.75, 102.0, 102.25]
+
+
+def test_snapshot_limits_seconds_and_copies():
+    buffer = PreEventBuffer(duration=10, fps=10)
+    for i in range(20):
+        buffer.push(make_frame(i), float(i))
+    frames, timestamps = buffer.snapshot(seconds=3)
+    assert list(timestamps) == [17.0, 18.0, 19.0]
+    buffer.push(make_frame(99), 20.0)
+    assert frames[-1][0, 0, 0] == 19  # Snapshot is unaffected by later frames
+
+
+def test_empty_and_shape_change():
+    buffer = PreEventBuffer(duration=1, fps=8)
+    frames, timestamps = buffer.snapshot()
+    assert len(frames) == 0 and len(timestamps) == 0
+    buffer.push(make_frame(1), 1.0)
+    buffer.push(make_frame(2, shape=(8, 8, 3)), 2.0)
+    frames, _ = buffer.snapshot()
+    assert len(frames) == 1 and frames[0].shape == (8, 8, 3)
+    status = buffer.get_status()
+    assert status["frames"] == 1 and status["bytes"] == buffer.capacity * 8 * 8 * 3
+
+
+def test_thermal_ring_renders_only_the_snapshot():
+    rendered = []
+
+    def render(matrix):
+        rendered.append(matrix)
+        return np.repeat((matrix // 10).astype(np.uint8)[..., None], 3, axis=2)
+
+    buffer = PreEventBuffer(duration=1, fps=4, margin=1.0, render=render)
+    for i in range(10):
+        buffer.push(np.full((4, 6), 1000 + i * 10, dtype=np.uint16), 100.0 + i * 0.25)
+    assert not rendered and buffer.shape == (4, 6)
+    frames, timestamps = buffer.snapshot(seconds=0.5)
+    assert frames.shape == (2, 4, 6, 3) and frames.dtype == np.uint8
+    assert [f[0, 0, 0] for f in frames] == [108, 109]
+    assert len(rendered) == 2
+
+
+def test_buffer_over_memory_budget_is_logged(caplog):
+    buffer = PreEventBuffer(duration=1, fps=4, margin=1.0, memory_budget=200)
+    buffer.push(make_frame(1), 1.0)                    # 4 * 72 bytes
+    assert "more than the budget" in caplog.text
+    caplog.clear()
+    PreEventBuffer(duration=1, fps=4, margin=1.0, memory_budget=1000).push(make_frame(1), 1.0)
+    assert "more than the budget" not in caplog.text
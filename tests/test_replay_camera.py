@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import cv2
+import pytest
+import numpy as np
+
+from frame_database import FrameDatabase
+from mocks.replay_camera import ReplayCameraController, save_thermal_recording
+
+
+@pytest.fixture
+def recording(tmp_path):
+    frames = np.stack([np.full((12, 16), 1200 + 10 * i, dtype=np.uint16) for i in range(5)])
+    timestamps = 1000.0 + np.arange(5) * 0.1
+    path = tmp_path / "session.npz"
+    save_thermal_recording(path, timestamps, frames)
+    return path
+
+
+def test_thermal_recording_keeps_timing_at_speed(recording):
+    cam = ReplayCameraController(recording, speed=2.0, loop=False)
+    start = time.monotonic()
+    temps = [cam.get_frame()[1] for _ in range(5)]
+    elapsed = time.monotonic() - start
+    assert temps == pytest.approx([20.0, 21.0, 22.0, 23.0, 24.0])
+    assert 0.15 <= elapsed < 0.5  # 0.4 s recorded at 2x
+    assert cam.last_info["recorded_time"] == pytest.approx(1000.4)
+    assert cam.get_frame() == (None, None)
+    assert cam.finished
+
+
+def test_seek_and_loop(recording):
+    cam = ReplayCameraController(recording, speed=0, loop=True)
+    cam.seek(seconds=0.3)
+    assert cam.position == 3
+    temps = [cam.get_frame()[1] for _ in range(3)]
+    assert temps == pytest.approx([23.0, 24.0, 20.0])
+    assert cam.loops == 1
+    assert cam.last_info["counter_hw"] == 3
+
+
+def test_database_replay(tmp_path):
+    path = str(tmp_path / "frames.db")
+    db = FrameDatabase(path)
+    for i in range(3):
+        db.insert_frame(np.zeros((12, 16, 3), dtype=np.uint8), thermal=np.full((12, 16), 1300, dtype=np.uint16),
+                        timestamp=500.0 + i)
+    db.close()
+    cam = ReplayCameraController(path, speed=0, loop=False)
+    frame, temp = cam.get_frame()
+    assert frame.shape == (12, 16, 3)
+    assert temp == pytest.approx(30.0)
+    assert cam.last_thermal.shape == (12, 16)
+    assert len(cam) == 3
+    cam.shutdown()
+
+
+def test_video_replay(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 20, (16, 12))
+    for i in range(4):
+        writer.write(np.full((12, 16, 3), i * 40, dtype=np.uint8))
+    writer.release()
+    cam = ReplayCameraController(path, speed=0, loop=False)
+    assert len(cam) == 4
+    assert cam.duration == pytest.approx(0.15)
+    frame, temp = cam.get_frame()
+    assert frame.shape == (12, 16, 3)
+    assert temp is None
+    cam.shutdown()
@@ -0,0 +1,66 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+import numpy as np
+
+from roi_engine import RoiEngine, zone_mask
+
+
+@pytest.fixture
+def thermal():
+    rng = np.random.default_rng(0)
+    return rng.integers(1000, 2000, size=(120, 160), dtype=np.uint16)
+
+
+def to_celsius(raw):
+    return raw / 10.0 - 100.0
+
+
+def test_zone_mask_rect_and_polygon():
+    rect = zone_mask({"rect": [10, 20, 30, 40]}, (120, 160))
+    assert rect.sum() == 30 * 40
+    assert rect[20, 10] and not rect[19, 10]
+    triangle = zone_mask({"polygon": [[0, 0], [10, 0], [0, 10]]}, (120, 160))
+    assert 50 <= triangle.sum() <= 70
+    with pytest.raises(ValueError):
+        zone_mask({"name": "bad"}, (120, 160))
+
+
+def test_stats_match_numpy(thermal):
+    zones = [{"name": f"z{i}", "rect": [(i % 5) * 32, (i // 5) * 30, 32, 30]} for i in range(20)]
+    engine = RoiEngine(zones, thermal.shape, percentile=95, hot_threshold=80.0)
+    stats = engine.compute(thermal)
+    assert len(stats) == 20
+    region = thermal[30:60, 64:96]
+    zone = stats["z7"]
+    assert zone["min"] == pytest.approx(to_celsius(region.min()))
+    assert zone["max"] == pytest.approx(to_celsius(region.max()))
+    assert zone["mean"] == pytest.approx(to_celsius(region.mean()))
+    assert zone["percentile"] == pytest.approx(to_celsius(np.percentile(region, 95)))
+    assert zone["hot_pixels"] == int((region > 1800).sum())
+
+
+def test_overlapping_zones_and_per_zone_threshold(thermal):
+    zones = [
+        {"name": "all", "rect": [0, 0, 160, 120]},
+        {"name": "hot", "rect": [0, 0, 160, 120], "hot_threshold": -10.0},
+    ]
+    engine = RoiEngine(zones, thermal.shape, percentile=None, hot_threshold=90.0)
+    stats = engine.compute(thermal)
+    assert stats["all"]["max"] == pytest.approx(to_celsius(thermal.max()))
+    assert stats["all"]["hot_pixels"] == int((thermal > 1900).sum())
+    assert stats["hot"]["hot_pixels"] == thermal.size
+    assert "percentile" not in stats["all"]
+
+
+def test_empty_zones_are_rejected(thermal):
+    with pytest.raises(ValueError):
+        RoiEngine([{"name": "outside", "rect": [500, 500, 10, 10]}], thermal.shape)
+
+
+def test_shape_mismatch(thermal):
+    engine = RoiEngine([{"name": "a", "rect": [0, 0, 10, 10]}], (60, 80))
+    with pytest.raises(ValueError):
+        engine.compute(thermal)
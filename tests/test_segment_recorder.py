@@ -0,0 +1,94 @@
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+import numpy as np
+import pytest
+
+from segment_recorder import SegmentRecorder
+
+
+def record(recorder, start, count, fps=10, temp=30.0):
+    for i in range(count):
+        frame = np.full((60, 80, 3), (i * 7) % 256, dtype=np.uint8)
+        assert recorder.push(frame, start + i / fps, temp + i * 0.1)
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = SegmentRecorder(tmp_path / "segments", segment_duration=2, fps=10, capacity=1000)
+    recorder.start()
+    yield recorder
+    recorder.close()
+
+
+def test_segments_are_indexed(recorder):
+    record(recorder, 1000.0, 50)   # 5 s at 10 fps: segments of 20, 20 and 10 frames
+    recorder.stop()
+    segments = recorder.query(0, 2000)
+    assert [s["frames"] for s in segments] == [20, 20, 10]
+    assert segments[0]["start_time"] == 1000.0 and segments[0]["end_time"] == pytest.approx(1001.9)
+    assert segments[1]["max_temp"] == pytest.approx(30.0 + 3.9)
+    assert recorder.query(1002.5, 1003.0)[0]["start_time"] == pytest.approx(1002.0)
+
+
+def test_extract_range_across_segments(recorder, tmp_path):
+    record(recorder, 1000.0, 50)
+    recorder.stop()
+    filename = tmp_path / "extract.avi"
+    assert recorder.extract(1001.5, 1003.0, filename) == 16
+    cap = cv2.VideoCapture(str(filename))
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 16
+    assert cap.get(cv2.CAP_PROP_FPS) == pytest.approx(10.0)
+    assert recorder.extract(5000, 6000, tmp_path / "none.avi") == 0
+    assert not (tmp_path / "none.avi").exists()
+
+
+def test_quota_deletes_oldest_segments(tmp_path):
+    recorder = SegmentRecorder(tmp_path / "segments", segment_duration=1, fps=10, capacity=1000)
+    recorder.start()
+    record(recorder, 1000.0, 30)
+    recorder.stop()
+    sizes = sorted(s["bytes"] for s in recorder.query(0, 2000))
+    assert recorder.used_bytes() == sum(sizes)
+
+    # Room for two segments: recording two more leaves the two newest
+    recorder.quota_bytes = sizes[-1] * 2
+    recorder.start()
+    record(recorder, 1003.0, 20)
+    recorder.stop()
+    segments = recorder.query(0, 2000)
+    assert [round(s["start_time"]) for s in segments] == [1003, 1004]
+    assert recorder.segments_deleted == 3
+    assert len(list((tmp_path / "segments").glob("*.avi"))) == 2
+    recorder.close()
+
+
+def test_unclosed_segment_recovered_on_start(tmp_path):
+    directory = tmp_path / "segments"
+    recorder = SegmentRecorder(directory, segment_duration=60, fps=10, capacity=1000)
+    recorder.start()
+    record(recorder, 1000.0, 15)
+    assert wait_for_frames(recorder, 15)
+    # Simulated crash after the last periodic sync: the open segment is never closed nor indexed
+    recorder._writer.sync()
+    recorder.conn.close()
+    (directory / "segment_20000101_000000_000.avi").write_bytes(b"")   # Crashed before the first frame
+
+    recovered = SegmentRecorder(directory, fps=10)
+    segments = recovered.query(0, 2000)
+    assert [s["frames"] for s in segments] == [15]
+    assert segments[0]["start_time"] == pytest.approx(1000.0, abs=0.001)
+    assert segments[0]["end_time"] == pytest.approx(1001.4, abs=0.001)
+    assert not (directory / "segment_20000101_000000_000.avi").exists()
+    assert recovered.extract(1000.0, 1001.0, tmp_path / "extract.avi") == 11
+    recovered.close()
+
+
+def wait_for_frames(recorder, count, timeout=3.0):
+    deadline = time.time() + timeout
+    while recorder.frames < count and time.time() < deadline:
+        time.sleep(0.01)
+    return recorder.frames >= count
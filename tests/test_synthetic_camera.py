@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from camera_control import FLAG_OPEN
+from mocks.synthetic_camera import SyntheticCameraController
+
+
+def test_scene_has_moving_hotspot_and_ramp():
+    hotspot = {"position": [0.25, 0.5], "velocity": [0.5, 0.0], "radius": 0.05, "peak": 50.0}
+    cam = SyntheticCameraController(160, 120, fps=10, realtime=False, hotspots=[hotspot],
+                                    ramps=[{"start": 0.0, "duration": 1.0, "delta": 10.0}], noise=0.0)
+    first, first_temp = cam.get_thermal()
+    first = first.copy()
+    for _ in range(9):
+        last, last_temp = cam.get_thermal()
+    assert np.unravel_index(first.argmax(), first.shape) == (60, 40)
+    assert np.unravel_index(last.argmax(), last.shape)[1] == 112  # 0.45 s later at half a width per second
+    assert first.max() / 10.0 - 100.0 > 70.0
+    assert last_temp > first_temp + 8.0
+    assert last.dtype == np.uint16
+
+
+def test_flag_cycle_freezes_image():
+    cam = SyntheticCameraController(32, 24, fps=10, realtime=False, flag_interval=1.0, flag_duration=0.3,
+                                    buffer_slots=4)
+    states, frames = [], []
+    for _ in range(15):
+        thermal, _ = cam.get_thermal()
+        states.append(cam.last_info["flag_state"])
+        frames.append(thermal.copy())
+    assert states[:10] == [FLAG_OPEN] * 10
+    assert states[10:13] != [FLAG_OPEN] * 3 and states[13] == FLAG_OPEN
+    assert np.array_equal(frames[10], frames[9]) and np.array_equal(frames[12], frames[9])
+    assert not thermal.flags.writeable
+
+
+def test_get_frame_renders_palette_and_anomaly_trigger():
+    cam = SyntheticCameraController(64, 48, fps=10, realtime=False, hotspots=[], ramps=[], noise=0.0)
+    _, normal = cam.get_frame()
+    cam.trigger_anomaly()
+    frame, hot = cam.get_frame()
+    assert frame.shape == (48, 64, 3)
+    assert hot > normal + 5.0
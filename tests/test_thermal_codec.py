@@ -0,0 +1,32 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from thermal_codec import encode_thermal, decode_thermal, raw_to_celsius, celsius_to_raw
+
+
+def test_roundtrip_is_lossless():
+    rng = np.random.default_rng(0)
+    thermal = rng.integers(0, 65535, size=(120, 160), dtype=np.uint16)
+    blob = encode_thermal(thermal)
+    decoded = decode_thermal(blob, 160, 120)
+    assert decoded.dtype == np.uint16
+    assert np.array_equal(decoded, thermal)
+
+
+def test_smooth_scene_compresses_well():
+    y, x = np.mgrid[0:120, 0:160]
+    thermal = (1200 + x + y).astype(np.uint16)  # 20 °C gradient
+    blob = encode_thermal(thermal)
+    assert len(blob) < thermal.nbytes / 10
+    assert np.array_equal(decode_thermal(blob, 160, 120), thermal)
+
+
+def test_raw_conversion():
+    assert raw_to_celsius(1500) == 50.0
+    assert celsius_to_raw(50.0) == 1500
+    temps = raw_to_celsius(np.array([1000, 1255], dtype=np.uint16))
+    assert temps.dtype == np.float32
+    assert np.allclose(temps, [0.0, 25.5])
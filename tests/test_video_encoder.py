@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+import video_encoder
+from mjpeg_writer import MjpegAviWriter
+from video_encoder import FfmpegVideoWriter, create_video_writer, find_ffmpeg
+
+
+def test_mjpg_codec_uses_builtin_writer(tmp_path):
+    writer = create_video_writer(tmp_path / "clip.mp4", fps=10, codec="mjpg")
+    writer.close()
+    assert isinstance(writer, MjpegAviWriter)
+    assert writer.filename.endswith("clip.avi")
+
+
+def test_falls_back_to_mjpg_without_ffmpeg(tmp_path):
+    with patch.object(video_encoder, "find_ffmpeg", return_value=None):
+        writer = create_video_writer(tmp_path / "clip.avi", fps=10, codec="libx264")
+    with writer:
+        writer.write(np.zeros((120, 160, 3), dtype=np.uint8))
+    assert isinstance(writer, MjpegAviWriter)
+    assert (tmp_path / "clip.avi").exists()
+
+
+def test_ffmpeg_command_line(tmp_path):
+    writer = FfmpegVideoWriter(tmp_path / "clip.mp4", fps=32, codec="libx265", crf=28, preset="fast",
+                               threads=2, ffmpeg="ffmpeg")
+    writer.width, writer.height = 160, 120
+    command = writer._command()
+    writer.close()
+    for option in (["-s", "160x120"], ["-c:v", "libx265"], ["-crf", "28"], ["-preset", "fast"], ["-threads", "2"]):
+        index = command.index(option[0])
+        assert command[index + 1] == option[1]
+    assert command[-1] == str(tmp_path / "clip.mp4")
+
+
+@pytest.mark.skipif(find_ffmpeg() is None, reason="ffmpeg is not installed")
+def test_ffmpeg_encodes_frames(tmp_path):
+    with create_video_writer(tmp_path / "clip.avi", fps=10, codec="libx264") as writer:
+        for i in range(20):
+            writer.write(np.full((121, 161, 3), i * 10, dtype=np.uint8))  # Odd sizes are cropped
+    cap = cv2.VideoCapture(writer.filename)
+    count = 0
+    while cap.read()[0]:
+        count += 1
+    assert writer.filename.endswith(".mp4")
+    assert count == 20
@@ -0,0 +1,45 @@
+import zlib
+import numpy as np
+
+# Raw SDK values are tenths of a degree with a 100 °C offset: t = raw / 10 - 100
+RAW_SCALE = 10.0
+RAW_OFFSET = 100.0
+
+
+def raw_to_celsius(raw):
+    """
+    Converts raw uint16 thermal values (scalar or array) to °C.
+    """
+    if isinstance(raw, np.ndarray):
+        return raw.astype(np.float32) / np.float32(RAW_SCALE) - np.float32(RAW_OFFSET)
+    return raw / RAW_SCALE - RAW_OFFSET
+
+
+def celsius_to_raw(temp):
+    """
+    Converts °C to the nearest raw uint16 thermal value.
+    """
+    return int(round((temp + RAW_OFFSET) * RAW_SCALE))
+
+
+def encode_thermal(thermal, level=1):
+    """
+    Lossless compression of a uint16 thermal matrix.
+    Neighbouring pixels are delta coded, low and high bytes are split into two planes
+    (the high plane is almost constant) and the result is deflated.
+    """
+    flat = np.ascontiguousarray(thermal, dtype='<u2').ravel()
+    delta = np.empty_like(flat)
+    delta[0] = flat[0]
+    np.subtract(flat[1:], flat[:-1], out=delta[1:])  # Wraps modulo 2**16
+    planes = delta.view(np.uint8).reshape(-1, 2).T
+    return zlib.compress(planes.tobytes(), level)
+
+
+def decode_thermal(blob, width, height):
+    """
+    Inverse of encode_thermal; returns a (height, width) uint16 array.
+    """
+    planes = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(2, -1)
+    delta = np.ascontiguousarray(planes.T).view('<u2').ravel()
+    return np.cumsum(delta, dtype=np.uint16).reshape(height, width)
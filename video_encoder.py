@@ -0,0 +1,149 @@
+import logging
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from mjpeg_writer import MjpegAviWriter
+
+# Codecs encoded by ffmpeg; "mjpg" always uses the built-in MJPG AVI writer
+FFMPEG_CODECS = ("libx264", "libx265", "libvpx-vp9", "libsvtav1")
+VIDEO_CODECS = ("mjpg",) + FFMPEG_CODECS
+_ffmpeg_path = None
+_ffmpeg_missing_logged = False
+
+
+def find_ffmpeg():
+    """
+    Returns the path of the ffmpeg executable, or None if it is not installed.
+    """
+    global _ffmpeg_path
+    if _ffmpeg_path is None:
+        _ffmpeg_path = shutil.which("ffmpeg") or ""
+    return _ffmpeg_path or None
+
+
+class FfmpegVideoWriter:
+    """
+    Streams raw BGR frames through a pipe into an ffmpeg subprocess, so H.264/H.265 encoding
+    runs in its own process and does not hold the GIL of the capture loop.
+    The output is fragmented MP4: like the MJPG AVIs, a file cut short by a crash stays playable.
+    Same interface as MjpegAviWriter (write, write_jpeg, close, frames).
+    """
+
+    wants_jpeg = False  # Encoding needs raw frames, JPEG input is decoded first
+
+    def __init__(self, filename, fps=32, codec="libx264", crf=23, preset="veryfast", threads=1, ffmpeg=None):
+        """
+        The frame size is taken from the first frame written; ffmpeg starts with it.
+        crf / preset / threads: passed to ffmpeg (-crf, -preset, -threads).
+        """
+        self.filename = str(filename)
+        self.fps = fps
+        self.codec = codec
+        self.crf = crf
+        self.preset = preset
+        self.threads = threads
+        self.ffmpeg = ffmpeg or find_ffmpeg()
+        if not self.ffmpeg:
+            raise RuntimeError("ffmpeg is not installed.")
+        self.width = self.height = None
+        self.frames = 0
+        self.process = None
+        self._stderr = tempfile.TemporaryFile()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _command(self):
+        command = [self.ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+                   "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{self.width}x{self.height}",
+                   "-r", f"{self.fps:.3f}", "-i", "-",
+                   "-c:v", self.codec, "-pix_fmt", "yuv420p", "-threads", str(self.threads)]
+        if self.codec in ("libx264", "libx265"):
+            command += ["-preset", self.preset, "-crf", str(self.crf)]
+        elif self.crf is not None:
+            command += ["-crf", str(self.crf), "-b:v", "0"]
+        if self.codec == "libx265":
+            command += ["-tag:v", "hvc1"]
+        return command + ["-movflags", "+frag_keyframe+empty_moov+default_base_moof", self.filename]
+
+    def _start(self, frame):
+        # yuv420p needs even dimensions
+        self.height, self.width = frame.shape[0] & ~1, frame.shape[1] & ~1
+        self.process = subprocess.Popen(self._command(), stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                        stderr=self._stderr)
+
+    def _error(self):
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace").strip()[-500:]
+
+    def write(self, frame):
+        """
+        Appends a BGR frame; JPEG bytes are decoded first.
+        """
+        if isinstance(frame, (bytes, bytearray, memoryview)):
+            frame = cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR)
+        if self.process is None:
+            self._start(frame)
+        if frame.shape[:2] != (self.height, self.width):
+            frame = frame[:self.height, :self.width] if frame.shape[0] >= self.height and \
+                frame.shape[1] >= self.width else cv2.resize(frame, (self.width, self.height))
+        try:
+            self.process.stdin.write(memoryview(np.ascontiguousarray(frame)).cast("B"))
+        except (BrokenPipeError, OSError):
+            self.process.wait()
+            raise RuntimeError(f"ffmpeg stopped while encoding {self.filename}: {self._error()}")
+        self.frames += 1
+
+    write_jpeg = write
+
+    def sync(self):
+        if self.process is not None:
+            self.process.stdin.flush()
+
+    def close(self, fps=None, timeout=30):
+        """
+        Finishes encoding. `fps` is accepted for compatibility with MjpegAviWriter; ffmpeg keeps the
+        rate given at creation.
+        """
+        if self.process is None:
+            self._stderr.close()
+            return
+        process, self.process = self.process, None
+        try:
+            process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            code = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            code = process.wait()
+        error = self._error()
+        self._stderr.close()
+        if code != 0:
+            raise RuntimeError(f"ffmpeg failed with exit code {code} for {self.filename}: {error}")
+        logging.debug(f"[VIDEO] {self.filename}: {self.frames} frames encoded with {self.codec}.")
+
+
+def create_video_writer(filename, fps=32, codec="libx264", crf=23, preset="veryfast", threads=1):
+    """
+    Returns a writer for `filename` (suffix replaced to fit the codec): an FfmpegVideoWriter for the
+    ffmpeg codecs, or an MjpegAviWriter for "mjpg" and whenever ffmpeg is not installed.
+    """
+    global _ffmpeg_missing_logged
+    filename = Path(filename)
+    if codec != "mjpg":
+        if find_ffmpeg():
+            return FfmpegVideoWriter(filename.with_suffix(".mp4"), fps, codec, crf, preset, threads)
+        if not _ffmpeg_missing_logged:
+            logging.warning(f"[VIDEO] ffmpeg not found, writing MJPG instead of {codec}.")
+            _ffmpeg_missing_logged = True
+    return MjpegAviWriter(filename.with_suffix(".avi"), fps)